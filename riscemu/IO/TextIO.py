@@ -27,6 +27,12 @@ class TextIO(IOModule):
         buff_start = addr - 4
         self.buff[buff_start : buff_start + size] = data[0:size]
 
+    def copy(self) -> "TextIO":
+        io = TextIO(self.base, self.size - 4)
+        io.buff = bytearray(self.buff)
+        io.current_line = self.current_line
+        return io
+
     def _print(self):
         buff = self.buff
         self.buff = bytearray(self.size)
@@ -12,6 +12,7 @@ from .core import (
     Int32,
     Program,
     SimpleInstruction,
+    SparseMemorySection,
     T_RelativeAddress,
 )
 from .helpers import align_addr, get_section_base_name, parse_numeric_argument
@@ -78,7 +79,12 @@ class ParseContext:
             return
 
         if self.section.type == MemorySectionType.Data:
-            section = BinaryDataMemorySection(
+            # zero filled data (.bss, .space, .zero) is only allocated once written
+            if SparseMemorySection.has_zero_pages(self.section.data):
+                section_cls = SparseMemorySection.from_data
+            else:
+                section_cls = BinaryDataMemorySection
+            section = section_cls(
                 self.section.data,
                 self.section.name,
                 self.context,
@@ -5,6 +5,7 @@ SPDX-License-Identifier: MIT
 """
 
 from dataclasses import dataclass
+from typing import Optional, Tuple
 
 
 @dataclass(frozen=True, init=True)
@@ -24,7 +25,20 @@ class RunConfig:
     flen: int = 64
     # runtime config
     use_libc: bool = False
+    # run libc functions natively instead of emulating them (requires use_libc)
+    libc_hle: bool = False
+    # libc functions which are always emulated, even if libc_hle is set
+    libc_hle_exclude: Tuple[str, ...] = ()
     ignore_exit_code: bool = False
+    # check all instructions when loading programs, instead of when they are executed
+    verify_programs: bool = True
+    # compile basic blocks into python functions instead of interpreting them
+    use_jit: bool = False
+    # directory where translated programs are cached between runs (requires use_jit)
+    jit_cache_dir: Optional[str] = None
+    # budgets, programs exceeding them are halted with exit code 124
+    max_instructions: Optional[int] = None
+    max_runtime: Optional[float] = None  # in seconds of wall-clock time
     # csr stuff:
     # frequency of the real-time clock
     rtclock_tickrate: int = 32768
@@ -23,10 +23,12 @@ from .exceptions import (
     InvalidAllocationException,
     InvalidSyscallException,
     UnimplementedInstruction,
+    ProgramVerificationException,
     INS_NOT_IMPLEMENTED,
 )
 
 # base classes
+from .opcodes import OPCODE_NAMES, opcode_for, opcode_name
 from .flags import MemoryFlags
 from .int32 import UInt32, Int32
 from .float import BaseFloat, Float32, Float64
@@ -39,11 +41,19 @@ from .program_loader import ProgramLoader
 from .privmodes import PrivModes
 from .mmu import MMU
 from .csr import CSR
-from .registers import Registers
+from .registers import (
+    Registers,
+    REGISTER_NAMES,
+    REGISTER_NUMBERS,
+    FLOAT_REGISTER_NAMES,
+)
 from .cpu import CPU
 from .simple_instruction import SimpleInstruction
 from .instruction_memory_section import InstructionMemorySection
 from .binary_data_memory_section import BinaryDataMemorySection
+from .sparse_memory_section import SparseMemorySection
+from .snapshot import Snapshot, MemorySnapshot, DirtyPageTracker
+from .hostcall import HostCall, SYSCALL_ARGS
 from .usermode_cpu import UserModeCPU
 
 __all__ = [
@@ -62,7 +72,11 @@ __all__ = [
     "InvalidAllocationException",
     "InvalidSyscallException",
     "UnimplementedInstruction",
+    "ProgramVerificationException",
     "INS_NOT_IMPLEMENTED",
+    "OPCODE_NAMES",
+    "opcode_for",
+    "opcode_name",
     "MemoryFlags",
     "UInt32",
     "Int32",
@@ -81,9 +95,18 @@ __all__ = [
     "MMU",
     "CSR",
     "Registers",
+    "REGISTER_NAMES",
+    "REGISTER_NUMBERS",
+    "FLOAT_REGISTER_NAMES",
     "CPU",
     "SimpleInstruction",
     "InstructionMemorySection",
     "BinaryDataMemorySection",
+    "SparseMemorySection",
+    "Snapshot",
+    "MemorySnapshot",
+    "DirtyPageTracker",
+    "HostCall",
+    "SYSCALL_ARGS",
     "UserModeCPU",
 ]
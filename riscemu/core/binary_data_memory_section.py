@@ -1,4 +1,6 @@
+import struct
 from typing import Optional
+
 from . import (
     MemorySection,
     InstructionContext,
@@ -47,6 +49,30 @@ class BinaryDataMemorySection(MemorySection):
             )
         self.data[offset : offset + size] = data[0:size]
 
+    def read_value(self, offset: T_RelativeAddress, codec: struct.Struct):
+        if offset + codec.size > self.size:
+            raise MemoryAccessException(
+                "Out of bounds access in {}".format(self), offset, codec.size, "read"
+            )
+        return codec.unpack_from(self.data, offset)[0]
+
+    def write_value(self, offset: T_RelativeAddress, codec: struct.Struct, value):
+        if offset + codec.size > self.size:
+            raise MemoryAccessException(
+                "Out of bounds access in {}".format(self), offset, codec.size, "write"
+            )
+        codec.pack_into(self.data, offset, value)
+
+    def copy(self) -> "BinaryDataMemorySection":
+        return type(self)(
+            bytearray(self.data),
+            self.name,
+            self.context,
+            self.owner,
+            self.base,
+            self.flags,
+        )
+
     def read_ins(self, offset: T_RelativeAddress) -> Instruction:
         raise MemoryAccessException(
             "Tried reading instruction on non-executable section {}".format(self),
@@ -1,5 +1,17 @@
 from abc import ABC, abstractmethod
-from typing import List, Type, Callable, Set, Dict, TYPE_CHECKING
+from functools import partial
+from typing import (
+    Any,
+    List,
+    Type,
+    Callable,
+    Set,
+    Dict,
+    Tuple,
+    Optional,
+    Union,
+    TYPE_CHECKING,
+)
 
 from ..config import RunConfig
 from ..colors import FMT_NONE, FMT_CPU
@@ -14,7 +26,16 @@ from . import (
     CSR,
     RTClock,
     csr_constants,
+    MemorySection,
+    OPCODE_NAMES,
+    opcode_for,
+    ProgramVerificationException,
 )
+from .hostcall import HostCall
+from .instruction_memory_section import InstructionMemorySection
+from .simple_instruction import SimpleInstruction
+from .snapshot import Snapshot
+from .verifier import verify_program
 
 if TYPE_CHECKING:
     # from core.mmu import MMU
@@ -24,6 +45,8 @@ if TYPE_CHECKING:
 class CPU(ABC):
     # static cpu configuration
     INS_XLEN: int = 4
+    # the kinds of instrumentation hooks, see add_hook
+    HOOK_KINDS: Tuple[str, ...] = ("step", "branch", "mem", "syscall")
 
     # housekeeping variables
     regs: Registers
@@ -37,8 +60,28 @@ class CPU(ABC):
 
     # instruction information
     instructions: Dict[str, Callable[[Instruction], None]]
+    # the same handlers, indexed by opcode (None if no instruction set implements it)
+    _handlers: List[Optional[Callable[[Instruction], None]]]
     instruction_sets: Set["InstructionSet"]
 
+    # pre-decoded instructions ("threaded code"), keyed by section base address
+    _threaded_code: Dict[
+        T_AbsoluteAddress, Tuple[MemorySection, List[Callable[[], None]]]
+    ]
+    # native implementations of guest functions, keyed by entry address (see add_native_function)
+    native_functions: Dict[T_AbsoluteAddress, Callable[[], bool]]
+    # idioms (see recognize_idiom) never advance the cycle count past this limit
+    fast_forward_limit: Optional[int] = None
+    # the threaded code of the section we are currently executing from
+    _ops_base: T_AbsoluteAddress
+    _ops_size: int
+    _ops: List[Callable[[], None]]
+
+    # instrumentation hooks by kind (see add_hook)
+    hooks: Dict[str, List[Callable[..., None]]]
+    # set while any hooks are registered, the CPU then runs instrumented
+    instrumented: bool
+
     # configuration
     conf: RunConfig
 
@@ -66,6 +109,10 @@ class CPU(ABC):
             self.instructions.update(ins_set.load())
             self.instruction_sets.add(ins_set)
 
+        for name in self.instructions:
+            opcode_for(name)
+        self._handlers = [self.instructions.get(name) for name in OPCODE_NAMES]
+
         self.halted = False
         self.cycle = 0
         self.pc = 0
@@ -74,16 +121,284 @@ class CPU(ABC):
         self.csr = CSR()
         self.rtclock = RTClock(conf.rtclock_tickrate)
 
+        self._threaded_code = dict()
+        self.native_functions = dict()
+        self._ops_base = 0
+        self._ops_size = 0
+        self._ops = []
+
+        self.hooks = {kind: [] for kind in self.HOOK_KINDS}
+        self.instrumented = False
+
+    def add_hook(self, kind: str, func: Callable[..., None]):
+        """
+        Register an instrumentation hook. Depending on kind, func is called with:
+
+        - "step": (pc, ins) after the instruction ins located at pc retired
+        - "branch": (pc, target) after the instruction at pc jumped to target, i.e.
+          execution doesn't continue at the next instruction
+        - "mem": (access, addr, size, data) after the MMU read or wrote (access is
+          "read" or "write") the size bytes data at addr
+        - "syscall": (syscall) before the Syscall is handled
+
+        As long as no hooks are registered, execution is not slowed down at all. While
+        hooks are registered, the CPU executes one instruction at a time (without fused
+        instructions, idioms, native functions or compiled blocks), so every executed
+        instruction is observed.
+
+        :raises ValueError: If kind is not one of HOOK_KINDS
+        """
+        if kind not in self.hooks:
+            raise ValueError("Unknown hook kind {}".format(kind))
+        self.hooks[kind].append(func)
+        self._hooks_changed()
+
+    def remove_hook(self, kind: str, func: Callable[..., None]):
+        """
+        Remove a hook registered by add_hook.
+        """
+        if kind not in self.hooks:
+            raise ValueError("Unknown hook kind {}".format(kind))
+        self.hooks[kind].remove(func)
+        self._hooks_changed()
+
+    def _hooks_changed(self):
+        self.instrumented = any(self.hooks.values())
+        self.mmu.set_access_hooks(self.hooks["mem"])
+
+    def register_hostcall(
+        self, target: Union[int, str], fn: Callable[[HostCall], None]
+    ):
+        """
+        Register the python function fn as the custom instruction named target. It is
+        dispatched like the instructions of the loaded instruction sets, and called
+        with a HostCall giving access to the operands of the instruction.
+
+        Operands of host call instructions are not verified.
+
+        :raises ValueError: If target is already an instruction, or a syscall number,
+                            which this CPU doesn't support
+        """
+        if not isinstance(target, str):
+            raise ValueError(
+                "{} doesn't support syscall host calls".format(type(self).__name__)
+            )
+        if target in self.instructions:
+            raise ValueError("Instruction {} already exists".format(target))
+
+        def hostcall(ins: Instruction):
+            with HostCall(self, ins.args, ins) as call:
+                fn(call)
+
+        self.instructions[target] = hostcall
+        opcode = opcode_for(target)
+        handlers = self._handlers
+        handlers.extend([None] * (opcode + 1 - len(handlers)))
+        handlers[opcode] = hostcall
+        # threaded code may have bound the instruction as unknown
+        self._threaded_code.clear()
+        self._ops_size = 0
+
     def run_instruction(self, ins: Instruction):
         """
         Execute a single instruction
 
         :param ins: The instruction to execute
         """
-        try:
-            self.instructions[ins.name](ins)
-        except KeyError as ex:
-            raise RuntimeError("Unknown instruction: {}".format(ins)) from ex
+        handler = self.handler_for(ins)
+        if handler is None:
+            raise RuntimeError("Unknown instruction: {}".format(ins))
+        handler(ins)
+
+    def handler_for(self, ins: Instruction) -> Optional[Callable[[Instruction], None]]:
+        """
+        Look up the handler of an instruction by its opcode.
+
+        :return: The handler, or None if no loaded instruction set implements ins
+        """
+        handlers = self._handlers
+        opcode = ins.opcode
+        if opcode < len(handlers):
+            return handlers[opcode]
+        # the name was interned after this cpu was created
+        return None
+
+    def decode_instruction(self, ins: Instruction) -> Callable[[], None]:
+        """
+        Bind an instruction to its handler, resolving all immediate values it references.
+
+        The returned callable executes the instruction without any further lookups.
+
+        :param ins: The instruction to decode
+        :return: A callable that executes the instruction
+        """
+        handler = self.handler_for(ins)
+        if handler is None:
+            # defer the "unknown instruction" error until the instruction is executed
+            return partial(self.run_instruction, ins)
+        if isinstance(ins, SimpleInstruction):
+            ins.link()
+        return partial(handler, ins)
+
+    def fuse_instructions(
+        self, first: Instruction, second: Instruction
+    ) -> Optional[Callable[[], None]]:
+        """
+        Ask the loaded instruction sets for a superinstruction executing both first and
+        the directly following instruction second.
+
+        :return: The fused handler, or None if the pair can't be fused
+        """
+        for ins_set in self.instruction_sets:
+            fused = ins_set.fuse(first, second)
+            if fused is not None:
+                return fused
+        return None
+
+    def specialize_instruction(self, ins: Instruction) -> Optional[Callable[[], None]]:
+        """
+        Ask the loaded instruction sets for a handler of the verified instruction ins,
+        which skips the checks done at runtime by the regular handler.
+
+        :return: The specialized handler, or None if no instruction set provides one
+        """
+        for ins_set in self.instruction_sets:
+            op = ins_set.specialize(ins)
+            if op is not None:
+                return op
+        return None
+
+    def recognize_idiom(
+        self, sec: InstructionMemorySection, index: int
+    ) -> Optional[Callable[[], int]]:
+        """
+        Ask the loaded instruction sets for an idiom (e.g. a memset loop) starting at the
+        instruction at index of the verified section sec.
+
+        :return: A function fast-forwarding the idiom, or None if there is none
+        """
+        for ins_set in self.instruction_sets:
+            idiom = ins_set.idiom(sec, index)
+            if idiom is not None:
+                return idiom
+        return None
+
+    def add_native_function(self, addr: T_AbsoluteAddress, func: Callable[[], bool]):
+        """
+        Execute func instead of the guest function starting at addr.
+
+        func is called after the CPU did its bookkeeping for the first instruction of
+        the function, just like a decoded instruction. It must either perform the whole
+        call (including the return and the cycle count) and return True, or return
+        False without side effects, to execute the guest function instead.
+        """
+        self.native_functions[addr] = func
+        # drop the threaded code of the section, so that func is used from now on
+        sec = self.mmu.get_sec_containing(addr)
+        if sec is not None:
+            self._threaded_code.pop(sec.base, None)
+        self._ops_size = 0
+
+    def link_programs(self):
+        """
+        Link all loaded programs: resolve every label, numbered label and global symbol
+        referenced by their instructions into its final value (see SimpleInstruction.link).
+
+        Must be called after all programs are loaded, so that symbols defined in later
+        programs (e.g. the libc) are known.
+        """
+        for program in self.mmu.programs:
+            for sec in program.sections:
+                if isinstance(sec, InstructionMemorySection):
+                    for ins in sec.instructions:
+                        if isinstance(ins, SimpleInstruction):
+                            ins.link()
+
+    def verify_programs(self):
+        """
+        Verify all loaded programs ahead of time (see verifier.verify_program), and
+        report all problems at once.
+
+        Sections of verified programs are executed using specialized handlers where
+        available, see specialize_instruction.
+
+        :raises ProgramVerificationException: If any of the programs is invalid
+        """
+        errors = []
+        for program in self.mmu.programs:
+            errors.extend(verify_program(self, program))
+        if errors:
+            raise ProgramVerificationException(errors)
+
+        for program in self.mmu.programs:
+            for sec in program.sections:
+                if isinstance(sec, InstructionMemorySection) and not sec.verified:
+                    sec.verified = True
+                    # drop threaded code decoded before the section was verified
+                    self._threaded_code.pop(sec.base, None)
+                    self._ops_size = 0
+
+    def decode_section(self, sec: InstructionMemorySection) -> List[Callable[[], None]]:
+        """
+        Returns the threaded code for an instruction section, decoding it on first use.
+
+        The instruction at address addr is located at index (addr - sec.base) >> 2.
+
+        Where possible, an instruction is fused with its successor into a single handler.
+        The successor keeps its own handler, so jumping to it is still possible.
+        Instructions of verified sections use specialized handlers where available, and
+        idioms starting at an instruction are fast-forwarded before it is executed.
+        Native functions (see add_native_function) replace the instruction at their
+        entry address.
+        """
+        entry = self._threaded_code.get(sec.base)
+        if entry is None or entry[0] is not sec:
+            instructions = sec.instructions
+            if sec.verified:
+                ops = [
+                    self.specialize_instruction(ins) or self.decode_instruction(ins)
+                    for ins in instructions
+                ]
+            else:
+                ops = [self.decode_instruction(ins) for ins in instructions]
+            for i in range(len(instructions) - 1):
+                fused = self.fuse_instructions(instructions[i], instructions[i + 1])
+                if fused is not None:
+                    ops[i] = fused
+            if sec.verified:
+                for i in range(len(instructions)):
+                    idiom = self.recognize_idiom(sec, i)
+                    if idiom is not None:
+                        ops[i] = _fast_forwarding(idiom, ops[i])
+            for addr, func in self.native_functions.items():
+                if sec.base <= addr < sec.end and (addr - sec.base) % 4 == 0:
+                    index = (addr - sec.base) >> 2
+                    ops[index] = _native_or_guest(func, ops[index])
+            entry = (sec, ops)
+            self._threaded_code[sec.base] = entry
+        return entry[1]
+
+    def fetch_op(self, addr: T_AbsoluteAddress) -> Callable[[], None]:
+        """
+        Fetch the pre-decoded instruction located at addr.
+
+        :param addr: The address of the instruction
+        :return: A callable executing the instruction
+        """
+        offset = addr - self._ops_base
+        if 0 <= offset < self._ops_size and not offset & 3:
+            return self._ops[offset >> 2]
+        return self._fetch_op_slow(addr)
+
+    def _fetch_op_slow(self, addr: T_AbsoluteAddress) -> Callable[[], None]:
+        sec = self.mmu.get_sec_containing(addr)
+        if isinstance(sec, InstructionMemorySection) and (addr - sec.base) % 4 == 0:
+            self._ops = self.decode_section(sec)
+            self._ops_base = sec.base
+            self._ops_size = sec.size
+            return self._ops[(addr - sec.base) >> 2]
+        # other sections are decoded on the fly, read_ins raises if addr is not executable
+        return self.decode_instruction(self.mmu.read_ins(addr))
 
     def load_program(self, program: Program):
         self.mmu.load_program(program)
@@ -140,6 +455,65 @@ class CPU(ABC):
     def programs(self):
         return self.mmu.programs
 
+    def snapshot(self) -> Snapshot:
+        """
+        Capture the state of the CPU and its memory, to return to it later (see restore).
+
+        Memory is captured copy-on-write, so taking a snapshot is cheap: its cost is
+        proportional to the number of pages written afterwards, not to the size of the
+        memory. Release snapshots which aren't needed anymore.
+        """
+        return Snapshot(self.mmu.snapshot(), self.capture_state())
+
+    def restore(self, snapshot: Snapshot):
+        """
+        Return to the state captured by snapshot. The snapshot can be restored again
+        later.
+        """
+        self.mmu.restore(snapshot.memory)
+        self.restore_state(snapshot.state)
+        # sections may have been unloaded
+        self._ops_size = 0
+
+    def capture_state(self) -> Dict[str, Any]:
+        """
+        Returns the state of the CPU without its memory, see snapshot. Subclasses with
+        more state extend it.
+        """
+        regs = self.regs
+        return dict(
+            pc=self.pc,
+            cycle=self.cycle,
+            halted=self.halted,
+            mode=self.mode,
+            x=list(regs.x),
+            f=bytes(regs.f),
+            f_offsets=dict(regs.f_offsets),
+            extra_vals=dict(regs.extra_vals),
+            csr=dict(self.csr.state),
+            mstatus=self.csr.mstatus.state,
+        )
+
+    def restore_state(self, state: Dict[str, Any]):
+        """
+        Restore the state returned by capture_state.
+        """
+        self.pc = state["pc"]
+        self.cycle = state["cycle"]
+        self.halted = state["halted"]
+        self.mode = state["mode"]
+        # modified in place, threaded code may hold on to them
+        regs = self.regs
+        regs.x[:] = state["x"]
+        regs.f[:] = state["f"]
+        regs.f_offsets.clear()
+        regs.f_offsets.update(state["f_offsets"])
+        regs.extra_vals.clear()
+        regs.extra_vals.update(state["extra_vals"])
+        self.csr.state.clear()
+        self.csr.state.update(state["csr"])
+        self.csr.mstatus.state = state["mstatus"]
+
     def setup_csr(self):
         """
         Set up standard CSR registers, can be hooked into when subclassing to provide
@@ -171,3 +545,23 @@ class CPU(ABC):
             CSR.name_to_addr("cycleh"),
             getter=(lambda csr, _: UInt32(self.cycle >> 32)),
         )
+
+
+def _fast_forwarding(
+    idiom: Callable[[], int], op: Callable[[], None]
+) -> Callable[[], None]:
+    def fast_forward():
+        idiom()
+        op()
+
+    return fast_forward
+
+
+def _native_or_guest(
+    func: Callable[[], bool], op: Callable[[], None]
+) -> Callable[[], None]:
+    def native():
+        if not func():
+            op()
+
+    return native
@@ -194,6 +194,21 @@ class NumberFormatException(RiscemuBaseException):
         return "{}({})".format(self.__class__.__name__, self.msg)
 
 
+class ProgramVerificationException(RiscemuBaseException):
+    def __init__(self, errors: typing.List[str]):
+        super().__init__(errors)
+        self.errors = errors
+
+    def message(self):
+        return (
+            FMT_PARSE
+            + "{}({} errors):\n  {}".format(
+                self.__class__.__name__, len(self.errors), "\n  ".join(self.errors)
+            )
+            + FMT_NONE
+        )
+
+
 # this exception is not printed and simply signals that an interactive debugging session is
 class LaunchDebuggerException(RiscemuBaseException):
     def message(self) -> str:
@@ -12,6 +12,7 @@ class BaseFloat(ABC):
 
     _type: ClassVar[Type[Union[c_float, c_double]]]
     _struct_fmt_str: ClassVar[str]
+    _struct: ClassVar[struct.Struct]
 
     _val: Union[c_float, c_double]
 
@@ -27,7 +28,7 @@ class BaseFloat(ABC):
         """
         The values bit representation (as a bytes object)
         """
-        return struct.pack("<" + self._struct_fmt_str, self.value)
+        return self._struct.pack(self.value)
 
     @classmethod
     def from_bytes(cls, val: Union[bytes_t, bytearray]):
@@ -41,7 +42,7 @@ class BaseFloat(ABC):
         elif isinstance(val, (c_float, c_double)):
             self._val = self._type(val.value)
         elif isinstance(val, (bytes, bytearray)):
-            self._val = self._type(struct.unpack("<" + self._struct_fmt_str, val)[0])
+            self._val = self._type(self._struct.unpack(val)[0])
         elif isinstance(val, self.__class__):
             self._val = val._val
         else:
@@ -170,9 +171,7 @@ class BaseFloat(ABC):
         if isinstance(f, cls):
             return f
         return cls.from_bytes(
-            (b"\x00\x00\x00\x00\x00\x00\x00\x00" + f.bytes)[
-                -struct.calcsize(cls._struct_fmt_str) :
-            ]
+            (b"\x00\x00\x00\x00\x00\x00\x00\x00" + f.bytes)[-cls._struct.size :]
         )
 
     @classmethod
@@ -201,8 +200,10 @@ class BaseFloat(ABC):
 class Float32(BaseFloat):
     _type = c_float
     _struct_fmt_str = "f"
+    _struct = struct.Struct("<f")
 
 
 class Float64(BaseFloat):
     _type = c_double
     _struct_fmt_str = "d"
+    _struct = struct.Struct("<d")
@@ -0,0 +1,120 @@
+"""
+RiscEmu (c) 2023 Anton Lydike
+
+SPDX-License-Identifier: MIT
+
+This file contains the interface between host calls (python functions registered as
+instructions or syscalls, see CPU.register_hostcall) and the emulated program.
+"""
+
+from typing import List, Optional, Sequence, Tuple, Union, TYPE_CHECKING
+
+from . import (
+    Instruction,
+    Int32,
+    UInt32,
+    Registers,
+    MemoryAccessException,
+)
+from .binary_data_memory_section import BinaryDataMemorySection
+from .sparse_memory_section import SparseMemorySection
+
+if TYPE_CHECKING:
+    from . import CPU
+
+SYSCALL_ARGS = ("a0", "a1", "a2", "a3", "a4", "a5", "a6")
+"""
+The operands of host calls registered as syscalls, the result is returned in a0
+"""
+
+
+class HostCall:
+    """
+    Passed to a host call when it is executed. It provides access to the operands of
+    the call and to guest memory.
+
+    The operands of a host call registered as an instruction are the operands of the
+    instruction, e.g. for "hash a0, a1, 16", get(0) and get(1) read the registers a0
+    and a1, and get(2) is the immediate 16. Host calls registered as syscalls get the
+    registers a0-a6 as operands (see SYSCALL_ARGS).
+
+    Host calls are run inside of a with block, which writes back memory that had to be
+    copied (see memory).
+    """
+
+    __slots__ = ("cpu", "args", "_regs", "_ins", "_copies")
+
+    def __init__(
+        self, cpu: "CPU", args: Sequence[str], ins: Optional[Instruction] = None
+    ):
+        self.cpu = cpu
+        self.args = args
+        self._regs = cpu.regs
+        self._ins = ins
+        self._copies: List[Tuple[SparseMemorySection, int, bytearray, bytes]] = []
+
+    def __enter__(self) -> "HostCall":
+        return self
+
+    def __exit__(self, *exc_info):
+        for sec, offset, data, original in self._copies:
+            if data != original:
+                sec.write(offset, len(data), data)
+        self._copies.clear()
+
+    def get(self, num: int) -> Int32:
+        """
+        Return the value of operand num, which is either a register or an immediate.
+        """
+        arg = self.args[num]
+        if arg in Registers.valid_regs or self._ins is None:
+            return self._regs.get(arg)
+        return self._ins.get_imm(num).abs_value
+
+    def get_unsigned(self, num: int) -> int:
+        """
+        Return the value of operand num as an unsigned integer, e.g. for addresses.
+        """
+        return self.get(num).unsigned_value
+
+    def set(self, num: int, value: Union[int, Int32]):
+        """
+        Write value into the register given as operand num.
+        """
+        self._regs.set(self.args[num], Int32(value))
+
+    def memory(self, addr: Union[int, Int32], size: int) -> memoryview:
+        """
+        Return a writable view of the size bytes of guest memory starting at addr,
+        without copying them.
+
+        The view must not be kept after the host call returns. Accesses through it are
+        not seen by memory hooks (see CPU.add_hook). Ranges spanning several pages of a
+        SparseMemorySection are copied, and written back when the host call returns.
+
+        :raises MemoryAccessException: If the bytes aren't inside of a single data
+                                       section
+        """
+        addr = UInt32(addr).unsigned_value
+        sec = self.cpu.mmu.get_sec_containing(addr)
+        # only plain data sections, subclasses may intercept reads and writes
+        if type(sec) not in (BinaryDataMemorySection, SparseMemorySection) or (
+            addr + size > sec.end
+        ):
+            raise MemoryAccessException(
+                "no data section contains the range", addr, size, "host call"
+            )
+        offset = addr - sec.base
+        for tracker in sec.write_trackers:
+            tracker(offset, size)
+        if type(sec) is BinaryDataMemorySection:
+            return memoryview(sec.data)[offset : offset + size]
+        page, start, available = sec.page(offset)
+        if size <= available:
+            return memoryview(page)[start : start + size]
+        data = sec.read(offset, size)
+        self._copies.append((sec, offset, data, bytes(data)))
+        return memoryview(data)
+
+    def __repr__(self):
+        return "HostCall(args={})".format(", ".join(self.args))
@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
 from typing import Union
 from .int32 import Int32
+from .opcodes import opcode_name
 
 
 class Immediate:
@@ -34,9 +35,15 @@ class Immediate:
 
 
 class Instruction(ABC):
-    name: str
+    opcode: int
     args: tuple
 
+    __slots__ = ()
+
+    @property
+    def name(self) -> str:
+        return opcode_name(self.opcode)
+
     @abstractmethod
     def get_imm(self, num: int) -> Immediate:
         """
@@ -38,6 +38,8 @@ class InstructionContext:
     ) -> Optional[T_AbsoluteAddress]:
         direction = symbol[-1]
         values = self.numbered_labels.get(symbol[:-1], [])
+        # labels are stored relative to the program base, address_at is absolute
+        address_at -= self.base_address
         if direction == "b":
             return max(
                 (addr + self.base_address for addr in values if addr < address_at),
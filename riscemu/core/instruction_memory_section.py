@@ -11,6 +11,11 @@ from .exceptions import MemoryAccessException
 
 
 class InstructionMemorySection(MemorySection):
+    verified: bool
+    """
+    Set once the section passed verification (see CPU.verify_programs)
+    """
+
     def __init__(
         self,
         instructions: List[Instruction],
@@ -26,6 +31,7 @@ class InstructionMemorySection(MemorySection):
         self.flags = MemoryFlags(True, True)
         self.instructions = instructions
         self.owner = owner
+        self.verified = False
 
     def read(self, offset: T_RelativeAddress, size: int) -> bytearray:
         raise MemoryAccessException(
@@ -43,6 +49,10 @@ class InstructionMemorySection(MemorySection):
             "write",
         )
 
+    def copy(self) -> "InstructionMemorySection":
+        # instructions can't be modified, so the section can be shared
+        return self
+
     def read_ins(self, offset: T_RelativeAddress) -> Instruction:
         if offset % 4 != 0:
             raise MemoryAccessException(
@@ -14,7 +14,6 @@ class Int32:
     to functions which actually expect an integer and not an Int32.
     """
 
-    _type = c_int32
     __slots__ = ("_val",)
 
     MIN_VALUE: ClassVar[int] = -(2**31)
@@ -23,15 +22,14 @@ class Int32:
     def __init__(
         self, val: Union[int, c_int32, c_uint32, "Int32", bytes, bytearray, bool] = 0
     ):
-        if isinstance(val, (c_uint32, c_int32, Int32)):
-            self._val = self.__class__._type(val.value)
+        if type(val) is int:
+            self._val = self._wrap(val)
+        elif isinstance(val, (c_uint32, c_int32, Int32)):
+            self._val = self._wrap(val.value)
         elif isinstance(val, (int, bool)):
-            self._val = self.__class__._type(val)
+            self._val = self._wrap(int(val))
         elif isinstance(val, (bytes, bytearray)):
-            signed = len(val) == 4 and self._type == c_int32
-            self._val = self.__class__._type(
-                int.from_bytes(val, "little", signed=signed)
-            )
+            self._val = self._wrap(int.from_bytes(val, "little"))
         else:
             raise RuntimeError(
                 "Unknown {} input type: {} ({})".format(
@@ -39,21 +37,28 @@ class Int32:
                 )
             )
 
+    @staticmethod
+    def _wrap(val: int) -> int:
+        """
+        Wrap a python integer into the range of this type
+        """
+        return ((val + 0x80000000) & 0xFFFFFFFF) - 0x80000000
+
     def __add__(self, other: Union["Int32", int]):
         if isinstance(other, Int32):
             other = other.value
 
-        return self.__class__(self._val.value + other)
+        return self.__class__(self._val + other)
 
     def __sub__(self, other: Union["Int32", int]):
         if isinstance(other, Int32):
             other = other.value
-        return self.__class__(self._val.value - other)
+        return self.__class__(self._val - other)
 
     def __mul__(self, other: Union["Int32", int]):
         if isinstance(other, Int32):
             other = other.value
-        return self.__class__(self._val.value * other)
+        return self.__class__(self._val * other)
 
     def __truediv__(self, other: Any):
         return self // other
@@ -66,22 +71,22 @@ class Int32:
     def __mod__(self, other: Union["Int32", int]):
         if isinstance(other, Int32):
             other = other.value
-        return self.__class__(self._val.value % other)
+        return self.__class__(self._val % other)
 
     def __and__(self, other: Union["Int32", int]):
         if isinstance(other, Int32):
             other = other.value
-        return self.__class__(self._val.value & other)
+        return self.__class__(self._val & other)
 
     def __or__(self, other: Union["Int32", int]):
         if isinstance(other, Int32):
             other = other.value
-        return self.__class__(self._val.value | other)
+        return self.__class__(self._val | other)
 
     def __xor__(self, other: Union["Int32", int]):
         if isinstance(other, Int32):
             other = other.value
-        return self.__class__(self._val.value ^ other)
+        return self.__class__(self._val ^ other)
 
     def __lshift__(self, other: Union["Int32", int]):
         if isinstance(other, Int32):
@@ -101,7 +106,7 @@ class Int32:
         return False
 
     def __neg__(self):
-        return self.__class__(-self._val.value)
+        return self.__class__(-self._val)
 
     def __invert__(self):
         return self.__class__(~self.value)
@@ -187,7 +192,7 @@ class Int32:
         The value represented by this Integer
         :return:
         """
-        return self._val.value
+        return self._val
 
     def unsigned(self) -> "UInt32":
         """
@@ -203,7 +208,7 @@ class Int32:
         :param bytes: The length of the bytearray
         :return: A little-endian representation of the contained integer
         """
-        return bytearray(self.unsigned_value.to_bytes(4, "little"))[0:bytes]
+        return bytearray((self._val & 0xFFFFFFFF).to_bytes(4, "little")[0:bytes])
 
     def signed(self) -> "Int32":
         """
@@ -218,7 +223,7 @@ class Int32:
         Return the value interpreted as an unsigned integer
         :return:
         """
-        return c_uint32(self.value).value
+        return self._val & 0xFFFFFFFF
 
     def shift_right_logical(self, amount: Union["Int32", int]) -> "Int32":
         """
@@ -261,14 +266,15 @@ class Int32:
     @classmethod
     def from_float(cls, number: float) -> "Int32":
         """
-        Convert a floating point number to an instance of Int32, handling overflows and NaN according to RISC-V spec.
+        Convert a floating point number to an instance of Int32, rounding towards zero.
 
-        - Valid values and infinities are clamped between MIN_VALUE and MAX_VALUE
-        - NaN is treated as -inf
+        - Values out of range and infinities saturate to MIN_VALUE or MAX_VALUE
+        - NaN saturates to MAX_VALUE, like the RISC-V fcvt instructions
+
+        Other rounding modes and the exception flags of the RISC-V fcvt instructions
+        are not supported.
         """
-        if math.isnan(number):
-            number = cls.MIN_VALUE
-        elif number > cls.MAX_VALUE:
+        if math.isnan(number) or number > cls.MAX_VALUE:
             number = cls.MAX_VALUE
         elif number < cls.MIN_VALUE:
             number = cls.MIN_VALUE
@@ -282,8 +288,6 @@ class UInt32(Int32):
     An unsigned version of :class:Int32.
     """
 
-    _type = c_uint32
-
     MIN_VALUE: ClassVar[int] = 0
     MAX_VALUE: ClassVar[int] = 2**32 - 1
 
@@ -296,7 +300,7 @@ class UInt32(Int32):
 
     @property
     def unsigned_value(self) -> int:
-        return self._val.value
+        return self._val
 
     def shift_right_logical(self, amount: Union["Int32", int]) -> "UInt32":
         """
@@ -309,6 +313,9 @@ class UInt32(Int32):
             amount = amount.value
         return UInt32(self.value >> amount)
 
+    @staticmethod
+    def _wrap(val: int) -> int:
+        return val & 0xFFFFFFFF
+
     def signed(self) -> "Int32":
-        # Overflow is handled natively by the underlying c_uint32 to c_int32 conversion!
         return Int32(self._val)
@@ -0,0 +1,101 @@
+"""
+RiscEmu (c) 2023 Anton Lydike
+
+SPDX-License-Identifier: MIT
+
+This file contains 32 bit integer arithmetic on plain python integers. Instruction
+handlers use it instead of Int32, so that they don't allocate objects per operation.
+
+Operands are signed 32 bit values (as stored in Registers.x), results are wrapped back
+into that range. Int32 remains the type used to pass values to and from users.
+"""
+
+MASK32 = 0xFFFFFFFF
+
+
+def s32(val: int) -> int:
+    """
+    Wrap a python integer to a signed 32 bit value
+    """
+    return ((val + 0x80000000) & MASK32) - 0x80000000
+
+
+def u32(val: int) -> int:
+    """
+    Wrap a python integer to an unsigned 32 bit value
+    """
+    return val & MASK32
+
+
+def add(a: int, b: int) -> int:
+    return s32(a + b)
+
+
+def sub(a: int, b: int) -> int:
+    return s32(a - b)
+
+
+def mul(a: int, b: int) -> int:
+    return s32(a * b)
+
+
+def mulh(a: int, b: int) -> int:
+    return s32(a * b >> 32)
+
+
+def mulhsu(a: int, b: int) -> int:
+    return s32(a * (b & MASK32) >> 32)
+
+
+def mulhu(a: int, b: int) -> int:
+    return s32((a & MASK32) * (b & MASK32) >> 32)
+
+
+def div(a: int, b: int) -> int:
+    """
+    Signed division, rounding like Int32.__floordiv__ (towards negative infinity)
+    """
+    return s32(a // b)
+
+
+def divu(a: int, b: int) -> int:
+    return s32((a & MASK32) // (b & MASK32))
+
+
+def rem(a: int, b: int) -> int:
+    """
+    Signed remainder, matching div
+    """
+    return s32(a % b)
+
+
+def remu(a: int, b: int) -> int:
+    return s32((a & MASK32) % (b & MASK32))
+
+
+def sll(a: int, shamt: int) -> int:
+    return s32(a << (shamt & 31))
+
+
+def srl(a: int, shamt: int) -> int:
+    return s32((a & MASK32) >> (shamt & 31))
+
+
+def sra(a: int, shamt: int) -> int:
+    return a >> (shamt & 31)
+
+
+def slt(a: int, b: int) -> int:
+    return 1 if a < b else 0
+
+
+def sltu(a: int, b: int) -> int:
+    return 1 if (a & MASK32) < (b & MASK32) else 0
+
+
+def sign_extend(val: int, bits: int) -> int:
+    """
+    Sign extend the lowest bits bits of val
+    """
+    sign = 1 << (bits - 1)
+    return ((val & ((1 << bits) - 1)) ^ sign) - sign
@@ -1,6 +1,7 @@
+import struct
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import Optional
+from typing import Callable, ClassVar, Optional, Tuple
 
 from ..colors import FMT_MEM, FMT_NONE, FMT_UNDERLINE, FMT_ORANGE, FMT_ERROR
 from ..helpers import format_bytes
@@ -13,6 +14,16 @@ from . import (
     Int32,
 )
 
+# little endian codecs for the typed accessors, see MemorySection.read_value
+U8 = struct.Struct("<B")
+U16 = struct.Struct("<H")
+U32 = struct.Struct("<I")
+I8 = struct.Struct("<b")
+I16 = struct.Struct("<h")
+I32 = struct.Struct("<i")
+F32 = struct.Struct("<f")
+F64 = struct.Struct("<d")
+
 
 @dataclass
 class MemorySection(ABC):
@@ -23,6 +34,18 @@ class MemorySection(ABC):
     owner: str
     context: InstructionContext
 
+    write_trackers: ClassVar[Tuple[Callable[[T_RelativeAddress, int], None], ...]] = ()
+    """
+    Called with (offset, size) before bytes of the section are modified, see
+    add_write_tracker
+    """
+
+    _tracked_methods: ClassVar[Tuple[str, ...]] = ("write", "write_value")
+    """
+    The methods modifying the section, which are replaced while write trackers are
+    registered
+    """
+
     @property
     def end(self):
         return self.base + self.size
@@ -39,6 +62,123 @@ class MemorySection(ABC):
     def read_ins(self, offset: T_RelativeAddress) -> Instruction:
         pass
 
+    def read_value(self, offset: T_RelativeAddress, codec: struct.Struct):
+        """
+        Read the value of the type codec describes (one of U8, U16, U32, I8, I16, I32,
+        F32 and F64) at offset.
+
+        Subclasses storing their data in a buffer should override this (and
+        write_value) to skip the bytearray read returns.
+        """
+        return codec.unpack(self.read(offset, codec.size))[0]
+
+    def write_value(self, offset: T_RelativeAddress, codec: struct.Struct, value):
+        """
+        Write value as the type codec describes at offset, see read_value
+        """
+        self.write(offset, codec.size, bytearray(codec.pack(value)))
+
+    def add_write_tracker(self, tracker: Callable[[T_RelativeAddress, int], None]):
+        """
+        Call tracker(offset, size) before the size bytes at offset are modified, until it
+        is removed again. Views of the section's memory handed out for direct access
+        (see HostCall.memory) are reported as writes when they are created.
+
+        Sections without write trackers are not slowed down at all, the tracking
+        versions of the writing methods are only set on the instance while trackers are
+        registered.
+        """
+        if not self.write_trackers:
+            self._track_writes()
+        self.write_trackers += (tracker,)
+
+    def remove_write_tracker(self, tracker: Callable[[T_RelativeAddress, int], None]):
+        """
+        Remove a tracker registered by add_write_tracker.
+        """
+        trackers = list(self.write_trackers)
+        trackers.remove(tracker)
+        self.write_trackers = tuple(trackers)
+        if not trackers:
+            for name in ("write_trackers", *self._tracked_methods):
+                del self.__dict__[name]
+
+    def _track_writes(self):
+        """
+        Shadow the methods modifying the section with versions calling the write
+        trackers first
+        """
+        cls = type(self)
+
+        def write(offset: T_RelativeAddress, size: int, data: bytearray):
+            for tracker in self.write_trackers:
+                tracker(offset, size)
+            return cls.write(self, offset, size, data)
+
+        def write_value(offset: T_RelativeAddress, codec: struct.Struct, value):
+            for tracker in self.write_trackers:
+                tracker(offset, codec.size)
+            return cls.write_value(self, offset, codec, value)
+
+        self.write = write
+        self.write_value = write_value
+
+    @abstractmethod
+    def copy(self) -> "MemorySection":
+        """
+        Returns an independent copy of the section, with the same contents (see
+        UserModeCPU.fork)
+        """
+        pass
+
+    def read_u8(self, offset: T_RelativeAddress) -> int:
+        return self.read_value(offset, U8)
+
+    def read_u16(self, offset: T_RelativeAddress) -> int:
+        return self.read_value(offset, U16)
+
+    def read_u32(self, offset: T_RelativeAddress) -> int:
+        return self.read_value(offset, U32)
+
+    def read_i8(self, offset: T_RelativeAddress) -> int:
+        return self.read_value(offset, I8)
+
+    def read_i16(self, offset: T_RelativeAddress) -> int:
+        return self.read_value(offset, I16)
+
+    def read_i32(self, offset: T_RelativeAddress) -> int:
+        return self.read_value(offset, I32)
+
+    def read_f32(self, offset: T_RelativeAddress) -> float:
+        return self.read_value(offset, F32)
+
+    def read_f64(self, offset: T_RelativeAddress) -> float:
+        return self.read_value(offset, F64)
+
+    def write_u8(self, offset: T_RelativeAddress, value: int):
+        self.write_value(offset, U8, value)
+
+    def write_u16(self, offset: T_RelativeAddress, value: int):
+        self.write_value(offset, U16, value)
+
+    def write_u32(self, offset: T_RelativeAddress, value: int):
+        self.write_value(offset, U32, value)
+
+    def write_i8(self, offset: T_RelativeAddress, value: int):
+        self.write_value(offset, I8, value)
+
+    def write_i16(self, offset: T_RelativeAddress, value: int):
+        self.write_value(offset, I16, value)
+
+    def write_i32(self, offset: T_RelativeAddress, value: int):
+        self.write_value(offset, I32, value)
+
+    def write_f32(self, offset: T_RelativeAddress, value: float):
+        self.write_value(offset, F32, value)
+
+    def write_f64(self, offset: T_RelativeAddress, value: float):
+        self.write_value(offset, F64, value)
+
     def dump(
         self,
         start: T_RelativeAddress,
@@ -4,7 +4,11 @@ RiscEmu (c) 2021 Anton Lydike
 SPDX-License-Identifier: MIT
 """
 
-from typing import Dict, List, Optional, Union
+import bisect
+import copy
+import struct
+import typing
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
 from ..colors import *
 from ..helpers import align_addr
@@ -21,6 +25,11 @@ from . import (
     InvalidAllocationException,
     MemoryAccessException,
 )
+from .memory_section import U8, U16, U32, I8, I16, I32, F32, F64
+from .snapshot import DirtyPageTracker, MemorySnapshot
+
+if typing.TYPE_CHECKING:
+    from .sparse_memory_section import SparseMemorySection
 
 
 class MMU:
@@ -40,9 +49,15 @@ class MMU:
     No single allocation can be bigger than 64 MB
     """
 
+    page_bits = 12
+    """
+    Sections are looked up through a two level page table of 4 KiB pages (see
+    get_sec_containing)
+    """
+
     sections: List[MemorySection]
     """
-    A list of all loaded memory sections
+    A list of all loaded memory sections, sorted by their base address
     """
 
     programs: List[Program]
@@ -65,6 +80,29 @@ class MMU:
     Caching the last section where we read data from
     """
 
+    _page_table: List[Optional[List[Tuple[MemorySection, ...]]]]
+    """
+    Maps the upper ten bits of a page number to a table, which maps the lower ten bits
+    to the sections overlapping the page. Tables are allocated on first use.
+    """
+
+    dirty_page_trackers: List[DirtyPageTracker]
+    """
+    The active dirty page trackers, see track_dirty_pages
+    """
+
+    _section_bases: List[int]
+    """
+    The base addresses of the loaded sections (in the same order), so sections can be
+    found by bisection
+    """
+
+    _free_holes: List[Tuple[int, int]]
+    """
+    The sorted (start, end) address ranges freed by unloading sections, below the end of
+    the last section. New sections are placed into the first one they fit in.
+    """
+
     def __init__(self):
         """
         Create a new MMU
@@ -74,6 +112,10 @@ class MMU:
         self.global_symbols = dict()
         self._ins_sec = None
         self._mem_sec = None
+        self._page_table = [None] * (1 << (32 - self.page_bits - 10))
+        self._section_bases = list()
+        self._free_holes = list()
+        self.dirty_page_trackers = list()
 
     def get_sec_containing(self, addr: T_AbsoluteAddress) -> Optional[MemorySection]:
         """
@@ -82,12 +124,54 @@ class MMU:
         :param addr: the Address to look for
         :return: The LoadedMemorySection or None
         """
-        for sec in self.sections:
+        addr = int(addr)
+        for sec in self._page_entry(addr >> self.page_bits):
             if sec.base <= addr < sec.base + sec.size:
                 self._mem_sec = sec
                 return sec
         return None
 
+    def _page_entry(self, page: int) -> Tuple[MemorySection, ...]:
+        """
+        Returns the sections overlapping page (in no particular order)
+        """
+        # masking keeps addresses outside of the 32 bit space from wrapping around,
+        # callers check the bounds of the returned sections
+        table = self._page_table[(page >> 10) & (len(self._page_table) - 1)]
+        if table is None:
+            return ()
+        return table[page & 0x3FF]
+
+    def _map_section(self, sec: MemorySection):
+        """
+        Add sec to the page table entries of all pages it overlaps
+        """
+        if sec.size <= 0:
+            return
+        for page in range(
+            sec.base >> self.page_bits,
+            ((sec.base + sec.size - 1) >> self.page_bits) + 1,
+        ):
+            table = self._page_table[page >> 10]
+            if table is None:
+                table = self._page_table[page >> 10] = [()] * 1024
+            table[page & 0x3FF] += (sec,)
+
+    def _unmap_section(self, sec: MemorySection):
+        """
+        Remove sec from the page table entries of all pages it overlaps
+        """
+        if sec.size <= 0:
+            return
+        for page in range(
+            sec.base >> self.page_bits,
+            ((sec.base + sec.size - 1) >> self.page_bits) + 1,
+        ):
+            table = self._page_table[page >> 10]
+            table[page & 0x3FF] = tuple(
+                other for other in table[page & 0x3FF] if other is not sec
+            )
+
     def get_program_at_addr(self, addr: T_AbsoluteAddress) -> Optional[Program]:
         for program in self.programs:
             if program.base <= addr < program.base + program.size:
@@ -102,7 +186,7 @@ class MMU:
         :return: The Instruction
         """
         sec = self._ins_sec
-        if addr < sec.base or sec.base + sec.size <= addr:
+        if sec is None or addr < sec.base or sec.base + sec.size <= addr:
             sec = self.get_sec_containing(addr)
             if sec is not None:
                 self._ins_sec = sec
@@ -118,6 +202,26 @@ class MMU:
                 raise RuntimeError("No next instruction available!")
         return sec.read_ins(addr - sec.base)
 
+    def _data_section(self, addr: int, size: int, access: str) -> MemorySection:
+        """
+        Returns the section containing addr for a read or write of size bytes, called
+        when addr is outside of the last accessed section
+
+        :raises MemoryAccessException: If no section contains addr
+        """
+        sec = self.get_sec_containing(addr)
+        if sec is None:
+            if access == "read":
+                msg = "Trying to read data form invalid region at 0x{:x}! "
+            else:
+                msg = "Invalid write into non-initialized region at 0x{:08X}"
+            print(FMT_MEM + "[MMU] " + msg.format(addr) + FMT_NONE)
+            raise MemoryAccessException(
+                "region is non-initialized!", addr, size, access
+            )
+        self._mem_sec = sec
+        return sec
+
     def read(self, addr: Union[int, Int32], size: int) -> bytearray:
         """
         Read size bytes of memory at addr
@@ -127,21 +231,8 @@ class MMU:
         :return: The bytearray at addr
         """
         sec = self._mem_sec
-        if addr < sec.base or sec.base + sec.size <= addr:
-            sec = self.get_sec_containing(addr)
-            if sec is not None:
-                self._mem_sec = sec
-            else:
-                print(
-                    FMT_MEM
-                    + "[MMU] Trying to read data form invalid region at 0x{:x}! ".format(
-                        addr
-                    )
-                    + FMT_NONE
-                )
-                raise MemoryAccessException(
-                    "region is non-initialized!", addr, size, "read"
-                )
+        if sec is None or addr < sec.base or sec.base + sec.size <= addr:
+            sec = self._data_section(addr, size, "read")
         return sec.read(addr - sec.base, size)
 
     def write(self, addr: int, size: int, data: bytearray):
@@ -153,24 +244,122 @@ class MMU:
         :param data: The bytearray to write (only first size bytes are written)
         """
         sec = self._mem_sec
-        if addr < sec.base or sec.base + sec.size <= addr:
-            sec = self.get_sec_containing(addr)
-            if sec is not None:
-                self._mem_sec = sec
-            else:
-                print(
-                    FMT_MEM
-                    + "[MMU] Invalid write into non-initialized region at 0x{:08X}".format(
-                        addr
-                    )
-                    + FMT_NONE
-                )
-                raise MemoryAccessException(
-                    "region is non-initialized!", addr, size, "write"
-                )
-
+        if sec is None or addr < sec.base or sec.base + sec.size <= addr:
+            sec = self._data_section(addr, size, "write")
         return sec.write(addr - sec.base, size, data)
 
+    def read_value(self, addr: int, codec: struct.Struct):
+        """
+        Read a value of the type codec describes at addr, without allocating a
+        bytearray for plain data sections (see MemorySection.read_value)
+        """
+        sec = self._mem_sec
+        if sec is None or addr < sec.base or sec.base + sec.size <= addr:
+            sec = self._data_section(addr, codec.size, "read")
+        return sec.read_value(addr - sec.base, codec)
+
+    def write_value(self, addr: int, codec: struct.Struct, value):
+        """
+        Write value as the type codec describes at addr, see read_value
+        """
+        sec = self._mem_sec
+        if sec is None or addr < sec.base or sec.base + sec.size <= addr:
+            sec = self._data_section(addr, codec.size, "write")
+        sec.write_value(addr - sec.base, codec, value)
+
+    def read_u8(self, addr: int) -> int:
+        return self.read_value(addr, U8)
+
+    def read_u16(self, addr: int) -> int:
+        return self.read_value(addr, U16)
+
+    def read_u32(self, addr: int) -> int:
+        return self.read_value(addr, U32)
+
+    def read_i8(self, addr: int) -> int:
+        return self.read_value(addr, I8)
+
+    def read_i16(self, addr: int) -> int:
+        return self.read_value(addr, I16)
+
+    def read_i32(self, addr: int) -> int:
+        return self.read_value(addr, I32)
+
+    def read_f32(self, addr: int) -> float:
+        return self.read_value(addr, F32)
+
+    def read_f64(self, addr: int) -> float:
+        return self.read_value(addr, F64)
+
+    def write_u8(self, addr: int, value: int):
+        self.write_value(addr, U8, value)
+
+    def write_u16(self, addr: int, value: int):
+        self.write_value(addr, U16, value)
+
+    def write_u32(self, addr: int, value: int):
+        self.write_value(addr, U32, value)
+
+    def write_i8(self, addr: int, value: int):
+        self.write_value(addr, I8, value)
+
+    def write_i16(self, addr: int, value: int):
+        self.write_value(addr, I16, value)
+
+    def write_i32(self, addr: int, value: int):
+        self.write_value(addr, I32, value)
+
+    def write_f32(self, addr: int, value: float):
+        self.write_value(addr, F32, value)
+
+    def write_f64(self, addr: int, value: float):
+        self.write_value(addr, F64, value)
+
+    def set_access_hooks(self, hooks: List[Callable[[str, int, int, bytearray], None]]):
+        """
+        Call every hook in hooks with (access, addr, size, data) after each successful
+        read or write, where access is "read" or "write".
+
+        The hooks are installed by shadowing read, write, read_value and write_value on
+        this instance, so an MMU without hooks doesn't pay for them. Passing an empty
+        list removes them. The list is not copied, hooks added to it later are called
+        as well.
+        """
+        for name in ("read", "write", "read_value", "write_value"):
+            self.__dict__.pop(name, None)
+        if not hooks:
+            return
+        read, write = self.read, self.write
+        read_value, write_value = self.read_value, self.write_value
+
+        def read_hooked(addr: Union[int, Int32], size: int) -> bytearray:
+            data = read(addr, size)
+            for hook in hooks:
+                hook("read", int(addr), size, data)
+            return data
+
+        def write_hooked(addr: int, size: int, data: bytearray):
+            result = write(addr, size, data)
+            for hook in hooks:
+                hook("write", int(addr), size, data[:size])
+            return result
+
+        def read_value_hooked(addr: int, codec: struct.Struct):
+            value = read_value(addr, codec)
+            for hook in hooks:
+                hook("read", addr, codec.size, bytearray(codec.pack(value)))
+            return value
+
+        def write_value_hooked(addr: int, codec: struct.Struct, value):
+            write_value(addr, codec, value)
+            for hook in hooks:
+                hook("write", addr, codec.size, bytearray(codec.pack(value)))
+
+        self.read = read_hooked
+        self.write = write_hooked
+        self.read_value = read_value_hooked
+        self.write_value = write_value_hooked
+
     def dump(self, addr, *args, **kwargs):
         """
         Dumpy the memory contents
@@ -272,26 +461,27 @@ class MMU:
         )
 
     def has_continuous_free_region(self, start: int, end: int) -> bool:
-        # if we have no sections we are all good
-        if len(self.sections) == 0:
-            return True
-        # if the last section is located before the start we are also good
-        if start >= self.sections[-1].base + self.sections[-1].size:
+        # the only section that could overlap the region is the last one starting
+        # before its end, all sections before it end before its start
+        i = bisect.bisect_left(self._section_bases, end)
+        if i == 0:
             return True
+        sec = self.sections[i - 1]
+        return sec.base + sec.size <= start
 
-        for sec in self.sections:
-            # skip all sections that end before the required start point
-            if sec.base + sec.size <= start:
-                continue
-            # we now have the first section that doesn't end **before** the start point
-            # if this section starts after the specified end, we are good
-            if sec.base >= end:
-                return True
-            # otherwise we can't continue
-            return False
-        # if all sections end before the requested start we are good
-        # technically we shouldn't ever reach this point, but better safe than sorry
-        return True
+    def sections_in_range(self, start: int, end: int) -> List[MemorySection]:
+        """
+        Returns the loaded sections which are completely inside of start to end
+        """
+        return [
+            sec
+            for sec in self.sections[
+                bisect.bisect_left(self._section_bases, start) : bisect.bisect_left(
+                    self._section_bases, end
+                )
+            ]
+            if sec.base + sec.size <= end
+        ]
 
     def load_program(self, program: Program, align_to: int = 4):
         if program.base is not None:
@@ -316,14 +506,15 @@ class MMU:
 
             at_addr = program.base
         else:
-            at_addr = align_addr(self.get_guaranteed_free_address(), align_to)
+            at_addr = self._find_free_address(program.size, align_to)
 
         # trigger the load event to set all addresses in the binary
         program.loaded_trigger(at_addr)
 
         # add program and sections to internal state
         self.programs.append(program)
-        self.sections += program.sections
+        for sec in program.sections:
+            self._insert_section(sec)
         self._update_state()
 
         # load all global symbols from program
@@ -337,7 +528,7 @@ class MMU:
     def load_section(self, sec: MemorySection, fixed_position: bool = False) -> bool:
         if fixed_position:
             if self.has_continuous_free_region(sec.base, sec.base + sec.size):
-                self.sections.append(sec)
+                self._insert_section(sec)
                 self._update_state()
             else:
                 print(
@@ -348,21 +539,179 @@ class MMU:
                 )
                 return False
         else:
-            at_addr = align_addr(self.get_guaranteed_free_address(), 8)
-            sec.base = at_addr
-            self.sections.append(sec)
+            sec.base = self._find_free_address(sec.size, 8)
+            self._insert_section(sec)
             self._update_state()
         return True
 
+    def unload_section(self, sec: MemorySection) -> bool:
+        """
+        Remove a loaded section, its address range can be reused by later allocations.
+
+        :return: False if sec is not loaded
+        """
+        i = bisect.bisect_left(self._section_bases, sec.base)
+        while i < len(self.sections) and self.sections[i] is not sec:
+            if self._section_bases[i] != sec.base:
+                return False
+            i += 1
+        if i == len(self.sections):
+            return False
+        del self.sections[i]
+        del self._section_bases[i]
+        self._unmap_section(sec)
+        self._free_region(sec.base, sec.base + sec.size)
+        self._update_state()
+        return True
+
+    def resize_section(self, sec: "SparseMemorySection", size: int) -> bool:
+        """
+        Grow or shrink a loaded section in place.
+
+        :return: False if growing the section would overlap the next section
+        """
+        old_end = sec.base + sec.size
+        if size > sec.size and not self.has_continuous_free_region(
+            old_end, sec.base + size
+        ):
+            return False
+        self._unmap_section(sec)
+        sec.resize(size)
+        self._map_section(sec)
+        if sec.base + size < old_end:
+            self._free_region(sec.base + size, old_end)
+        else:
+            self._take_region(old_end, sec.base + size)
+        self._update_state()
+        return True
+
+    def _insert_section(self, sec: MemorySection):
+        """
+        Add sec to the sorted list of sections and the page table
+        """
+        i = bisect.bisect_right(self._section_bases, sec.base)
+        self.sections.insert(i, sec)
+        self._section_bases.insert(i, sec.base)
+        self._map_section(sec)
+        self._take_region(sec.base, sec.base + sec.size)
+        for dirty_pages in self.dirty_page_trackers:
+            dirty_pages.track(sec)
+
+    def _find_free_address(self, size: int, align_to: int) -> T_AbsoluteAddress:
+        """
+        Returns the address of the first free hole that fits size bytes, or the first
+        free address after all sections
+        """
+        for start, end in self._free_holes:
+            addr = align_addr(start, align_to)
+            if addr + size <= end:
+                return addr
+        return align_addr(self.get_guaranteed_free_address(), align_to)
+
+    def _free_region(self, start: int, end: int):
+        """
+        Add the range start to end to the free holes, merging it with adjacent holes
+        """
+        holes = self._free_holes
+        i = bisect.bisect_left(holes, (start, end))
+        if i > 0 and holes[i - 1][1] == start:
+            i -= 1
+            start = holes.pop(i)[0]
+        if i < len(holes) and holes[i][0] == end:
+            end = holes.pop(i)[1]
+        holes.insert(i, (start, end))
+        # everything after the last section is free anyway
+        top = self.get_guaranteed_free_address()
+        while holes and holes[-1][0] >= top:
+            holes.pop()
+
+    def _take_region(self, start: int, end: int):
+        """
+        Remove the range start to end from the free holes
+        """
+        holes = self._free_holes
+        for i in range(len(holes) - 1, -1, -1):
+            hole_start, hole_end = holes[i]
+            if hole_end <= start or end <= hole_start:
+                continue
+            holes[i : i + 1] = [
+                hole
+                for hole in ((hole_start, start), (end, hole_end))
+                if hole[0] < hole[1]
+            ]
+
     def _update_state(self):
         """
-        Called whenever a section or program is added to keep the list of programs and sections consistent
-        :return:
+        Called whenever a section or program is added or removed to keep the list of
+        programs consistent and reset the cached sections
         """
         self.programs.sort(key=lambda bin: bin.base)
-        self.sections.sort(key=lambda sec: sec.base)
-        self._mem_sec = self.sections[-1]
-        self._ins_sec = self.sections[-1]
+        last_sec = self.sections[-1] if self.sections else None
+        self._mem_sec = last_sec
+        self._ins_sec = last_sec
+
+    def snapshot(self) -> MemorySnapshot:
+        """
+        Capture the current contents of memory copy-on-write, see MemorySnapshot
+        """
+        return MemorySnapshot(self)
+
+    def restore(self, snapshot: MemorySnapshot):
+        """
+        Restore the memory captured by snapshot. Sections loaded since are unloaded,
+        sections unloaded or resized since are loaded again with their previous size.
+        """
+        loaded = {id(sec) for sec in snapshot.sections}
+        for sec in [sec for sec in self.sections if id(sec) not in loaded]:
+            self.unload_section(sec)
+        # shrink sections before growing others, so they don't overlap
+        current = {id(sec) for sec in self.sections}
+        for sec, size in zip(snapshot.sections, snapshot.sizes):
+            if id(sec) in current and size < sec.size:
+                self.resize_section(sec, size)
+        for sec, size in zip(snapshot.sections, snapshot.sizes):
+            if id(sec) not in current:
+                if size != sec.size:
+                    sec.resize(size)
+                self.load_section(sec, fixed_position=True)
+            elif size > sec.size:
+                self.resize_section(sec, size)
+        snapshot.write_back()
+
+        self.programs[:] = snapshot.programs
+        self.global_symbols.clear()
+        self.global_symbols.update(snapshot.global_symbols)
+        self._free_holes = list(snapshot.free_holes)
+        self._update_state()
+
+    def track_dirty_pages(self) -> DirtyPageTracker:
+        """
+        Start tracking which pages of the loaded sections, and of sections loaded later,
+        are written. Writes are slightly slower until the tracker is released, sections
+        without trackers are not slowed down at all.
+        """
+        dirty_pages = DirtyPageTracker(self)
+        for sec in self.sections:
+            dirty_pages.track(sec)
+        self.dirty_page_trackers.append(dirty_pages)
+        return dirty_pages
+
+    def copy(self) -> "MMU":
+        """
+        Returns an MMU with copies of all sections and programs (see UserModeCPU.fork)
+        """
+        mmu = type(self)()
+        copies = {id(sec): sec.copy() for sec in self.sections}
+        for sec in self.sections:
+            mmu._insert_section(copies[id(sec)])
+        for program in self.programs:
+            program = copy.copy(program)
+            program.sections = [copies.get(id(sec), sec) for sec in program.sections]
+            mmu.programs.append(program)
+        mmu.global_symbols.update(self.global_symbols)
+        mmu._free_holes = list(self._free_holes)
+        mmu._update_state()
+        return mmu
 
     def get_guaranteed_free_address(self) -> T_AbsoluteAddress:
         if len(self.sections) == 0:
@@ -383,6 +732,20 @@ class MMU:
 
         return InstructionContext()
 
+    def find_symbol(self, symb: str) -> Optional[T_AbsoluteAddress]:
+        """
+        Resolve a symbol to its address. Global symbols take precedence over local labels.
+
+        :param symb: The symbol name to look up
+        :return: The address, or None if no program defines the symbol
+        """
+        if symb in self.global_symbols:
+            return self.global_symbols[symb]
+        for p in self.programs:
+            if symb in p.context.labels:
+                return p.context.resolve_label(symb)
+        return None
+
     def find_entrypoint(self) -> Optional[int]:
         # try to find the global entrypoint
         if "_start" in self.global_symbols:
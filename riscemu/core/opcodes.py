@@ -0,0 +1,39 @@
+"""
+RiscEmu (c) 2023 Anton Lydike
+
+SPDX-License-Identifier: MIT
+
+Instruction names are interned into small integer opcodes when instructions are created,
+so that the CPU can dispatch through a list indexed by opcode instead of hashing names.
+The names are only kept in OPCODE_NAMES, for display.
+"""
+
+from typing import Dict, List
+
+OPCODE_NAMES: List[str] = []
+"""
+The instruction name of each opcode
+"""
+
+_OPCODES: Dict[str, int] = dict()
+
+
+def opcode_for(name: str) -> int:
+    """
+    Return the opcode of the instruction name, assigning a new one on first use.
+
+    Opcodes are only valid within one process, persist names instead.
+    """
+    opcode = _OPCODES.get(name)
+    if opcode is None:
+        opcode = len(OPCODE_NAMES)
+        OPCODE_NAMES.append(name)
+        _OPCODES[name] = opcode
+    return opcode
+
+
+def opcode_name(opcode: int) -> str:
+    """
+    Return the instruction name of opcode.
+    """
+    return OPCODE_NAMES[opcode]
@@ -4,12 +4,83 @@ RiscEmu (c) 2023 Anton Lydike
 SPDX-License-Identifier: MIT
 """
 
+import math
+import struct
 from collections import defaultdict
-from typing import Type
+from typing import Dict, List, Type
 
 from ..helpers import *
 
-from . import Int32, BaseFloat
+from . import Int32, BaseFloat, Float32
+
+
+REGISTER_NAMES = (
+    "zero",
+    "ra",
+    "sp",
+    "gp",
+    "tp",
+    "t0",
+    "t1",
+    "t2",
+    "s0",
+    "s1",
+    "a0",
+    "a1",
+    "a2",
+    "a3",
+    "a4",
+    "a5",
+    "a6",
+    "a7",
+    "s2",
+    "s3",
+    "s4",
+    "s5",
+    "s6",
+    "s7",
+    "s8",
+    "s9",
+    "s10",
+    "s11",
+    "t3",
+    "t4",
+    "t5",
+    "t6",
+)
+"""
+The ABI name of each integer register, indexed by register number
+"""
+
+REGISTER_NUMBERS: Dict[str, int] = {
+    **{name: num for num, name in enumerate(REGISTER_NAMES)},
+    "fp": 8,
+}
+"""
+The register number of each integer register name, including the fp alias of s0
+"""
+
+FLOAT_REGISTER_NAMES = (
+    *("ft{}".format(i) for i in range(8)),
+    "fs0",
+    "fs1",
+    *("fa{}".format(i) for i in range(8)),
+    *("fs{}".format(i) for i in range(2, 12)),
+    *("ft{}".format(i) for i in range(8, 12)),
+)
+"""
+The ABI name of each floating point register, indexed by register number
+"""
+
+NAN_BOX = 0xFFFFFFFF
+"""
+The upper 32 bits of a single precision value in a 64 bit float register
+"""
+
+# codecs for the raw float register file, see Registers.f
+_F32 = struct.Struct("<f")
+_F64 = struct.Struct("<d")
+_BOXED_F32 = struct.Struct("<fI")
 
 
 class Registers:
@@ -91,12 +162,46 @@ class Registers:
     flen: int
     _float_type: Type[BaseFloat]
 
+    x: List[int]
+    """
+    The values of x0-x31 as signed python integers, indexed by register number (see
+    REGISTER_NUMBERS). x[0] is always zero.
+    """
+
+    extra_vals: Dict[str, Int32]
+    """
+    The values of additional registers (only with infinite_regs)
+    """
+
+    f: bytearray
+    """
+    The raw contents of the floating point registers, flen // 8 bytes per register in
+    little endian. Single precision values in 64 bit registers are NaN-boxed.
+    """
+
+    f_offsets: Dict[str, int]
+    """
+    The offset of each floating point register in f, including additional registers
+    (only with infinite_regs)
+    """
+
+    track_access: bool
+    """
+    If True, get and set record the last read and written register for dump
+    """
+
     def __init__(self, infinite_regs: bool = False, flen: int = 32):
-        self.vals: dict[str, Int32] = defaultdict(UInt32)
+        self.x = [0] * 32
+        self.extra_vals = defaultdict(Int32)
         self.flen = flen
         self._float_type = BaseFloat.flen_to_cls(flen)
-        self.float_vals: dict[str, BaseFloat] = defaultdict(self._float_type)
+        self._f_size = flen // 8
+        self.f = bytearray(32 * self._f_size)
+        self.f_offsets = {
+            name: num * self._f_size for num, name in enumerate(FLOAT_REGISTER_NAMES)
+        }
 
+        self.track_access = False
         self.last_set = None
         self.last_read = None
 
@@ -186,21 +291,20 @@ class Registers:
         :param mark_set: If True, marks this register as "last accessed" (only used internally)
         :return: If the operation was successful
         """
+        num = REGISTER_NUMBERS.get(reg)
+        if num is None:
+            if not self.infinite_regs:
+                raise RuntimeError("Invalid register: {}".format(reg))
+            if mark_set and self.track_access:
+                self.last_set = reg
+            self.extra_vals[reg] = val.signed()
+            return True
 
-        if reg == "zero":
+        if num == 0:
             return False
-        # if reg not in Registers.all_registers():
-        #    raise InvalidRegisterException(reg)
-        # replace fp register with s1, as these are the same register
-        if reg == "fp":
-            reg = "s1"
-        if mark_set:
-            self.last_set = reg
-
-        if not self.infinite_regs and reg not in self.valid_regs:
-            raise RuntimeError("Invalid register: {}".format(reg))
-
-        self.vals[reg] = val.signed()
+        if mark_set and self.track_access:
+            self.last_set = REGISTER_NAMES[num]
+        self.x[num] = val.signed().value
         return True
 
     def get(self, reg: str, mark_read: bool = True) -> Int32:
@@ -210,27 +314,114 @@ class Registers:
         :param mark_read: If the register should be marked as "last read" (only used internally)
         :return: The contents of register reg
         """
-        # if reg not in Registers.all_registers():
-        #    raise InvalidRegisterException(reg)
-        if reg == "fp":
-            reg = "s0"
+        num = REGISTER_NUMBERS.get(reg)
+        if num is None:
+            if not self.infinite_regs:
+                raise RuntimeError("Invalid register: {}".format(reg))
+            if mark_read and self.track_access:
+                self.last_read = reg
+            return self.extra_vals[reg]
 
-        if not self.infinite_regs and reg not in self.valid_regs:
-            raise RuntimeError("Invalid register: {}".format(reg))
+        if mark_read and self.track_access:
+            self.last_read = REGISTER_NAMES[num]
+        return Int32(self.x[num])
 
-        if mark_read:
-            self.last_read = reg
-        return self.vals[reg]
+    def get_int(self, reg: str) -> int:
+        """
+        Like get, but returns the contents of reg as a signed python integer, without
+        allocating an Int32
+        """
+        num = REGISTER_NUMBERS.get(reg)
+        if num is None:
+            return self.get(reg).value
+        if self.track_access:
+            self.last_read = REGISTER_NAMES[num]
+        return self.x[num]
+
+    def set_int(self, reg: str, val: int) -> bool:
+        """
+        Like set, but takes a python integer, which is wrapped to 32 bits
+        """
+        num = REGISTER_NUMBERS.get(reg)
+        if num is None:
+            return self.set(reg, Int32(val))
+        if num == 0:
+            return False
+        if self.track_access:
+            self.last_set = REGISTER_NAMES[num]
+        self.x[num] = ((val + 0x80000000) & 0xFFFFFFFF) - 0x80000000
+        return True
+
+    def _f_offset(self, reg: str) -> int:
+        offset = self.f_offsets.get(reg)
+        if offset is None:
+            if not self.infinite_regs:
+                raise RuntimeError("Invalid float register: {}".format(reg))
+            offset = self.f_offsets[reg] = len(self.f)
+            self.f.extend(bytes(self._f_size))
+        return offset
 
     def get_f(self, reg: str) -> BaseFloat:
-        if not self.infinite_regs and reg not in self.float_regs:
-            raise RuntimeError("Invalid float register: {}".format(reg))
-        return self.float_vals[reg]
+        """
+        Returns the contents of float register reg, a Float32 for NaN-boxed single
+        precision values, otherwise a float of flen bits.
+        """
+        offset = self._f_offset(reg)
+        if self.flen == 64:
+            val, upper = _BOXED_F32.unpack_from(self.f, offset)
+            if upper == NAN_BOX:
+                return Float32(val)
+            return self._float_type(_F64.unpack_from(self.f, offset)[0])
+        return self._float_type(_F32.unpack_from(self.f, offset)[0])
 
     def set_f(self, reg: str, val: BaseFloat):
-        if not self.infinite_regs and reg not in self.float_regs:
-            raise RuntimeError("Invalid float register: {}".format(reg))
-        self.float_vals[reg] = self._float_type.bitcast(val)
+        """
+        Set float register reg to val. Float32 values are NaN-boxed if flen is 64.
+        """
+        if isinstance(val, Float32):
+            self.set_f32(reg, val.value)
+            return
+        offset = self._f_offset(reg)
+        self.f[offset : offset + self._f_size] = self._float_type.bitcast(val).bytes
+
+    def get_f32(self, reg: str) -> float:
+        """
+        Returns the single precision value in reg as a python float. Values which are not
+        NaN-boxed read as NaN.
+        """
+        offset = self._f_offset(reg)
+        if self.flen == 32:
+            return _F32.unpack_from(self.f, offset)[0]
+        val, upper = _BOXED_F32.unpack_from(self.f, offset)
+        if upper != NAN_BOX:
+            return math.nan
+        return val
+
+    def set_f32(self, reg: str, val: float):
+        """
+        Round val to single precision and write it into reg
+        """
+        offset = self._f_offset(reg)
+        try:
+            if self.flen == 64:
+                _BOXED_F32.pack_into(self.f, offset, val, NAN_BOX)
+            else:
+                _F32.pack_into(self.f, offset, val)
+        except OverflowError:
+            # rounds to infinity, like c_float does
+            self.set_f32(reg, math.copysign(math.inf, val))
+
+    def get_f64(self, reg: str) -> float:
+        """
+        Returns the double precision value in reg as a python float (requires flen 64)
+        """
+        return _F64.unpack_from(self.f, self._f_offset(reg))[0]
+
+    def set_f64(self, reg: str, val: float):
+        """
+        Write the double precision value val into reg (requires flen 64)
+        """
+        _F64.pack_into(self.f, self._f_offset(reg), val)
 
     @staticmethod
     def named_registers():
@@ -1,6 +1,5 @@
 import re
-from typing import Union, Tuple
-from functools import lru_cache
+from typing import Union, Tuple, Optional
 
 from . import (
     Instruction,
@@ -8,6 +7,8 @@ from . import (
     InstructionContext,
     Immediate,
     NumberFormatException,
+    ParseException,
+    opcode_for,
 )
 from ..helpers import parse_numeric_argument
 
@@ -16,6 +17,8 @@ _INT_IMM_RE = re.compile(r"[+-]?([0-9]+|0x[A-Fa-f0-9]+)")
 
 
 class SimpleInstruction(Instruction):
+    __slots__ = ("context", "opcode", "args", "_addr", "_immediates")
+
     def __init__(
         self,
         name: str,
@@ -24,16 +27,49 @@ class SimpleInstruction(Instruction):
         addr: T_RelativeAddress,
     ):
         self.context = context
-        self.name = name
+        self.opcode = opcode_for(name)
         self.args = args
         self._addr = addr
+        self._immediates: Optional[Tuple[Optional[Immediate], ...]] = None
 
     @property
     def addr(self) -> int:
         return self._addr + self.context.base_address
 
-    @lru_cache(maxsize=None)
     def get_imm(self, num: int) -> Immediate:
+        if self._immediates is None:
+            self.link()
+        imm = self._immediates[num]
+        if imm is None:
+            # not resolvable at link time, this raises a descriptive error
+            return self._resolve_imm(num)
+        return imm
+
+    def get_reg(self, num: int) -> str:
+        return self.args[num]
+
+    def link(self):
+        """
+        Resolve all arguments that are numbers, labels, numbered labels or global
+        symbols into their final absolute and pc-relative values, so that get_imm
+        is a simple lookup afterwards.
+
+        Must be called after the program was loaded, as the values depend on the
+        final address of the instruction. The symbolic arguments are kept in args
+        for display.
+
+        Arguments that can't be resolved (register names, CSR names, undefined
+        symbols, etc.) are resolved by get_imm when they are used.
+        """
+        immediates = []
+        for num in range(len(self.args)):
+            try:
+                immediates.append(self._resolve_imm(num))
+            except (NumberFormatException, ParseException):
+                immediates.append(None)
+        self._immediates = tuple(immediates)
+
+    def _resolve_imm(self, num: int) -> Immediate:
         token = self.args[num]
 
         if _INT_IMM_RE.fullmatch(token):
@@ -46,12 +82,8 @@ class SimpleInstruction(Instruction):
         else:
             value = self.context.resolve_label(token)
 
-        # TODO: make it raise a nice error instead
         if value is None:
             raise NumberFormatException(
                 "{} is neither a number now a known symbol".format(token)
             )
         return Immediate(abs_value=value, pcrel_value=value - self.addr)
-
-    def get_reg(self, num: int) -> str:
-        return self.args[num]
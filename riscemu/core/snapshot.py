@@ -0,0 +1,209 @@
+"""
+RiscEmu (c) 2023 Anton Lydike
+
+SPDX-License-Identifier: MIT
+"""
+
+import typing
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+from . import MemorySection, T_RelativeAddress
+from .instruction_memory_section import InstructionMemorySection
+from .sparse_memory_section import PAGE_SIZE
+
+if typing.TYPE_CHECKING:
+    from . import MMU, Program
+
+
+class MemorySnapshot:
+    """
+    The memory of an MMU at some point in time, see MMU.snapshot and MMU.restore.
+
+    Memory is captured copy-on-write: the snapshot registers a write tracker on every
+    section, which saves the contents of a page the first time it is modified. Taking a
+    snapshot therefore only costs the pages that are written afterwards.
+    """
+
+    sections: List[MemorySection]
+    """
+    The loaded sections
+    """
+
+    sizes: List[int]
+    """
+    The sizes of the loaded sections (they can be resized, see MMU.resize_section)
+    """
+
+    programs: List["Program"]
+    global_symbols: Dict[str, int]
+    free_holes: List[Tuple[int, int]]
+
+    other_state: Dict[str, Any]
+    """
+    The state of MMU subclasses, such as the pages created on demand by the PrivMMU
+    """
+
+    original_pages: Dict[int, Dict[int, bytes]]
+    """
+    The contents the pages modified since the snapshot was taken had at that time, by
+    section id and page index
+    """
+
+    _trackers: List[Tuple[MemorySection, Callable[[T_RelativeAddress, int], None]]]
+
+    def __init__(self, mmu: "MMU"):
+        self.sections = list(mmu.sections)
+        self.sizes = [sec.size for sec in self.sections]
+        self.programs = list(mmu.programs)
+        self.global_symbols = dict(mmu.global_symbols)
+        self.free_holes = list(mmu._free_holes)
+        self.other_state = dict()
+        self.original_pages = dict()
+        self._trackers = []
+        for sec in self.sections:
+            self.track(sec)
+
+    def track(self, sec: MemorySection):
+        """
+        Save the contents of the pages of sec before they are modified
+        """
+        # instructions can't be modified
+        if isinstance(sec, InstructionMemorySection):
+            return
+        pages: Dict[int, bytes] = self.original_pages.setdefault(id(sec), dict())
+
+        def tracker(offset: T_RelativeAddress, size: int):
+            # out of bounds writes fail in the section
+            end = min(offset + size, sec.size)
+            for index in range(offset // PAGE_SIZE, (end - 1) // PAGE_SIZE + 1):
+                if index not in pages:
+                    start = index * PAGE_SIZE
+                    pages[index] = bytes(
+                        sec.read(start, min(PAGE_SIZE, sec.size - start))
+                    )
+
+        sec.add_write_tracker(tracker)
+        self._trackers.append((sec, tracker))
+
+    def write_back(self):
+        """
+        Write the saved pages back into their sections. The snapshot stays valid, it can
+        be restored again later.
+        """
+        for sec, _ in self._trackers:
+            for index, data in self.original_pages[id(sec)].items():
+                start = index * PAGE_SIZE
+                size = min(len(data), sec.size - start)
+                # also skips pages of read-only sections, whose writes failed
+                if size > 0 and sec.read(start, size) != data[:size]:
+                    sec.write(start, size, bytearray(data[:size]))
+
+    def release(self):
+        """
+        Stop tracking writes, the snapshot can't be restored afterwards
+        """
+        for sec, tracker in self._trackers:
+            sec.remove_write_tracker(tracker)
+        self._trackers.clear()
+        self.original_pages.clear()
+
+
+class DirtyPageTracker:
+    """
+    Tracks which pages of the sections of an MMU were written since the last time it
+    was cleared, see MMU.track_dirty_pages.
+
+    Page i of a section covers the offsets i * PAGE_SIZE up to (i + 1) * PAGE_SIZE,
+    relative to the base of the section.
+    """
+
+    mmu: "MMU"
+
+    pages: Dict[int, Set[int]]
+    """
+    The indices of the written pages, by section id
+    """
+
+    _trackers: List[Tuple[MemorySection, Callable[[T_RelativeAddress, int], None]]]
+
+    def __init__(self, mmu: "MMU"):
+        self.mmu = mmu
+        self.pages = dict()
+        self._trackers = []
+
+    def track(self, sec: MemorySection):
+        """
+        Track the writes to sec, unless they are tracked already
+        """
+        # instructions can't be modified, unloaded sections can be loaded again
+        if isinstance(sec, InstructionMemorySection) or id(sec) in self.pages:
+            return
+        pages: Set[int] = set()
+        self.pages[id(sec)] = pages
+
+        def tracker(offset: T_RelativeAddress, size: int):
+            # out of bounds writes fail in the section
+            end = min(offset + size, sec.size)
+            if end > offset:
+                pages.update(range(offset // PAGE_SIZE, (end - 1) // PAGE_SIZE + 1))
+
+        sec.add_write_tracker(tracker)
+        self._trackers.append((sec, tracker))
+
+    def dirty_pages(self, clear: bool = False) -> List[Tuple[MemorySection, List[int]]]:
+        """
+        Returns the sections with written pages, and the sorted indices of these pages.
+
+        :param clear: Forget the written pages afterwards (see clear)
+        """
+        result = [
+            (sec, sorted(self.pages[id(sec)]))
+            for sec, _ in self._trackers
+            if self.pages[id(sec)]
+        ]
+        if clear:
+            self.clear()
+        return result
+
+    def clear(self):
+        """
+        Forget all written pages, only pages written from now on are reported
+        """
+        for pages in self.pages.values():
+            pages.clear()
+
+    def release(self):
+        """
+        Stop tracking writes
+        """
+        for sec, tracker in self._trackers:
+            sec.remove_write_tracker(tracker)
+        self._trackers.clear()
+        self.pages.clear()
+        self.mmu.dirty_page_trackers.remove(self)
+
+
+class Snapshot:
+    """
+    The state of a CPU at some point of its execution, see CPU.snapshot.
+
+    Snapshots can be restored any number of times. Call release once a snapshot isn't
+    needed anymore, as writes to memory are slower while snapshots are held.
+    """
+
+    memory: MemorySnapshot
+
+    state: Dict[str, Any]
+    """
+    The state of the CPU (registers, pc, cycle, ...), see CPU.capture_state
+    """
+
+    def __init__(self, memory: MemorySnapshot, state: Dict[str, Any]):
+        self.memory = memory
+        self.state = state
+
+    def release(self):
+        """
+        Stop tracking writes to memory, the snapshot can't be restored afterwards
+        """
+        self.memory.release()
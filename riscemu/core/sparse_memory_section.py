@@ -0,0 +1,205 @@
+"""
+RiscEmu (c) 2023 Anton Lydike
+
+SPDX-License-Identifier: MIT
+"""
+
+import struct
+from typing import ClassVar, Dict, Optional, Tuple, Union
+
+from . import (
+    MemorySection,
+    InstructionContext,
+    MemoryFlags,
+    T_RelativeAddress,
+    Instruction,
+)
+from .exceptions import MemoryAccessException
+
+PAGE_SIZE = 4096
+"""
+The size of the pages of a SparseMemorySection
+"""
+
+ZERO_PAGE = bytes(PAGE_SIZE)
+"""
+The contents of all pages which were never written
+"""
+
+
+class SparseMemorySection(MemorySection):
+    """
+    A data section whose pages are only allocated when they are first written to. Reads
+    of untouched pages return zeros.
+
+    This is used for memory which is mostly reserved, but not necessarily used, such as
+    the stack, zero filled data (.bss, .space, .zero) and anonymous mmaps.
+    """
+
+    pages: Dict[int, bytearray]
+    """
+    The allocated pages, by their index in the section (offset // PAGE_SIZE)
+    """
+
+    _tracked_methods: ClassVar[Tuple[str, ...]] = ("write", "write_value", "resize")
+
+    def __init__(
+        self,
+        size: int,
+        name: str,
+        context: Optional[InstructionContext],
+        owner: str,
+        base: int = 0,
+        flags: Optional[MemoryFlags] = None,
+    ):
+        super().__init__(
+            name,
+            flags if flags is not None else MemoryFlags(False, False),
+            size,
+            base,
+            owner,
+            context,
+        )
+        self.pages = dict()
+
+    @classmethod
+    def from_data(
+        cls,
+        data: bytearray,
+        name: str,
+        context: Optional[InstructionContext],
+        owner: str,
+        base: int = 0,
+        flags: Optional[MemoryFlags] = None,
+    ) -> "SparseMemorySection":
+        """
+        Create a section containing data, allocating only the pages that aren't zero.
+        """
+        sec = cls(len(data), name, context, owner, base, flags)
+        for start in range(0, len(data), PAGE_SIZE):
+            page = data[start : start + PAGE_SIZE]
+            if page.count(0) != len(page):
+                page.extend(bytes(PAGE_SIZE - len(page)))
+                sec.pages[start // PAGE_SIZE] = page
+        return sec
+
+    @staticmethod
+    def has_zero_pages(data: bytearray) -> bool:
+        """
+        Returns True if data contains at least one page of zeros, so that a sparse
+        section holding it uses less memory.
+        """
+        return any(
+            data[start : start + PAGE_SIZE] == ZERO_PAGE
+            for start in range(0, len(data) - PAGE_SIZE + 1, PAGE_SIZE)
+        )
+
+    def page(
+        self, offset: T_RelativeAddress, allocate: bool = True
+    ) -> Tuple[Union[bytearray, bytes], int, int]:
+        """
+        Return the page containing offset (allocating it if necessary), the position of
+        offset in it and the number of bytes of the section available from there.
+
+        :param allocate: If False, ZERO_PAGE is returned for pages which were never
+                         written, so only reads are possible
+        """
+        index, start = divmod(offset, PAGE_SIZE)
+        page = self.pages.get(index)
+        if page is None:
+            if allocate:
+                page = self.pages[index] = bytearray(PAGE_SIZE)
+            else:
+                page = ZERO_PAGE
+        return page, start, min(PAGE_SIZE, self.size - index * PAGE_SIZE) - start
+
+    def resize(self, size: int):
+        """
+        Change the size of the section. Memory past the new end is discarded, so it reads
+        as zeros if the section grows again.
+        """
+        if size < self.size:
+            index, start = divmod(size, PAGE_SIZE)
+            for i in [i for i in self.pages if i >= index + (start > 0)]:
+                del self.pages[i]
+            if start > 0 and index in self.pages:
+                self.pages[index][start:] = bytes(PAGE_SIZE - start)
+        self.size = size
+
+    def _track_writes(self):
+        super()._track_writes()
+
+        def resize(size: int):
+            if size < self.size:
+                for tracker in self.write_trackers:
+                    tracker(size, self.size - size)
+            return type(self).resize(self, size)
+
+        self.resize = resize
+
+    def copy(self) -> "SparseMemorySection":
+        sec = type(self)(
+            self.size, self.name, self.context, self.owner, self.base, self.flags
+        )
+        sec.pages = {index: bytearray(page) for index, page in self.pages.items()}
+        return sec
+
+    def read(self, offset: T_RelativeAddress, size: int) -> bytearray:
+        if offset + size > self.size:
+            raise MemoryAccessException(
+                "Out of bounds access in {}".format(self), offset, size, "read"
+            )
+        index, start = divmod(offset, PAGE_SIZE)
+        if start + size <= PAGE_SIZE:
+            page = self.pages.get(index)
+            if page is None:
+                return bytearray(size)
+            return page[start : start + size]
+        result = bytearray()
+        while size > 0:
+            index, start = divmod(offset, PAGE_SIZE)
+            count = min(size, PAGE_SIZE - start)
+            result += self.pages.get(index, ZERO_PAGE)[start : start + count]
+            offset += count
+            size -= count
+        return result
+
+    def write(self, offset: T_RelativeAddress, size: int, data: bytearray):
+        if offset + size > self.size:
+            raise MemoryAccessException(
+                "Out of bounds access in {}".format(self), offset, size, "write"
+            )
+        data = data[0:size]
+        if len(data) != size:
+            raise MemoryAccessException(
+                "Invalid write parameter sizing", offset, size, "write"
+            )
+        pos = 0
+        while pos < size:
+            page, start, _ = self.page(offset + pos)
+            count = min(size - pos, PAGE_SIZE - start)
+            page[start : start + count] = data[pos : pos + count]
+            pos += count
+
+    def read_value(self, offset: T_RelativeAddress, codec: struct.Struct):
+        index, start = divmod(offset, PAGE_SIZE)
+        if start + codec.size > PAGE_SIZE or offset + codec.size > self.size:
+            return super().read_value(offset, codec)
+        return codec.unpack_from(self.pages.get(index, ZERO_PAGE), start)[0]
+
+    def write_value(self, offset: T_RelativeAddress, codec: struct.Struct, value):
+        index, start = divmod(offset, PAGE_SIZE)
+        if start + codec.size > PAGE_SIZE or offset + codec.size > self.size:
+            return super().write_value(offset, codec, value)
+        page = self.pages.get(index)
+        if page is None:
+            page = self.pages[index] = bytearray(PAGE_SIZE)
+        codec.pack_into(page, start, value)
+
+    def read_ins(self, offset: T_RelativeAddress) -> Instruction:
+        raise MemoryAccessException(
+            "Tried reading instruction on non-executable section {}".format(self),
+            offset,
+            4,
+            "instruction fetch",
+        )
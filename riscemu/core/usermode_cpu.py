@@ -6,27 +6,32 @@ SPDX-License-Identifier: MIT
 This file contains the CPU logic (not the individual instruction sets). See instructions/instruction_set.py for more info
 on them.
 """
+import time
 import typing
-from typing import List, Type
+from typing import Any, Dict, List, Type, Optional, Union
 
 from ..config import RunConfig
 from ..colors import FMT_CPU, FMT_NONE, FMT_ERROR, FMT_GRAY, FMT_CYAN
 from ..debug import launch_debug_session
-from ..syscall import SyscallInterface, get_syscall_symbols
+from ..syscall import Syscall, SyscallInterface, get_syscall_symbols
 from . import (
     CPU,
     Int32,
-    BinaryDataMemorySection,
+    SparseMemorySection,
     MMU,
     RiscemuBaseException,
     LaunchDebuggerException,
     PrivModes,
     Instruction,
+    REGISTER_NUMBERS,
     SimpleInstruction,
+    T_AbsoluteAddress,
 )
+from .hostcall import HostCall, SYSCALL_ARGS
 
 if typing.TYPE_CHECKING:
     from ..instructions import InstructionSet
+    from ..jit import BlockCompiler
 
 
 class UserModeCPU(CPU):
@@ -36,6 +41,23 @@ class UserModeCPU(CPU):
     It is initialized with a configuration and a list of instruction sets.
     """
 
+    block_compiler: Optional["BlockCompiler"]
+
+    deadline: Optional[float]
+    """
+    The time.monotonic() value at which the runtime budget is exceeded
+    """
+
+    BUDGET_EXCEEDED_EXIT_CODE = 124
+    """
+    The exit code of programs stopped because they exceeded their budget
+    """
+
+    budget_check_interval: int = 10000
+    """
+    Maximum number of instructions executed between two budget checks
+    """
+
     def __init__(self, instruction_sets: List[Type["InstructionSet"]], conf: RunConfig):
         """
         Creates a CPU instance.
@@ -56,6 +78,71 @@ class UserModeCPU(CPU):
         self.mmu.global_symbols.update(syscall_symbols)
         self.mode = PrivModes.USER
 
+        # created on first use, see run_compiled
+        self.block_compiler = None
+
+        # set on the first run, see start_budget
+        self.deadline = None
+        # idioms must not run past the instruction budget, see run_fast
+        self.fast_forward_limit = conf.max_instructions
+        # instructions decoded while instrumented, see _dispatch_instrumented
+        self._instrumented_ops = dict()
+
+    def add_native_function(
+        self, addr: T_AbsoluteAddress, func: typing.Callable[[], bool]
+    ):
+        super().add_native_function(addr, func)
+        if self.block_compiler is not None:
+            # blocks compiled before are replaced by the native function
+            self.block_compiler.blocks[addr] = None
+
+    def register_hostcall(
+        self, target: Union[int, str], fn: typing.Callable[[HostCall], None]
+    ):
+        """
+        Register the python function fn as the custom instruction named target (see
+        CPU.register_hostcall), or as the syscall number target. Syscall host calls get
+        the registers a0-a6 as operands, and replace built-in syscalls.
+        """
+        if isinstance(target, str):
+            return super().register_hostcall(target, fn)
+
+        def syscall(scall: Syscall):
+            with HostCall(scall.cpu, SYSCALL_ARGS) as call:
+                fn(call)
+
+        self.syscall_int.register(target, syscall)
+
+    def capture_state(self) -> Dict[str, Any]:
+        state = super().capture_state()
+        state["exit_code"] = self.exit_code
+        # the files themselves are shared, only which ones are open is captured
+        state["open_files"] = dict(self.syscall_int.open_files)
+        state["next_open_handle"] = self.syscall_int.next_open_handle
+        return state
+
+    def restore_state(self, state: Dict[str, Any]):
+        super().restore_state(state)
+        self.exit_code = state["exit_code"]
+        self.syscall_int.open_files = dict(state["open_files"])
+        self.syscall_int.next_open_handle = state["next_open_handle"]
+
+    def fork(self) -> "UserModeCPU":
+        """
+        Returns an independent copy of the CPU, with a copy of its memory. Syscalls
+        registered at runtime are kept, hooks, native functions and host calls
+        registered as instructions are not.
+
+        Unlike snapshot, this copies all memory that was written so far.
+        """
+        cpu = UserModeCPU(
+            [type(ins_set) for ins_set in self.instruction_sets], self.conf
+        )
+        cpu.mmu = self.mmu.copy()
+        cpu.syscall_int.handlers.update(self.syscall_int.handlers)
+        cpu.restore_state(self.capture_state())
+        return cpu
+
     def step(self, verbose: bool = False):
         """
         Execute a single instruction, then return.
@@ -64,15 +151,24 @@ class UserModeCPU(CPU):
 
         try:
             self.cycle += 1
-            ins = self.mmu.read_ins(self.pc)
-            if verbose:
-                if self.conf.verbosity > 2:
-                    ins_str = self._format_ins(ins)
-                else:
-                    ins_str = str(ins)
-                print(FMT_CPU + "   0x{:08X}:{} {}".format(self.pc, FMT_NONE, ins_str))
+            pc = self.pc
+            instrumented = self.instrumented
+            if verbose or instrumented:
+                ins = self.mmu.read_ins(pc)
+                # don't run fused instructions, so that every instruction is traced
+                op = self.decode_instruction(ins)
+                if verbose:
+                    if self.conf.verbosity > 2:
+                        ins_str = self._format_ins(ins)
+                    else:
+                        ins_str = str(ins)
+                    print(FMT_CPU + "   0x{:08X}:{} {}".format(pc, FMT_NONE, ins_str))
+            else:
+                op = self.fetch_op(pc)
             self.pc += self.INS_XLEN
-            self.run_instruction(ins)
+            op()
+            if instrumented:
+                self._call_retire_hooks(pc, ins)
         except RiscemuBaseException as ex:
             if isinstance(ex, LaunchDebuggerException):
                 # if the debugger is active, raise the exception to
@@ -82,16 +178,20 @@ class UserModeCPU(CPU):
                 print(FMT_CPU + "[CPU] Debugger launch requested!" + FMT_NONE)
                 launch_debugger = True
             else:
-                print(ex.message())
-                ex.print_stacktrace()
-                print(FMT_CPU + "[CPU] Halting due to exception!" + FMT_NONE)
-                self.halted = True
+                self._halt_on_exception(ex)
 
         if launch_debugger:
             launch_debug_session(self)
 
     def run(self, verbose: bool = False):
-        while not self.halted:
+        self.start_budget()
+        if self.conf.use_jit and not verbose and not self.instrumented:
+            self.run_compiled()
+        elif not verbose and type(self).step is UserModeCPU.step:
+            # subclasses overriding step (e.g. snitchs frep) must always go through it
+            self.run_fast()
+
+        while not self.halted and not self._budget_exceeded():
             self.step(verbose)
 
         if self.conf.verbosity > 0:
@@ -101,14 +201,282 @@ class UserModeCPU(CPU):
                 + FMT_NONE
             )
 
+    def run_for(self, max_instructions: int) -> int:
+        """
+        Execute at most max_instructions instructions, stopping early if the CPU halts.
+
+        :return: The number of executed instructions
+        """
+        self.start_budget()
+        return self.run_fast(max_instructions=max_instructions)
+
+    def run_until(
+        self,
+        target: Union[T_AbsoluteAddress, str],
+        max_instructions: Optional[int] = None,
+    ) -> bool:
+        """
+        Run until the pc reaches target, which is an address or a symbol name. At least
+        one instruction is executed, so this can be called repeatedly to stop at target
+        every time it is reached.
+
+        :return: True if target was reached, False if the CPU halted or
+                 max_instructions were executed first
+        """
+        if isinstance(target, str):
+            addr = self.mmu.find_symbol(target)
+            if addr is None:
+                raise ValueError("Unknown symbol {}".format(target))
+            target = addr
+        self.start_budget()
+        self.run_fast(max_instructions=max_instructions, until=target)
+        return self.pc == target and not self.halted
+
+    def run_fast(
+        self,
+        max_instructions: Optional[int] = None,
+        until: Optional[T_AbsoluteAddress] = None,
+    ) -> int:
+        """
+        Run until the CPU halts, without tracing.
+
+        This is the same as calling step() in a loop, but the exception handler and
+        attribute lookups are hoisted out of the dispatch loop. When the debugger is
+        requested, it is launched the same way step() does, afterwards we continue.
+
+        Instructions are dispatched in chunks, limits and budgets are checked in between.
+        Idioms are not fast-forwarded while running until an address, as it may be
+        inside of a loop.
+
+        While hooks are registered (see CPU.add_hook), instructions are dispatched by
+        _dispatch_instrumented instead.
+
+        :param max_instructions: Stop after this many instructions
+        :param until: Stop when the pc reaches this address
+        :return: The number of executed instructions
+        """
+        start = self.cycle
+        end = None if max_instructions is None else start + max_instructions
+
+        while not self.halted:
+            count = self._chunk_size(end)
+            if count == 0:
+                break
+            if until is not None:
+                self.fast_forward_limit = 0
+
+            # checked per chunk, so hooks registered by the debugger take effect
+            dispatch = (
+                self._dispatch_instrumented if self.instrumented else self._dispatch
+            )
+
+            launch_debugger = False
+            try:
+                if dispatch(count, until):
+                    break
+            except LaunchDebuggerException:
+                if self.debugger_active:
+                    raise
+                print(FMT_CPU + "[CPU] Debugger launch requested!" + FMT_NONE)
+                launch_debugger = True
+            except RiscemuBaseException as ex:
+                self._halt_on_exception(ex)
+
+            if launch_debugger:
+                launch_debug_session(self)
+
+        self.fast_forward_limit = self.conf.max_instructions
+        return self.cycle - start
+
+    def _chunk_size(self, end: Optional[int]) -> int:
+        """
+        Return the number of instructions to execute before checking limits again.
+
+        Fused instruction pairs count as two instructions, so a chunk of n instructions
+        may retire up to 2n. To stop exactly at a limit, chunks shrink to half of the
+        remaining instructions as the limit approaches, and the last instruction is run
+        on its own (see _dispatch).
+
+        Idioms may only use the instructions not needed by the chunk, so the
+        fast_forward_limit is set accordingly.
+        """
+        if self._budget_exceeded():
+            return 0
+        limits = [
+            limit for limit in (end, self.conf.max_instructions) if limit is not None
+        ]
+        count = self.budget_check_interval
+        for limit in limits:
+            remaining = limit - self.cycle
+            if remaining <= 1:
+                return max(remaining, 0)
+            count = min(count, remaining // 2)
+        self.fast_forward_limit = min(limits) - 2 * count if limits else None
+        return count
+
+    def _dispatch(self, count: int, until: Optional[T_AbsoluteAddress]) -> bool:
+        """
+        Execute count instructions (or fused instruction pairs) through the threaded
+        code. A count of one always runs a single, unfused instruction.
+
+        :return: True if execution stopped because the pc reached until
+        """
+        fetch_op = self.fetch_op
+        ins_xlen = self.INS_XLEN
+
+        if count == 1:
+            self.cycle += 1
+            pc = self.pc
+            op = self.decode_instruction(self.mmu.read_ins(pc))
+            self.pc = pc + ins_xlen
+            op()
+            return self.pc == until
+
+        if until is None:
+            for _ in range(count):
+                if self.halted:
+                    break
+                # the cycle counter is readable through csrs, so it is kept exact
+                self.cycle += 1
+                pc = self.pc
+                op = fetch_op(pc)
+                self.pc = pc + ins_xlen
+                op()
+            return False
+
+        # a fused pair ending at until would step over it, so run it unfused
+        before = until - ins_xlen
+        for _ in range(count):
+            if self.halted:
+                break
+            self.cycle += 1
+            pc = self.pc
+            if pc == before:
+                op = self.decode_instruction(self.mmu.read_ins(pc))
+            else:
+                op = fetch_op(pc)
+            self.pc = pc + ins_xlen
+            op()
+            if self.pc == until:
+                return True
+        return False
+
+    def _dispatch_instrumented(
+        self, count: int, until: Optional[T_AbsoluteAddress]
+    ) -> bool:
+        """
+        Execute count instructions one at a time, calling the step and branch hooks
+        after each of them.
+
+        :return: True if execution stopped because the pc reached until
+        """
+        read_ins = self.mmu.read_ins
+        ops = self._instrumented_ops
+        retired = self._call_retire_hooks
+        ins_xlen = self.INS_XLEN
+
+        for _ in range(count):
+            if self.halted:
+                break
+            self.cycle += 1
+            pc = self.pc
+            ins = read_ins(pc)
+            # keyed by the instruction itself, so reloaded sections are decoded again
+            op = ops.get(ins)
+            if op is None:
+                op = ops[ins] = self.decode_instruction(ins)
+            self.pc = pc + ins_xlen
+            op()
+            retired(pc, ins)
+            if self.pc == until:
+                return True
+        return False
+
+    def _call_retire_hooks(self, pc: T_AbsoluteAddress, ins: Instruction):
+        for hook in self.hooks["step"]:
+            hook(pc, ins)
+        if self.pc != pc + self.INS_XLEN:
+            for hook in self.hooks["branch"]:
+                hook(pc, self.pc)
+
+    def run_compiled(self):
+        """
+        Run until the CPU halts, executing compiled basic blocks wherever possible.
+
+        Instructions that can't be compiled are executed by the interpreter. Once the
+        debugger is active, we return and leave execution to the interpreter.
+
+        Budgets are checked between blocks, and traces (see Trace) are passed the number
+        of instructions left until the next check. As blocks and trace iterations are
+        always completed, a budget may be exceeded by less than one of them.
+        """
+        from ..jit import BlockCompiler, Trace
+
+        if self.block_compiler is None:
+            self.block_compiler = BlockCompiler(self)
+        compiler = self.block_compiler
+        blocks = compiler.blocks
+        checkpoint = self.cycle
+
+        while not self.halted and not self.debugger_active:
+            if self.cycle >= checkpoint:
+                count = self._chunk_size(None)
+                if count == 0:
+                    break
+                checkpoint = self.cycle + count
+
+            try:
+                block = blocks[self.pc]
+            except KeyError:
+                block = compiler.get_block(self.pc)
+
+            if block is None:
+                self.step()
+                continue
+
+            try:
+                block(min(Trace.max_instructions, checkpoint - self.cycle))
+            except RiscemuBaseException as ex:
+                self._halt_on_exception(ex)
+
+    def start_budget(self):
+        """
+        Start the wall-clock budget (RunConfig.max_runtime), if it isn't running yet.
+        """
+        if self.conf.max_runtime is not None and self.deadline is None:
+            self.deadline = time.monotonic() + self.conf.max_runtime
+
+    def _budget_exceeded(self) -> bool:
+        """
+        Check the instruction and runtime budgets, halt the CPU if one is exceeded.
+        """
+        max_instructions = self.conf.max_instructions
+        if max_instructions is not None and self.cycle >= max_instructions:
+            reason = "instruction budget of {}".format(max_instructions)
+        elif self.deadline is not None and time.monotonic() >= self.deadline:
+            reason = "runtime budget of {}s".format(self.conf.max_runtime)
+        else:
+            return False
+
+        print(FMT_CPU + "[CPU] Halting, {} exceeded!".format(reason) + FMT_NONE)
+        self.exit_code = self.BUDGET_EXCEEDED_EXIT_CODE
+        self.halted = True
+        return True
+
+    def _halt_on_exception(self, ex: RiscemuBaseException):
+        print(ex.message())
+        ex.print_stacktrace()
+        print(FMT_CPU + "[CPU] Halting due to exception!" + FMT_NONE)
+        self.halted = True
+
     def setup_stack(self, stack_size: int = 1024 * 4) -> bool:
         """
         Create program stack and populate stack pointer
         :param stack_size: the size of the required stack, defaults to 4Kib
         :return:
         """
-        stack_sec = BinaryDataMemorySection(
-            bytearray(stack_size),
+        stack_sec = SparseMemorySection(
+            stack_size,
             ".stack",
             None,  # FIXME: why does a binary data memory section require a context?
             "",
@@ -133,11 +501,11 @@ class UserModeCPU(CPU):
         return True
 
     def _format_arg(self, arg: str, ins: Instruction) -> str:
-        if arg in self.regs.vals or arg in self.regs.valid_regs:
+        if arg in REGISTER_NUMBERS or arg in self.regs.extra_vals:
             return "{}{}=0x{:x}{}".format(
                 arg, FMT_GRAY, self.regs.get(arg, False), FMT_NONE
             )
-        elif arg in self.regs.float_vals or arg in self.regs.float_regs:
+        elif arg in self.regs.f_offsets:
             return "{}{}={}{}".format(arg, FMT_GRAY, self.regs.get_f(arg), FMT_NONE)
         elif isinstance(ins, SimpleInstruction):
             val = ins.context.resolve_label(arg)
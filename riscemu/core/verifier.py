@@ -0,0 +1,103 @@
+"""
+RiscEmu (c) 2023 Anton Lydike
+
+SPDX-License-Identifier: MIT
+
+This file contains the program verifier, which checks all instructions of a program once,
+before it runs, instead of every time an instruction is executed.
+"""
+
+from typing import List, Tuple, Dict, TYPE_CHECKING
+
+from . import (
+    Instruction,
+    Program,
+    Registers,
+    NumberFormatException,
+    ParseException,
+)
+from .csr_constants import CSR_NAME_TO_ADDR
+from .instruction_memory_section import InstructionMemorySection
+from .simple_instruction import SimpleInstruction
+
+if TYPE_CHECKING:
+    from . import CPU
+
+
+def verify_program(cpu: "CPU", program: Program) -> List[str]:
+    """
+    Check every instruction of program against the instruction sets loaded into cpu:
+
+     - the instruction exists
+     - the number of operands matches one of its signatures (see InstructionSet.signatures)
+     - register operands name valid registers
+     - immediate operands are numbers or resolvable symbols
+
+    Operands of instructions without a signature are not checked.
+
+    :return: A description of every problem found, empty if the program is valid
+    """
+    signatures: Dict[str, Tuple[str, ...]] = dict()
+    for ins_set in cpu.instruction_sets:
+        signatures.update(ins_set.signatures)
+
+    errors = []
+    for sec in program.sections:
+        if not isinstance(sec, InstructionMemorySection):
+            continue
+        for ins in sec.instructions:
+            if not isinstance(ins, SimpleInstruction):
+                continue
+            error = _check_instruction(cpu, ins, signatures)
+            if error is not None:
+                errors.append(
+                    "{}: {}: {}".format(cpu.mmu.translate_address(ins.addr), ins, error)
+                )
+    return errors
+
+
+def _check_instruction(
+    cpu: "CPU", ins: Instruction, signatures: Dict[str, Tuple[str, ...]]
+):
+    if cpu.handler_for(ins) is None:
+        return "unknown instruction"
+
+    formats = signatures.get(ins.name)
+    if formats is None:
+        return None
+    candidates = [fmt for fmt in formats if len(fmt) == len(ins.args)]
+    if not candidates:
+        return "expected {} operands".format(
+            " or ".join(str(len(fmt)) for fmt in formats)
+        )
+
+    errors = []
+    for fmt in candidates:
+        errors = [
+            err
+            for err in (
+                _check_operand(cpu, ins, num, kind) for num, kind in enumerate(fmt)
+            )
+            if err is not None
+        ]
+        if not errors:
+            return None
+    return ", ".join(errors)
+
+
+def _check_operand(cpu: "CPU", ins: Instruction, num: int, kind: str):
+    arg = ins.args[num]
+    if kind == "r":
+        if arg not in Registers.valid_regs and not cpu.regs.infinite_regs:
+            return "{} is not a register".format(arg)
+    elif kind == "f":
+        if arg not in Registers.float_regs and not cpu.regs.infinite_regs:
+            return "{} is not a floating point register".format(arg)
+    elif kind == "c" and arg.lower() in CSR_NAME_TO_ADDR:
+        return None
+    else:
+        try:
+            ins.get_imm(num)
+        except (NumberFormatException, ParseException):
+            return "{} is neither a number nor a known symbol".format(arg)
+    return None
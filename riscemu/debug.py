@@ -23,6 +23,8 @@ def launch_debug_session(cpu: "CPU", prompt=""):
 
     # set the active debug flag
     cpu.debugger_active = True
+    # highlight the last read and written registers in dumps
+    cpu.regs.track_access = True
 
     # setup some aliases:
     registers = cpu.regs
@@ -87,4 +89,5 @@ def launch_debug_session(cpu: "CPU", prompt=""):
         )
     finally:
         cpu.debugger_active = False
+        cpu.regs.track_access = False
         readline.write_history_file(HIST_FILE)
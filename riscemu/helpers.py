@@ -4,8 +4,10 @@ RiscEmu (c) 2021 Anton Lydike
 SPDX-License-Identifier: MIT
 """
 
+import mmap
+from io import IOBase
 from math import log10, ceil
-from typing import Iterable, Iterator, TypeVar, Generic, List, Optional
+from typing import Iterable, Iterator, TypeVar, Generic, List, Optional, Union
 
 from .core import Int32, UInt32
 from .core.exceptions import *
@@ -115,3 +117,16 @@ def get_section_base_name(section_name: str) -> str:
             + FMT_NONE
         )
     return "." + section_name.split(".")[1]
+
+
+def map_file(stream: IOBase) -> Union[memoryview, bytearray]:
+    """
+    Map the file behind stream into memory as a private copy-on-write mapping. Pages are
+    only read from the file once they are accessed, and writes never reach the file.
+
+    Streams which aren't backed by a file (and empty files) are read into a bytearray.
+    """
+    try:
+        return memoryview(mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_COPY))
+    except (AttributeError, OSError, ValueError):
+        return bytearray(stream.read())
@@ -0,0 +1,242 @@
+"""
+RiscEmu (c) 2023 Anton Lydike
+
+SPDX-License-Identifier: MIT
+
+This file contains the high-level emulation (HLE) of the riscemu libc. Calls to libc
+functions are intercepted and executed by native python implementations.
+"""
+
+from typing import Iterable, List, Optional
+
+from .colors import FMT_CPU, FMT_NONE
+from .core import Int32, UInt32, UserModeCPU, T_AbsoluteAddress
+from .syscall import Syscall, get_syscall_symbols
+
+MALLOC_PAGE_SIZE = 4069
+"""
+The size of the space malloc allocates from, as defined in stdlib.s
+"""
+
+_MMAP2 = get_syscall_symbols()["SCALL_MMAP2"]
+
+
+class LibcHLE:
+    """
+    Native implementations of functions of the riscemu libc (see riscemu/libc).
+
+    The implementations are installed at the entry points of the libc functions (see
+    CPU.add_native_function), so they are used no matter how a function is called.
+    They read their arguments from a0-a2, return their result in a0 and continue at ra.
+    Like the assembly implementations, they only modify caller-saved registers.
+
+    To keep cycle (and instret) meaningful, each call advances the cycle count by the
+    number of instructions the assembly implementation executes for the same
+    arguments. If that would pass cpu.fast_forward_limit, or the arguments are unusual
+    (e.g. strings running off the end of a section), the assembly implementation is
+    executed instead.
+    """
+
+    FUNCTIONS = (
+        "memset",
+        "strlen",
+        "strcpy",
+        "strncpy",
+        "memchr",
+        "malloc",
+        "free",
+        "rand",
+    )
+
+    cpu: UserModeCPU
+
+    def __init__(self, cpu: UserModeCPU):
+        self.cpu = cpu
+        self.mmu = cpu.mmu
+        self.regs = cpu.regs
+
+    def install(self, exclude: Iterable[str] = ()) -> List[str]:
+        """
+        Replace all functions in FUNCTIONS that are defined by the loaded programs,
+        except for the ones in exclude.
+
+        :return: The names of the replaced functions
+        """
+        installed = []
+        for name in self.FUNCTIONS:
+            if name in exclude:
+                continue
+            addr = self.mmu.global_symbols.get(name)
+            if addr is None:
+                continue
+            self.cpu.add_native_function(addr, getattr(self, "hle_" + name))
+            installed.append(name)
+
+        if installed and self.cpu.conf.verbosity > 1:
+            print(
+                FMT_CPU
+                + "[CPU] Emulating libc functions: {}".format(", ".join(installed))
+                + FMT_NONE
+            )
+        return installed
+
+    def hle_memset(self) -> bool:
+        dest = self.regs.get("a0").unsigned_value
+        value = self.regs.get("a1").unsigned_value & 0xFF
+        size = self.regs.get("a2").unsigned_value
+        if not self._fits(5 * size + 3) or not self._is_mapped(dest, size):
+            return False
+        if size > 0:
+            self.mmu.write(dest, size, bytearray((value,)) * size)
+        return self._return(5 * size + 3, dest)
+
+    def hle_strlen(self) -> bool:
+        length = self._find_byte(self.regs.get("a0").unsigned_value, 0)
+        if length is None or not self._fits(4 * length + 11):
+            return False
+        return self._return(4 * length + 11, length)
+
+    def hle_strcpy(self) -> bool:
+        dest = self.regs.get("a0").unsigned_value
+        src = self.regs.get("a1").unsigned_value
+        length = self._find_byte(src, 0)
+        if length is None or not self._fits(5 * length + 12):
+            return False
+        # the byte-wise copy repeats the start of src if dest overlaps it
+        if src < dest <= src + length or not self._is_mapped(dest, length + 1):
+            return False
+        self.mmu.write(dest, length + 1, self.mmu.read(src, length + 1))
+        return self._return(5 * length + 12, dest)
+
+    def hle_strncpy(self) -> bool:
+        dest = self.regs.get("a0").unsigned_value
+        src = self.regs.get("a1").unsigned_value
+        size = self.regs.get("a2").unsigned_value
+        length = self._find_byte(src, 0, size)
+        if length is None:
+            return False
+        if length == size:
+            cycles = 8 * size + 8
+        else:
+            cycles = 8 * length + 5 * (size - length - 1) + 15
+        if not self._fits(cycles) or not self._is_mapped(dest, size):
+            return False
+        if src < dest < src + length:
+            return False
+        if size > 0:
+            data = self.mmu.read(src, length) if length > 0 else bytearray()
+            self.mmu.write(dest, size, data + bytearray(size - length))
+        return self._return(cycles, dest)
+
+    def hle_memchr(self) -> bool:
+        addr = self.regs.get("a0").unsigned_value
+        value = self.regs.get("a1").unsigned_value & 0xFF
+        size = self.regs.get("a2").unsigned_value
+        index = self._find_byte(addr, value, size)
+        if index is None:
+            return False
+        if index == size:
+            cycles = 5 * size + 6
+            result = 0
+        else:
+            cycles = 5 * index + 10
+            result = addr + index
+        if not self._fits(cycles):
+            return False
+        return self._return(cycles, result)
+
+    def hle_malloc(self) -> bool:
+        base_ptr = self.mmu.find_symbol("_malloc_base_ptr")
+        if base_ptr is None:
+            return False
+        size = self.regs.get("a0")
+        base = self._read_word(base_ptr)
+        # mapping the space on the first call takes 11 more instructions
+        cycles = 13 if base != 0 else 24
+        if not self._fits(cycles):
+            return False
+
+        if base == 0:
+            args = (("a0", 0), ("a1", 4096), ("a2", 3), ("a3", 5), ("a7", _MMAP2))
+            for reg, value in args:
+                self.regs.set(reg, Int32(value))
+            self.cpu.syscall_int.mmap2(Syscall(_MMAP2, self.cpu))
+            if self.regs.get("a0").signed().value == -1:
+                return self._return(16, 0)
+            base = self.regs.get("a0").unsigned_value
+            self.mmu.write(base_ptr, 4, UInt32(base).to_bytes(4))
+
+        offset = self._read_word(base_ptr + 4)
+        new_offset = Int32(offset) + size
+        if new_offset >= MALLOC_PAGE_SIZE:
+            return self._return(cycles - 1, 0)
+        self.mmu.write(base_ptr + 4, 4, new_offset.to_bytes(4))
+        return self._return(cycles, base + offset)
+
+    def hle_free(self) -> bool:
+        if not self._fits(1):
+            return False
+        return self._return(1, self.regs.get("a0").unsigned_value)
+
+    def hle_rand(self) -> bool:
+        seed_ptr = self.mmu.find_symbol("_rand_seed")
+        if seed_ptr is None or not self._fits(10):
+            return False
+        x = self._read_word(seed_ptr)
+        x ^= (x << 13) & 0xFFFFFFFF
+        x ^= x >> 17
+        x ^= (x << 5) & 0xFFFFFFFF
+        self.mmu.write(seed_ptr, 4, UInt32(x).to_bytes(4))
+        return self._return(10, x)
+
+    def _fits(self, cycles: int) -> bool:
+        """
+        Check that a call executing this many instructions stays within the
+        cpu.fast_forward_limit.
+        """
+        limit = self.cpu.fast_forward_limit
+        # the first instruction was already counted by the cpu
+        return limit is None or self.cpu.cycle + cycles - 1 <= limit
+
+    def _return(self, cycles: int, result: int) -> bool:
+        self.regs.set("a0", Int32(result))
+        self.cpu.cycle += cycles - 1
+        self.cpu.pc = self.regs.get("ra").unsigned_value
+        return True
+
+    def _read_word(self, addr: T_AbsoluteAddress) -> int:
+        return UInt32(self.mmu.read(addr, 4)).unsigned_value
+
+    def _is_mapped(self, addr: T_AbsoluteAddress, size: int) -> bool:
+        """
+        Check that the size bytes starting at addr are inside of a single section.
+        """
+        sec = self.mmu.get_sec_containing(addr)
+        return sec is not None and addr + size <= sec.end
+
+    def _find_byte(
+        self, addr: T_AbsoluteAddress, value: int, limit: Optional[int] = None
+    ) -> Optional[int]:
+        """
+        Return the index of the first byte equal to value, searching at most limit
+        bytes starting at addr.
+
+        :return: The index, limit if the byte wasn't found, or None if the search would
+                 leave the section containing addr
+        """
+        sec = self.mmu.get_sec_containing(addr)
+        if sec is None:
+            return None
+        end = sec.end if limit is None else min(sec.end, addr + limit)
+        # search in growing chunks, so that short strings in large sections are cheap
+        pos, chunk = addr, 64
+        while pos < end:
+            size = min(chunk, end - pos)
+            index = self.mmu.read(pos, size).find(value)
+            if index >= 0:
+                return pos - addr + index
+            pos += size
+            chunk *= 4
+        if limit is not None and addr + limit <= sec.end:
+            return limit
+        return None
@@ -1,6 +1,6 @@
 from .instruction_set import InstructionSet, Instruction
 from riscemu.core.exceptions import INS_NOT_IMPLEMENTED
-from ..core import Int32, UInt32
+from ..core.intmath import MASK32
 
 
 class RV32A(InstructionSet):
@@ -10,6 +10,11 @@ class RV32A(InstructionSet):
     for this?
     """
 
+    signatures = {
+        "amo{}.w".format(op): ("rrr",)
+        for op in ("swap", "add", "and", "or", "xor", "max", "maxu", "min", "minu")
+    }
+
     def instruction_lr_w(self, ins: "Instruction"):
         INS_NOT_IMPLEMENTED(ins)
 
@@ -17,62 +22,61 @@ class RV32A(InstructionSet):
         INS_NOT_IMPLEMENTED(ins)
 
     def instruction_amoswap_w(self, ins: "Instruction"):
-        dest, addr, val = self.parse_rd_rs_rs(ins)
-        if dest == "zero":
-            self.mmu.write(addr.unsigned_value, val.to_bytes())
-        else:
-            old = Int32(self.mmu.read(addr.unsigned_value, 4))
-            self.mmu.write(addr.unsigned_value, val.to_bytes())
-            self.regs.set(dest, old)
+        rd, addr, val = self.parse_rd_rs_rs_int(ins)
+        old = self._load_word(addr)
+        self._store_word(addr, val)
+        self.regs.set_int(rd, old)
 
     def instruction_amoadd_w(self, ins: "Instruction"):
-        dest, addr, val = self.parse_rd_rs_rs(ins)
-        old = Int32(self.mmu.read(addr.unsigned_value, 4))
-        self.mmu.write(addr.unsigned_value, (old + val).to_bytes(4))
-        self.regs.set(dest, old)
+        rd, addr, val = self.parse_rd_rs_rs_int(ins)
+        old = self._load_word(addr)
+        self._store_word(addr, old + val)
+        self.regs.set_int(rd, old)
 
     def instruction_amoand_w(self, ins: "Instruction"):
-        dest, addr, val = self.parse_rd_rs_rs(ins)
-        old = Int32(self.mmu.read(addr.unsigned_value, 4))
-        self.mmu.write(addr.unsigned_value, (old & val).to_bytes(4))
-        self.regs.set(dest, old)
+        rd, addr, val = self.parse_rd_rs_rs_int(ins)
+        old = self._load_word(addr)
+        self._store_word(addr, old & val)
+        self.regs.set_int(rd, old)
 
     def instruction_amoor_w(self, ins: "Instruction"):
-        dest, addr, val = self.parse_rd_rs_rs(ins)
-        old = Int32(self.mmu.read(addr.unsigned_value, 4))
-        self.mmu.write(addr.unsigned_value, (old | val).to_bytes(4))
-        self.regs.set(dest, old)
+        rd, addr, val = self.parse_rd_rs_rs_int(ins)
+        old = self._load_word(addr)
+        self._store_word(addr, old | val)
+        self.regs.set_int(rd, old)
 
     def instruction_amoxor_w(self, ins: "Instruction"):
-        dest, addr, val = self.parse_rd_rs_rs(ins)
-        old = Int32(self.mmu.read(addr.unsigned_value, 4))
-        self.mmu.write(addr.unsigned_value, (old ^ val).to_bytes(4))
-        self.regs.set(dest, old)
+        rd, addr, val = self.parse_rd_rs_rs_int(ins)
+        old = self._load_word(addr)
+        self._store_word(addr, old ^ val)
+        self.regs.set_int(rd, old)
 
     def instruction_amomax_w(self, ins: "Instruction"):
-        dest, addr, val = self.parse_rd_rs_rs(ins)
-        old = Int32(self.mmu.read(addr.unsigned_value, 4))
-        self.mmu.write(addr.unsigned_value, max(old, val).to_bytes(4))
-        self.regs.set(dest, old)
+        rd, addr, val = self.parse_rd_rs_rs_int(ins)
+        old = self._load_word(addr)
+        self._store_word(addr, max(old, val))
+        self.regs.set_int(rd, old)
 
     def instruction_amomaxu_w(self, ins: "Instruction"):
-        val: UInt32
-        dest, addr, val = self.parse_rd_rs_rs(ins)
-        old = UInt32(self.mmu.read(addr.unsigned_value, 4))
-
-        self.mmu.write(addr.unsigned_value, max(old, val.unsigned()).to_bytes())
-        self.regs.set(dest, old)
+        rd, addr, val = self.parse_rd_rs_rs_int(ins)
+        old = self._load_word(addr)
+        self._store_word(addr, max(old & MASK32, val & MASK32))
+        self.regs.set_int(rd, old)
 
     def instruction_amomin_w(self, ins: "Instruction"):
-        dest, addr, val = self.parse_rd_rs_rs(ins)
-        old = Int32(self.mmu.read(addr.unsigned_value, 4))
-        self.mmu.write(addr.unsigned_value, min(old, val).to_bytes(4))
-        self.regs.set(dest, old)
+        rd, addr, val = self.parse_rd_rs_rs_int(ins)
+        old = self._load_word(addr)
+        self._store_word(addr, min(old, val))
+        self.regs.set_int(rd, old)
 
     def instruction_amominu_w(self, ins: "Instruction"):
-        val: UInt32
-        dest, addr, val = self.parse_rd_rs_rs(ins)
-        old = UInt32(self.mmu.read(addr.unsigned_value, 4))
+        rd, addr, val = self.parse_rd_rs_rs_int(ins)
+        old = self._load_word(addr)
+        self._store_word(addr, min(old & MASK32, val & MASK32))
+        self.regs.set_int(rd, old)
+
+    def _load_word(self, addr: int) -> int:
+        return self.mmu.read_i32(addr & MASK32)
 
-        self.mmu.write(addr.unsigned_value, min(old, val.unsigned()).to_bytes(4))
-        self.regs.set(dest, old)
+    def _store_word(self, addr: int, val: int):
+        self.mmu.write_u32(addr & MASK32, val & MASK32)
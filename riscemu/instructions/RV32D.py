@@ -13,11 +13,14 @@ from typing import Tuple
 from .instruction_set import InstructionSet, Instruction
 from .float_base import FloatArithBase
 from riscemu.core import INS_NOT_IMPLEMENTED, Float32, Int32, UInt32, Float64
+from riscemu.core.intmath import MASK32
 
 
 class RV32D(FloatArithBase[Float64]):
     flen = 64
     _float_cls = Float64
+    _get_f = "get_f64"
+    _set_f = "set_f64"
 
     def instruction_fcvt_d_w(self, ins: Instruction):
         """
@@ -37,7 +40,7 @@ class RV32D(FloatArithBase[Float64]):
           | x[rd] = sext(s32_{f64}(f[rs1]))
         """
         rd, rs = self.parse_rd_rs(ins)
-        self.regs.set_f(rd, Float64(self.regs.get(rs).value))
+        self.regs.set_f64(rd, self.regs.get_int(rs))
 
     def instruction_fcvt_d_wu(self, ins: Instruction):
         """
@@ -57,7 +60,7 @@ class RV32D(FloatArithBase[Float64]):
           | f[rd] = f64_{u32}(x[rs1])
         """
         rd, rs = self.parse_rd_rs(ins)
-        self.regs.set_f(rd, Float64(self.regs.get(rs).unsigned_value))
+        self.regs.set_f64(rd, self.regs.get_int(rs) & MASK32)
 
     def instruction_fcvt_w_d(self, ins: Instruction):
         """
@@ -77,7 +80,7 @@ class RV32D(FloatArithBase[Float64]):
           | x[rd] = sext(s32_{f64}(f[rs1]))
         """
         rd, rs = self.parse_rd_rs(ins)
-        self.regs.set(rd, Int32.from_float(self.regs.get_f(rs).value))
+        self.regs.set(rd, Int32.from_float(self.regs.get_f64(rs)))
 
     def instruction_fcvt_wu_d(self, ins: Instruction):
         """
@@ -97,4 +100,4 @@ class RV32D(FloatArithBase[Float64]):
           | x[rd] = sext(u32f64(f[rs1]))
         """
         rd, rs = self.parse_rd_rs(ins)
-        self.regs.set(rd, UInt32.from_float(self.regs.get_f(rs).value))
+        self.regs.set(rd, UInt32.from_float(self.regs.get_f64(rs)))
@@ -10,12 +10,21 @@ and their function)
 """
 from .instruction_set import Instruction
 from .float_base import FloatArithBase
+import struct
+
 from riscemu.core import Float32, Int32, UInt32
+from riscemu.core.intmath import MASK32
+
+# reinterprets the bits of single precision values, see fmv.x.w and fmv.w.x
+_F32 = struct.Struct("<f")
+_I32 = struct.Struct("<i")
 
 
 class RV32F(FloatArithBase[Float32]):
     flen = 32
     _float_cls = Float32
+    _get_f = "get_f32"
+    _set_f = "set_f32"
 
     def instruction_fcvt_w_s(self, ins: Instruction):
         """
@@ -35,7 +44,7 @@ class RV32F(FloatArithBase[Float32]):
         | x[rd] = sext(s32_{f32}(f[rs1]))
         """
         rd, rs = self.parse_rd_rs(ins)
-        self.regs.set(rd, Int32.from_float(self.regs.get_f(rs).value))
+        self.regs.set(rd, Int32.from_float(self.regs.get_f32(rs)))
 
     def instruction_fcvt_wu_s(self, ins: Instruction):
         """
@@ -55,7 +64,7 @@ class RV32F(FloatArithBase[Float32]):
         | x[rd] = sext(u32_{f32}(f[rs1]))
         """
         rd, rs = self.parse_rd_rs(ins)
-        self.regs.set(rd, UInt32.from_float((self.regs.get_f(rs).value)))
+        self.regs.set(rd, UInt32.from_float(self.regs.get_f32(rs)))
 
     def instruction_fmv_x_w(self, ins: Instruction):
         """
@@ -75,7 +84,7 @@ class RV32F(FloatArithBase[Float32]):
         | x[rd] = sext(f[rs1][31:0])
         """
         rd, rs = self.parse_rd_rs(ins)
-        self.regs.set(rd, UInt32(self.regs.get_f(rs).bytes[-4:]))
+        self.regs.set_int(rd, _I32.unpack(_F32.pack(self.regs.get_f32(rs)))[0])
 
     def instruction_fcvt_s_w(self, ins: Instruction):
         """
@@ -95,7 +104,7 @@ class RV32F(FloatArithBase[Float32]):
         | f[rd] = f32_{s32}(x[rs1])
         """
         rd, rs = self.parse_rd_rs(ins)
-        self.regs.set_f(rd, Float32(self.regs.get(rs).value))
+        self.regs.set_f32(rd, self.regs.get_int(rs))
 
     def instruction_fcvt_s_wu(self, ins: Instruction):
         """
@@ -115,7 +124,7 @@ class RV32F(FloatArithBase[Float32]):
         | f[rd] = f32_{u32}(x[rs1])
         """
         rd, rs = self.parse_rd_rs(ins)
-        self.regs.set_f(rd, Float32(self.regs.get(rs).unsigned_value))
+        self.regs.set_f32(rd, self.regs.get_int(rs) & MASK32)
 
     def instruction_fmv_w_x(self, ins: Instruction):
         """
@@ -137,4 +146,4 @@ class RV32F(FloatArithBase[Float32]):
         | f[rd] = x[rs1][31:0]
         """
         rd, rs = self.parse_rd_rs(ins)
-        self.regs.set_f(rd, Float32.from_bytes(self.regs.get(rs).to_bytes()))
+        self.regs.set_f32(rd, _F32.unpack(_I32.pack(self.regs.get_int(rs)))[0])
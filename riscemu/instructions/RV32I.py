@@ -4,11 +4,27 @@ RiscEmu (c) 2021 Anton Lydike
 SPDX-License-Identifier: MIT
 """
 
+import operator
+from typing import Callable, Optional
+
+from .idioms import recognize_byte_loop
 from .instruction_set import InstructionSet, ASSERT_LEN
 
 from ..colors import FMT_DEBUG, FMT_NONE
+from ..core import intmath
+from ..core.intmath import MASK32
 from ..syscall import Syscall
-from ..core import Instruction, Int32, UInt32, UserModeCPU, LaunchDebuggerException
+from ..core import (
+    Instruction,
+    REGISTER_NUMBERS,
+    Int32,
+    UInt32,
+    UserModeCPU,
+    InstructionMemorySection,
+    LaunchDebuggerException,
+    NumberFormatException,
+    ParseException,
+)
 
 
 class RV32I(InstructionSet):
@@ -20,175 +36,172 @@ class RV32I(InstructionSet):
     See https://maxvytech.com/images/RV32I-11-2018.pdf for a more detailed overview
     """
 
+    signatures = {
+        # rd, rs1, imm / rs2, rs1, imm / rs1, rs2, imm
+        **dict.fromkeys(
+            ("lb", "lh", "lw", "lbu", "lhu", "sb", "sh", "sw", "jalr")
+            + ("slli", "srli", "srai", "addi", "xori", "ori", "andi", "slti", "sltiu")
+            + ("beq", "bne", "blt", "bge", "bltu", "bgeu"),
+            ("rri",),
+        ),
+        **dict.fromkeys(
+            ("sll", "srl", "sra", "add", "sub", "xor", "or", "and", "slt", "sltu"),
+            ("rrr",),
+        ),
+        **dict.fromkeys(("lui", "auipc", "li", "la"), ("ri",)),
+        **dict.fromkeys(("ret", "ecall", "ebreak", "scall", "sbreak", "nop"), ("",)),
+        "j": ("i",),
+        "jal": ("i", "ri"),
+        "mv": ("rr",),
+    }
+
     def instruction_lb(self, ins: "Instruction"):
-        rd, addr = self.parse_mem_ins(ins)
-        self.regs.set(rd, UInt32.sign_extend(self.mmu.read(addr.unsigned_value, 1), 8))
+        rd, addr = self.parse_mem_ins_int(ins)
+        self.regs.set_int(rd, self.mmu.read_i8(addr))
 
     def instruction_lh(self, ins: "Instruction"):
-        rd, addr = self.parse_mem_ins(ins)
-        self.regs.set(rd, UInt32.sign_extend(self.mmu.read(addr.unsigned_value, 2), 16))
+        rd, addr = self.parse_mem_ins_int(ins)
+        self.regs.set_int(rd, self.mmu.read_i16(addr))
 
     def instruction_lw(self, ins: "Instruction"):
-        rd, addr = self.parse_mem_ins(ins)
-        self.regs.set(rd, UInt32(self.mmu.read(addr.unsigned_value, 4)))
+        rd, addr = self.parse_mem_ins_int(ins)
+        self.regs.set_int(rd, self.mmu.read_i32(addr))
 
     def instruction_lbu(self, ins: "Instruction"):
-        rd, addr = self.parse_mem_ins(ins)
-        self.regs.set(rd, UInt32(self.mmu.read(addr.unsigned_value, 1)))
+        rd, addr = self.parse_mem_ins_int(ins)
+        self.regs.set_int(rd, self.mmu.read_u8(addr))
 
     def instruction_lhu(self, ins: "Instruction"):
-        rd, addr = self.parse_mem_ins(ins)
-        self.regs.set(rd, UInt32(self.mmu.read(addr.unsigned_value, 2)))
+        rd, addr = self.parse_mem_ins_int(ins)
+        self.regs.set_int(rd, self.mmu.read_u16(addr))
 
     def instruction_sb(self, ins: "Instruction"):
-        rd, addr = self.parse_mem_ins(ins)
-        self.mmu.write(addr.unsigned_value, 1, self.regs.get(rd).to_bytes(1))
+        rs, addr = self.parse_mem_ins_int(ins)
+        self.mmu.write_u8(addr, self.regs.get_int(rs) & 0xFF)
 
     def instruction_sh(self, ins: "Instruction"):
-        rd, addr = self.parse_mem_ins(ins)
-        self.mmu.write(addr.unsigned_value, 2, self.regs.get(rd).to_bytes(2))
+        rs, addr = self.parse_mem_ins_int(ins)
+        self.mmu.write_u16(addr, self.regs.get_int(rs) & 0xFFFF)
 
     def instruction_sw(self, ins: "Instruction"):
-        rd, addr = self.parse_mem_ins(ins)
-        self.mmu.write(addr.unsigned_value, 4, self.regs.get(rd).to_bytes(4))
+        rs, addr = self.parse_mem_ins_int(ins)
+        self.mmu.write_i32(addr, self.regs.get_int(rs))
 
     def instruction_sll(self, ins: "Instruction"):
-        ASSERT_LEN(ins.args, 3)
-        dst = ins.get_reg(0)
-        src1 = ins.get_reg(1)
-        src2 = ins.get_reg(2)
-        self.regs.set(dst, self.regs.get(src1) << (self.regs.get(src2) & 0b11111))
+        rd, rs1, rs2 = self.parse_rd_rs_rs_int(ins)
+        self.regs.set_int(rd, intmath.sll(rs1, rs2))
 
     def instruction_slli(self, ins: "Instruction"):
-        ASSERT_LEN(ins.args, 3)
-        dst = ins.get_reg(0)
-        src1 = ins.get_reg(1)
-        imm = ins.get_imm(2)
-        self.regs.set(dst, self.regs.get(src1) << (imm.abs_value & 0b11111))
+        rd, rs1, imm = self.parse_rd_rs_imm_int(ins)
+        self.regs.set_int(rd, intmath.sll(rs1, imm))
 
     def instruction_srl(self, ins: "Instruction"):
-        ASSERT_LEN(ins.args, 3)
-        dst = ins.get_reg(0)
-        src1 = ins.get_reg(1)
-        src2 = ins.get_reg(2)
-        self.regs.set(
-            dst, self.regs.get(src1).shift_right_logical(self.regs.get(src2) & 0b11111)
-        )
+        rd, rs1, rs2 = self.parse_rd_rs_rs_int(ins)
+        self.regs.set_int(rd, intmath.srl(rs1, rs2))
 
     def instruction_srli(self, ins: "Instruction"):
-        ASSERT_LEN(ins.args, 3)
-        dst = ins.get_reg(0)
-        src1 = ins.get_reg(1)
-        imm = ins.get_imm(2)
-        self.regs.set(
-            dst, self.regs.get(src1).shift_right_logical(imm.abs_value & 0b11111)
-        )
+        rd, rs1, imm = self.parse_rd_rs_imm_int(ins)
+        self.regs.set_int(rd, intmath.srl(rs1, imm))
 
     def instruction_sra(self, ins: "Instruction"):
-        ASSERT_LEN(ins.args, 3)
-        dst = ins.get_reg(0)
-        src1 = ins.get_reg(1)
-        src2 = ins.get_reg(2)
-        self.regs.set(dst, self.regs.get(src1) >> (self.regs.get(src2) & 0b11111))
+        rd, rs1, rs2 = self.parse_rd_rs_rs_int(ins)
+        self.regs.set_int(rd, intmath.sra(rs1, rs2))
 
     def instruction_srai(self, ins: "Instruction"):
-        ASSERT_LEN(ins.args, 3)
-        dst = ins.get_reg(0)
-        src1 = ins.get_reg(1)
-        imm = ins.get_imm(2)
-        self.regs.set(dst, self.regs.get(src1) >> (imm.abs_value & 0b11111))
+        rd, rs1, imm = self.parse_rd_rs_imm_int(ins)
+        self.regs.set_int(rd, intmath.sra(rs1, imm))
 
     def instruction_add(self, ins: "Instruction"):
-        dst, rs1, rs2 = self.parse_rd_rs_rs(ins)
-        self.regs.set(dst, rs1 + rs2)
+        rd, rs1, rs2 = self.parse_rd_rs_rs_int(ins)
+        self.regs.set_int(rd, rs1 + rs2)
 
     def instruction_addi(self, ins: "Instruction"):
-        dst, rs1, imm = self.parse_rd_rs_imm(ins)
-        self.regs.set(dst, rs1 + imm.abs_value)
+        rd, rs1, imm = self.parse_rd_rs_imm_int(ins)
+        self.regs.set_int(rd, rs1 + imm)
 
     def instruction_sub(self, ins: "Instruction"):
-        dst, rs1, rs2 = self.parse_rd_rs_rs(ins)
-        self.regs.set(dst, rs1 - rs2)
+        rd, rs1, rs2 = self.parse_rd_rs_rs_int(ins)
+        self.regs.set_int(rd, rs1 - rs2)
 
     def instruction_lui(self, ins: "Instruction"):
         ASSERT_LEN(ins.args, 2)
         reg = ins.get_reg(0)
-        self.regs.set(reg, ins.get_imm(1).abs_value << 12)
+        self.regs.set_int(reg, ins.get_imm(1).abs_value.value << 12)
 
     def instruction_auipc(self, ins: "Instruction"):
         ASSERT_LEN(ins.args, 2)
         reg = ins.get_reg(0)
-        imm = ins.get_imm(1).abs_value << 12
-        self.regs.set(reg, imm + self.cpu.pc)
+        imm = intmath.s32(ins.get_imm(1).abs_value.value << 12)
+        self.regs.set_int(reg, imm + self.cpu.pc)
 
     def instruction_xor(self, ins: "Instruction"):
-        rd, rs1, rs2 = self.parse_rd_rs_rs(ins)
-        self.regs.set(rd, rs1 ^ rs2)
+        rd, rs1, rs2 = self.parse_rd_rs_rs_int(ins)
+        self.regs.set_int(rd, rs1 ^ rs2)
 
     def instruction_xori(self, ins: "Instruction"):
-        rd, rs1, imm = self.parse_rd_rs_imm(ins)
-        self.regs.set(rd, rs1 ^ imm.abs_value)
+        rd, rs1, imm = self.parse_rd_rs_imm_int(ins)
+        self.regs.set_int(rd, rs1 ^ imm)
 
     def instruction_or(self, ins: "Instruction"):
-        rd, rs1, rs2 = self.parse_rd_rs_rs(ins)
-        self.regs.set(rd, rs1 | rs2)
+        rd, rs1, rs2 = self.parse_rd_rs_rs_int(ins)
+        self.regs.set_int(rd, rs1 | rs2)
 
     def instruction_ori(self, ins: "Instruction"):
-        rd, rs1, imm = self.parse_rd_rs_imm(ins)
-        self.regs.set(rd, rs1 | imm.abs_value)
+        rd, rs1, imm = self.parse_rd_rs_imm_int(ins)
+        self.regs.set_int(rd, rs1 | imm)
 
     def instruction_and(self, ins: "Instruction"):
-        rd, rs1, rs2 = self.parse_rd_rs_rs(ins)
-        self.regs.set(rd, rs1 & rs2)
+        rd, rs1, rs2 = self.parse_rd_rs_rs_int(ins)
+        self.regs.set_int(rd, rs1 & rs2)
 
     def instruction_andi(self, ins: "Instruction"):
-        rd, rs1, imm = self.parse_rd_rs_imm(ins)
-        self.regs.set(rd, rs1 & imm.abs_value)
+        rd, rs1, imm = self.parse_rd_rs_imm_int(ins)
+        self.regs.set_int(rd, rs1 & imm)
 
     def instruction_slt(self, ins: "Instruction"):
-        rd, rs1, rs2 = self.parse_rd_rs_rs(ins)
-        self.regs.set(rd, UInt32(rs1 < rs2))
+        rd, rs1, rs2 = self.parse_rd_rs_rs_int(ins)
+        self.regs.set_int(rd, intmath.slt(rs1, rs2))
 
     def instruction_slti(self, ins: "Instruction"):
-        rd, rs1, imm = self.parse_rd_rs_imm(ins)
-        self.regs.set(rd, UInt32(rs1 < imm))
+        rd, rs1, imm = self.parse_rd_rs_imm_int(ins)
+        self.regs.set_int(rd, intmath.slt(rs1, imm))
 
     def instruction_sltu(self, ins: "Instruction"):
-        dst, rs1, rs2 = self.parse_rd_rs_rs(ins)
-        self.regs.set(dst, UInt32(rs1.unsigned_value < rs2.unsigned_value))
+        rd, rs1, rs2 = self.parse_rd_rs_rs_int(ins)
+        self.regs.set_int(rd, intmath.sltu(rs1, rs2))
 
     def instruction_sltiu(self, ins: "Instruction"):
-        dst, rs1, imm = self.parse_rd_rs_imm(ins)
-        self.regs.set(dst, UInt32(rs1.unsigned_value < imm.abs_value.unsigned_value))
+        rd, rs1, imm = self.parse_rd_rs_imm_int(ins)
+        self.regs.set_int(rd, intmath.sltu(rs1, imm))
 
     def instruction_beq(self, ins: "Instruction"):
-        rs1, rs2, dst = self.parse_rs_rs_imm(ins)
+        rs1, rs2, dst = self.parse_rs_rs_imm_int(ins)
         if rs1 == rs2:
             self.cpu.pc += dst.pcrel_value.value - 4
 
     def instruction_bne(self, ins: "Instruction"):
-        rs1, rs2, dst = self.parse_rs_rs_imm(ins)
+        rs1, rs2, dst = self.parse_rs_rs_imm_int(ins)
         if rs1 != rs2:
             self.cpu.pc += dst.pcrel_value.value - 4
 
     def instruction_blt(self, ins: "Instruction"):
-        rs1, rs2, dst = self.parse_rs_rs_imm(ins)
+        rs1, rs2, dst = self.parse_rs_rs_imm_int(ins)
         if rs1 < rs2:
             self.cpu.pc += dst.pcrel_value.value - 4
 
     def instruction_bge(self, ins: "Instruction"):
-        rs1, rs2, dst = self.parse_rs_rs_imm(ins)
+        rs1, rs2, dst = self.parse_rs_rs_imm_int(ins)
         if rs1 >= rs2:
             self.cpu.pc += dst.pcrel_value.value - 4
 
     def instruction_bltu(self, ins: "Instruction"):
-        rs1, rs2, dst = self.parse_rs_rs_imm(ins)
-        if rs1.unsigned_value < rs2.unsigned_value:
+        rs1, rs2, dst = self.parse_rs_rs_imm_int(ins)
+        if rs1 & MASK32 < rs2 & MASK32:
             self.cpu.pc += dst.pcrel_value.value - 4
 
     def instruction_bgeu(self, ins: "Instruction"):
-        rs1, rs2, dst = self.parse_rs_rs_imm(ins)
-        if rs1.unsigned_value >= rs2.unsigned_value:
+        rs1, rs2, dst = self.parse_rs_rs_imm_int(ins)
+        if rs1 & MASK32 >= rs2 & MASK32:
             self.cpu.pc += dst.pcrel_value.value - 4
 
     def instruction_j(self, ins: "Instruction"):
@@ -204,7 +217,7 @@ class RV32I(InstructionSet):
             ASSERT_LEN(ins.args, 2)
             reg = ins.get_reg(0)
             addr = ins.get_imm(1)
-        self.regs.set(reg, UInt32(self.cpu.pc))
+        self.regs.set_int(reg, self.cpu.pc)
         self.cpu.pc += addr.pcrel_value.value - 4
 
     def instruction_jalr(self, ins: "Instruction"):
@@ -212,12 +225,12 @@ class RV32I(InstructionSet):
         reg = ins.get_reg(0)
         base = ins.get_reg(1)
         addr = ins.get_imm(2).abs_value.value
-        self.regs.set(reg, Int32(self.cpu.pc))
-        self.cpu.pc = self.regs.get(base).unsigned_value + addr
+        self.regs.set_int(reg, self.cpu.pc)
+        self.cpu.pc = (self.regs.get_int(base) & MASK32) + addr
 
     def instruction_ret(self, ins: "Instruction"):
         ASSERT_LEN(ins.args, 0)
-        self.cpu.pc = self.regs.get("ra").unsigned_value
+        self.cpu.pc = self.regs.get_int("ra") & MASK32
 
     def instruction_ecall(self, ins: "Instruction"):
         self.instruction_scall(ins)
@@ -233,6 +246,8 @@ class RV32I(InstructionSet):
             raise
 
         syscall = Syscall(self.regs.get("a7"), self.cpu)
+        for hook in self.cpu.hooks["syscall"]:
+            hook(syscall)
         self.cpu.syscall_int.handle_syscall(syscall)
 
     def instruction_sbreak(self, ins: "Instruction"):
@@ -252,16 +267,285 @@ class RV32I(InstructionSet):
     def instruction_li(self, ins: "Instruction"):
         ASSERT_LEN(ins.args, 2)
         reg = ins.get_reg(0)
-        immediate = ins.get_imm(1).abs_value
-        self.regs.set(reg, Int32(immediate))
+        self.regs.set_int(reg, ins.get_imm(1).abs_value.value)
 
     def instruction_la(self, ins: "Instruction"):
         ASSERT_LEN(ins.args, 2)
         reg = ins.get_reg(0)
-        immediate = ins.get_imm(1).abs_value
-        self.regs.set(reg, Int32(immediate))
+        self.regs.set_int(reg, ins.get_imm(1).abs_value.value)
 
     def instruction_mv(self, ins: "Instruction"):
         ASSERT_LEN(ins.args, 2)
         rd, rs = ins.get_reg(0), ins.get_reg(1)
-        self.regs.set(rd, self.regs.get(rs))
+        self.regs.set_int(rd, self.regs.get_int(rs))
+
+    def fuse(
+        self, first: "Instruction", second: "Instruction"
+    ) -> Optional[Callable[[], None]]:
+        """
+        Fuse common instruction pairs into superinstructions:
+
+         - lui + addi (materializing a 32 bit constant)
+         - auipc + jalr (far calls and jumps)
+         - slli + add (address computations)
+         - addi + beq/bne/blt/bge (counted loops)
+
+        The second instruction has to consume the register written by the first one.
+        """
+        if not (self.handles(first) and self.handles(second)):
+            return None
+        if len(second.args) != 3:
+            return None
+
+        pair = (first.name, second.name)
+        try:
+            if pair == ("lui", "addi"):
+                return self._fuse_lui_addi(first, second)
+            if pair == ("auipc", "jalr"):
+                return self._fuse_auipc_jalr(first, second)
+            if pair == ("slli", "add"):
+                return self._fuse_slli_add(first, second)
+            if first.name == "addi" and second.name in _FUSABLE_BRANCHES:
+                return self._fuse_addi_branch(first, second)
+        except (NumberFormatException, ParseException):
+            # unresolvable immediates, leave the error to the unfused handlers
+            pass
+        return None
+
+    def _fuse_lui_addi(self, lui: "Instruction", addi: "Instruction"):
+        rd = lui.get_reg(0)
+        if len(lui.args) != 2 or rd == "zero" or addi.get_reg(1) != rd:
+            return None
+        rd2 = addi.get_reg(0)
+        upper = intmath.s32(lui.get_imm(1).abs_value.value << 12)
+        value = upper + addi.get_imm(2).abs_value.value
+        cpu = self.cpu
+        regs = self.regs
+
+        def fused():
+            regs.set_int(rd, upper)
+            cpu.cycle += 1
+            cpu.pc += 4
+            regs.set_int(rd2, value)
+
+        return fused
+
+    def _fuse_auipc_jalr(self, auipc: "Instruction", jalr: "Instruction"):
+        rd = auipc.get_reg(0)
+        if len(auipc.args) != 2 or rd == "zero" or jalr.get_reg(1) != rd:
+            return None
+        link = jalr.get_reg(0)
+        upper = intmath.s32(auipc.get_imm(1).abs_value.value << 12)
+        offset = jalr.get_imm(2).abs_value.value
+        cpu = self.cpu
+        regs = self.regs
+
+        def fused():
+            regs.set_int(rd, upper + cpu.pc)
+            cpu.cycle += 1
+            cpu.pc += 4
+            regs.set_int(link, cpu.pc)
+            cpu.pc = (regs.get_int(rd) & MASK32) + offset
+
+        return fused
+
+    def _fuse_slli_add(self, slli: "Instruction", add: "Instruction"):
+        rd = slli.get_reg(0)
+        rs1, rs2 = add.get_reg(1), add.get_reg(2)
+        if len(slli.args) != 3 or rd == "zero" or rd not in (rs1, rs2):
+            return None
+        src = slli.get_reg(1)
+        shift = slli.get_imm(2).abs_value.value
+        rd2 = add.get_reg(0)
+        cpu = self.cpu
+        regs = self.regs
+
+        def fused():
+            regs.set_int(rd, intmath.sll(regs.get_int(src), shift))
+            cpu.cycle += 1
+            cpu.pc += 4
+            regs.set_int(rd2, regs.get_int(rs1) + regs.get_int(rs2))
+
+        return fused
+
+    def _fuse_addi_branch(self, addi: "Instruction", branch: "Instruction"):
+        rd = addi.get_reg(0)
+        rs1, rs2 = branch.get_reg(0), branch.get_reg(1)
+        if len(addi.args) != 3 or rd == "zero" or rd not in (rs1, rs2):
+            return None
+        src = addi.get_reg(1)
+        imm = addi.get_imm(2).abs_value.value
+        offset = branch.get_imm(2).pcrel_value.value - 4
+        compare = _FUSABLE_BRANCHES[branch.name]
+        cpu = self.cpu
+        regs = self.regs
+
+        def fused():
+            regs.set_int(rd, regs.get_int(src) + imm)
+            cpu.cycle += 1
+            cpu.pc += 4
+            if compare(regs.get_int(rs1), regs.get_int(rs2)):
+                cpu.pc += offset
+
+        return fused
+
+    def specialize(self, ins: "Instruction") -> Optional[Callable[[], None]]:
+        """
+        Specialize the most common instructions of verified programs. The handlers access
+        the register file (Registers.x) directly, by register numbers resolved here,
+        without validating register names or marking registers as read or written for
+        the debugger.
+
+        Instructions using registers beyond x31 (see RunConfig.unlimited_registers), or
+        writing to zero, keep their regular handlers.
+        """
+        if not self.handles(ins) or not ins.args:
+            return None
+        name = ins.name
+        cpu = self.cpu
+        mmu = self.mmu
+        x = self.regs.x
+
+        if name in _SPECIALIZED_BRANCHES:
+            rs1, rs2 = _reg_num(ins, 0), _reg_num(ins, 1)
+            if rs1 is None or rs2 is None:
+                return None
+            offset = ins.get_imm(2).pcrel_value.value - 4
+            compare = _SPECIALIZED_BRANCHES[name]
+
+            def branch():
+                if compare(x[rs1], x[rs2]):
+                    cpu.pc += offset
+
+            return branch
+
+        if name == "sw":
+            rs, base = _reg_num(ins, 0), _reg_num(ins, 1)
+            if rs is None or base is None:
+                return None
+            offset = ins.get_imm(2).abs_value.unsigned_value
+
+            def store():
+                addr = (x[base] + offset) & 0xFFFFFFFF
+                mmu.write_i32(addr, x[rs])
+
+            return store
+
+        rd = _reg_num(ins, 0)
+        # None for registers beyond x31, zero for x0
+        if not rd:
+            return None
+
+        if name in _SPECIALIZED_ALU:
+            rs1, rs2 = _reg_num(ins, 1), _reg_num(ins, 2)
+            if rs1 is None or rs2 is None:
+                return None
+            op = _SPECIALIZED_ALU[name]
+
+            def alu():
+                x[rd] = ((op(x[rs1], x[rs2]) + 0x80000000) & 0xFFFFFFFF) - 0x80000000
+
+            return alu
+
+        if name in _SPECIALIZED_ALU_IMM:
+            rs1 = _reg_num(ins, 1)
+            if rs1 is None:
+                return None
+            imm = ins.get_imm(2).abs_value.value
+            if name in ("slli", "srli", "srai"):
+                imm = imm & 0b11111
+            op = _SPECIALIZED_ALU_IMM[name]
+
+            def alu_imm():
+                x[rd] = ((op(x[rs1], imm) + 0x80000000) & 0xFFFFFFFF) - 0x80000000
+
+            return alu_imm
+
+        if name == "lw":
+            base = _reg_num(ins, 1)
+            if base is None:
+                return None
+            offset = ins.get_imm(2).abs_value.unsigned_value
+
+            def load():
+                addr = (x[base] + offset) & 0xFFFFFFFF
+                x[rd] = mmu.read_i32(addr)
+
+            return load
+
+        if name in ("li", "la"):
+            value = ins.get_imm(1).abs_value.value
+
+            def load_imm():
+                x[rd] = value
+
+            return load_imm
+
+        if name == "mv":
+            rs = _reg_num(ins, 1)
+            if rs is None:
+                return None
+
+            def move():
+                x[rd] = x[rs]
+
+            return move
+
+        return None
+
+    def idiom(
+        self, sec: InstructionMemorySection, index: int
+    ) -> Optional[Callable[[], int]]:
+        """
+        Fast-forward byte loops, such as the ones in memset, strlen or strcpy, see
+        idioms.ByteLoop.
+        """
+        loop = recognize_byte_loop(self.cpu, sec, index)
+        if loop is None:
+            return None
+        if not all(
+            self.handles(ins) for ins in sec.instructions[index : index + loop.length]
+        ):
+            return None
+        return loop
+
+
+# conditional branches that can be fused, see RV32I.fuse
+_FUSABLE_BRANCHES = {
+    "beq": operator.eq,
+    "bne": operator.ne,
+    "blt": operator.lt,
+    "bge": operator.ge,
+}
+
+# instructions with specialized handlers, see RV32I.specialize
+_SPECIALIZED_BRANCHES = {
+    **_FUSABLE_BRANCHES,
+    "bltu": lambda a, b: (a & 0xFFFFFFFF) < (b & 0xFFFFFFFF),
+    "bgeu": lambda a, b: (a & 0xFFFFFFFF) >= (b & 0xFFFFFFFF),
+}
+
+_SPECIALIZED_ALU = {
+    "add": operator.add,
+    "sub": operator.sub,
+    "and": operator.and_,
+    "or": operator.or_,
+    "xor": operator.xor,
+}
+
+_SPECIALIZED_ALU_IMM = {
+    "addi": operator.add,
+    "andi": operator.and_,
+    "ori": operator.or_,
+    "xori": operator.xor,
+    "slli": operator.lshift,
+    "srli": lambda val, shift: (val & 0xFFFFFFFF) >> shift,
+    "srai": operator.rshift,
+}
+
+
+def _reg_num(ins: Instruction, num: int) -> Optional[int]:
+    """
+    Return the register number of operand num, or None if it is not one of x0-x31
+    """
+    return REGISTER_NUMBERS.get(ins.get_reg(num))
@@ -5,6 +5,7 @@ SPDX-License-Identifier: MIT
 """
 
 from .instruction_set import *
+from ..core import intmath
 
 
 class RV32M(InstructionSet):
@@ -12,34 +13,39 @@ class RV32M(InstructionSet):
     The RV32M Instruction set, containing multiplication and division instructions
     """
 
+    signatures = {
+        name: ("rrr",)
+        for name in ("mul", "mulh", "mulhsu", "mulhu", "div", "divu", "rem", "remu")
+    }
+
     def instruction_mul(self, ins: "Instruction"):
-        rd, rs1, rs2 = self.parse_rd_rs_rs(ins)
-        self.regs.set(rd, rs1 * rs2)
+        rd, rs1, rs2 = self.parse_rd_rs_rs_int(ins)
+        self.regs.set_int(rd, rs1 * rs2)
 
     def instruction_mulh(self, ins: "Instruction"):
-        rd, rs1, rs2 = self.parse_rd_rs_rs(ins)
-        self.regs.set(rd, Int32((rs1.signed().value * rs2.signed().value) >> 32))
+        rd, rs1, rs2 = self.parse_rd_rs_rs_int(ins)
+        self.regs.set_int(rd, intmath.mulh(rs1, rs2))
 
     def instruction_mulhsu(self, ins: "Instruction"):
-        rd, rs1, rs2 = self.parse_rd_rs_rs(ins)
-        self.regs.set(rd, Int32((rs1.signed().value * rs2.unsigned_value) >> 32))
+        rd, rs1, rs2 = self.parse_rd_rs_rs_int(ins)
+        self.regs.set_int(rd, intmath.mulhsu(rs1, rs2))
 
     def instruction_mulhu(self, ins: "Instruction"):
-        rd, rs1, rs2 = self.parse_rd_rs_rs(ins)
-        self.regs.set(rd, UInt32((rs1.unsigned_value * rs2.unsigned_value) >> 32))
+        rd, rs1, rs2 = self.parse_rd_rs_rs_int(ins)
+        self.regs.set_int(rd, intmath.mulhu(rs1, rs2))
 
     def instruction_div(self, ins: "Instruction"):
-        rd, rs1, rs2 = self.parse_rd_rs_rs(ins)
-        self.regs.set(rd, rs1 // rs2)
+        rd, rs1, rs2 = self.parse_rd_rs_rs_int(ins)
+        self.regs.set_int(rd, intmath.div(rs1, rs2))
 
     def instruction_divu(self, ins: "Instruction"):
-        rd, rs1, rs2 = self.parse_rd_rs_rs(ins, signed=False)
-        self.regs.set(rd, rs1 // rs2)
+        rd, rs1, rs2 = self.parse_rd_rs_rs_int(ins)
+        self.regs.set_int(rd, intmath.divu(rs1, rs2))
 
     def instruction_rem(self, ins: "Instruction"):
-        rd, rs1, rs2 = self.parse_rd_rs_rs(ins)
-        self.regs.set(rd, rs1 % rs2)
+        rd, rs1, rs2 = self.parse_rd_rs_rs_int(ins)
+        self.regs.set_int(rd, intmath.rem(rs1, rs2))
 
     def instruction_remu(self, ins: "Instruction"):
-        rd, rs1, rs2 = self.parse_rd_rs_rs(ins, signed=False)
-        self.regs.set(rd, rs1 % rs2)
+        rd, rs1, rs2 = self.parse_rd_rs_rs_int(ins)
+        self.regs.set_int(rd, intmath.remu(rs1, rs2))
@@ -7,6 +7,17 @@ from ..helpers import parse_numeric_argument
 
 
 class Zicsr(InstructionSet):
+    signatures = {
+        "csrrw": ("rrc",),
+        "csrrs": ("rrc",),
+        "csrrc": ("rrc",),
+        "csrrwi": ("ric",),
+        "csrrsi": ("ric",),
+        "csrrci": ("ric",),
+        "rdtime": ("r",),
+        "rdtimeh": ("r",),
+    }
+
     def instruction_csrrw(self, ins: Instruction):
         rd, new_val, csr = self._parse_csr_ins(ins)
         if rd != "zero":
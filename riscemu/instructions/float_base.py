@@ -1,14 +1,40 @@
-from typing import ClassVar, Generic, TypeVar, Tuple, Iterable, Callable, Type
+import math
+import operator
+from typing import (
+    ClassVar,
+    Generic,
+    TypeVar,
+    Tuple,
+    Iterable,
+    Callable,
+    Type,
+    Optional,
+)
 
 from .instruction_set import InstructionSet, Instruction
-from riscemu.core import BaseFloat, CPU, INS_NOT_IMPLEMENTED, UInt32
+from riscemu.core import BaseFloat, CPU, INS_NOT_IMPLEMENTED
+from riscemu.core.intmath import MASK32
 
 _FloatT = TypeVar("_FloatT", bound=BaseFloat)
 
 
 class FloatArithBase(Generic[_FloatT], InstructionSet):
+    """
+    Floating point instructions of a single precision. The instructions compute on
+    python floats, results are rounded to the precision when written to the register
+    file (see Registers.set_f32 and Registers.set_f64).
+    """
+
     flen: ClassVar[int]
     _float_cls: ClassVar[Type[BaseFloat]]
+    _get_f: ClassVar[str]
+    """
+    The name of the Registers method reading a value of this precision
+    """
+    _set_f: ClassVar[str]
+    """
+    The name of the Registers method writing a value of this precision
+    """
 
     def __init__(self, cpu: CPU):
         assert cpu.regs.flen >= self.flen, "{} implies cpu flen of at least {}".format(
@@ -29,7 +55,7 @@ class FloatArithBase(Generic[_FloatT], InstructionSet):
 
         """
         rd, rs1, rs2, rs3 = self.parse_rd_rs_rs_rs(ins)
-        self.regs.set_f(rd, rs1 * rs2 + rs3)
+        self.set_float(rd, rs1 * rs2 + rs3)
 
     def base_fmsub(self, ins: Instruction):
         """
@@ -43,7 +69,7 @@ class FloatArithBase(Generic[_FloatT], InstructionSet):
         | f[rd] = f[rs1]×f[rs2]-f[rs3]
         """
         rd, rs1, rs2, rs3 = self.parse_rd_rs_rs_rs(ins)
-        self.regs.set_f(rd, rs1 * rs2 - rs3)
+        self.set_float(rd, rs1 * rs2 - rs3)
 
     def base_fnmsub(self, ins: Instruction):
         """
@@ -57,7 +83,7 @@ class FloatArithBase(Generic[_FloatT], InstructionSet):
         | f[rd] = -f[rs1]×f[rs2]+f[rs3]
         """
         rd, rs1, rs2, rs3 = self.parse_rd_rs_rs_rs(ins)
-        self.regs.set_f(rd, -rs1 * rs2 + rs3)
+        self.set_float(rd, -rs1 * rs2 + rs3)
 
     def base_fnmadd(self, ins: Instruction):
         """
@@ -71,7 +97,7 @@ class FloatArithBase(Generic[_FloatT], InstructionSet):
         | f[rd] = -f[rs1]×f[rs2]-f[rs3]
         """
         rd, rs1, rs2, rs3 = self.parse_rd_rs_rs_rs(ins)
-        self.regs.set_f(rd, -rs1 * rs2 - rs3)
+        self.set_float(rd, -rs1 * rs2 - rs3)
 
     def base_fadd(self, ins: Instruction):
         """
@@ -92,10 +118,7 @@ class FloatArithBase(Generic[_FloatT], InstructionSet):
         | f[rd] = f[rs1] + f[rs2]
         """
         rd, rs1, rs2 = self.parse_rd_rs_rs(ins)
-        self.regs.set_f(
-            rd,
-            rs1 + rs2,
-        )
+        self.set_float(rd, rs1 + rs2)
 
     def base_fsub(self, ins: Instruction):
         """
@@ -109,10 +132,7 @@ class FloatArithBase(Generic[_FloatT], InstructionSet):
         | f[rd] = f[rs1] - f[rs2]
         """
         rd, rs1, rs2 = self.parse_rd_rs_rs(ins)
-        self.regs.set_f(
-            rd,
-            rs1 - rs2,
-        )
+        self.set_float(rd, rs1 - rs2)
 
     def base_fmul(self, ins: Instruction):
         """
@@ -126,10 +146,7 @@ class FloatArithBase(Generic[_FloatT], InstructionSet):
         | f[rd] = f[rs1] × f[rs2]
         """
         rd, rs1, rs2 = self.parse_rd_rs_rs(ins)
-        self.regs.set_f(
-            rd,
-            rs1 * rs2,
-        )
+        self.set_float(rd, rs1 * rs2)
 
     def base_fdiv(self, ins: Instruction):
         """
@@ -143,10 +160,7 @@ class FloatArithBase(Generic[_FloatT], InstructionSet):
         | f[rd] = f[rs1] / f[rs2]
         """
         rd, rs1, rs2 = self.parse_rd_rs_rs(ins)
-        self.regs.set_f(
-            rd,
-            rs1 / rs2,
-        )
+        self.set_float(rd, rs1 / rs2)
 
     def base_fsqrt(self, ins: Instruction):
         """
@@ -160,7 +174,8 @@ class FloatArithBase(Generic[_FloatT], InstructionSet):
         | f[rd] = sqrt(f[rs1])
         """
         rd, rs = self.parse_rd_rs(ins)
-        self.regs.set_f(rd, self._float_cls.bitcast(self.regs.get_f(rs)) ** 0.5)
+        val = self.get_float(rs)
+        self.set_float(rd, math.sqrt(val) if val >= 0 else math.nan)
 
     def base_fsgnj(self, ins: Instruction):
         """
@@ -216,13 +231,7 @@ class FloatArithBase(Generic[_FloatT], InstructionSet):
         | f[rd] = min(f[rs1], f[rs2])
         """
         rd, rs1, rs2 = self.parse_rd_rs_rs(ins)
-        self.regs.set_f(
-            rd,
-            min(
-                rs1,
-                rs2,
-            ),
-        )
+        self.set_float(rd, min(rs1, rs2))
 
     def base_fmax(self, ins: Instruction):
         """
@@ -236,13 +245,7 @@ class FloatArithBase(Generic[_FloatT], InstructionSet):
         | f[rd] = max(f[rs1], f[rs2])
         """
         rd, rs1, rs2 = self.parse_rd_rs_rs(ins)
-        self.regs.set_f(
-            rd,
-            max(
-                rs1,
-                rs2,
-            ),
-        )
+        self.set_float(rd, max(rs1, rs2))
 
     def base_feq(self, ins: Instruction):
         """
@@ -258,7 +261,7 @@ class FloatArithBase(Generic[_FloatT], InstructionSet):
         | x[rd] = f[rs1] == f[rs2]
         """
         rd, rs1, rs2 = self.parse_rd_rs_rs(ins)
-        self.regs.set(rd, UInt32(rs1 == rs2))
+        self.regs.set_int(rd, int(rs1 == rs2))
 
     def base_flt(self, ins: Instruction):
         """
@@ -274,7 +277,7 @@ class FloatArithBase(Generic[_FloatT], InstructionSet):
         | x[rd] = f[rs1] < f[rs2]
         """
         rd, rs1, rs2 = self.parse_rd_rs_rs(ins)
-        self.regs.set(rd, UInt32(rs1 < rs2))
+        self.regs.set_int(rd, int(rs1 < rs2))
 
     def base_fle(self, ins: Instruction):
         """
@@ -290,7 +293,7 @@ class FloatArithBase(Generic[_FloatT], InstructionSet):
         | x[rd] = f[rs1] <= f[rs2]
         """
         rd, rs1, rs2 = self.parse_rd_rs_rs(ins)
-        self.regs.set(rd, UInt32(rs1 <= rs2))
+        self.regs.set_int(rd, int(rs1 <= rs2))
 
     def base_fclass(self, ins: Instruction):
         """
@@ -319,9 +322,8 @@ class FloatArithBase(Generic[_FloatT], InstructionSet):
         :Implementation:
           | f[rd] = M[x[rs1] + sext(offset)][31:0]
         """
-        rd, addr = self.parse_mem_ins(ins)
-        bytes = self.mmu.read(addr.value, self.flen // 8)
-        self.regs.set_f(rd, self._float_cls(bytes))
+        rd, addr = self.parse_mem_ins_int(ins)
+        self.set_float(rd, self.mmu.read_value(addr, self._float_cls._struct))
 
     def base_save(self, ins: Instruction):
         """:Format:
@@ -333,9 +335,8 @@ class FloatArithBase(Generic[_FloatT], InstructionSet):
         :Implementation:
           | M[x[rs1] + sext(offset)] = f[rs2][31:0]
         """
-        rs, addr = self.parse_mem_ins(ins)
-        val = self._float_cls.bitcast(self.regs.get_f(rs))
-        self.mmu.write(addr.value, self.flen // 8, bytearray(val.bytes))
+        rs, addr = self.parse_mem_ins_int(ins)
+        self.mmu.write_value(addr, self._float_cls._struct, self.get_float(rs))
 
     def get_instructions(self) -> Iterable[Tuple[str, Callable[[Instruction], None]]]:
         yield from super().get_instructions()
@@ -349,7 +350,7 @@ class FloatArithBase(Generic[_FloatT], InstructionSet):
             ("fnmsub." + qual, self.base_fnmsub),
             ("fnmadd." + qual, self.base_fnmadd),
             ("fadd." + qual, self.base_fadd),
-            ("fsub." + qual, self.base_fnmadd),
+            ("fsub." + qual, self.base_fsub),
             ("fmul." + qual, self.base_fmul),
             ("fdiv." + qual, self.base_fdiv),
             ("fsqrt." + qual, self.base_fsqrt),
@@ -369,21 +370,102 @@ class FloatArithBase(Generic[_FloatT], InstructionSet):
         assert len(ins.args) == 2
         return ins.get_reg(0), ins.get_reg(1)
 
-    def parse_rd_rs_rs(self, ins: Instruction) -> Tuple[str, _FloatT, _FloatT]:
+    def get_float(self, reg: str) -> float:
+        """
+        Returns the value of float register reg in this precision
+        """
+        return getattr(self.regs, self._get_f)(reg)
+
+    def set_float(self, reg: str, val: float):
+        """
+        Round val to this precision and write it into float register reg
+        """
+        getattr(self.regs, self._set_f)(reg, val)
+
+    def parse_rd_rs_rs(self, ins: Instruction) -> Tuple[str, float, float]:
         assert len(ins.args) == 3
-        return (
-            ins.get_reg(0),
-            self._float_cls.bitcast(self.regs.get_f(ins.get_reg(1))),
-            self._float_cls.bitcast(self.regs.get_f(ins.get_reg(2))),
-        )
+        get = getattr(self.regs, self._get_f)
+        return ins.get_reg(0), get(ins.get_reg(1)), get(ins.get_reg(2))
 
-    def parse_rd_rs_rs_rs(
-        self, ins: Instruction
-    ) -> Tuple[str, _FloatT, _FloatT, _FloatT]:
+    def parse_rd_rs_rs_rs(self, ins: Instruction) -> Tuple[str, float, float, float]:
         assert len(ins.args) == 4
+        get = getattr(self.regs, self._get_f)
         return (
             ins.get_reg(0),
-            self._float_cls.bitcast(self.regs.get_f(ins.get_reg(1))),
-            self._float_cls.bitcast(self.regs.get_f(ins.get_reg(2))),
-            self._float_cls.bitcast(self.regs.get_f(ins.get_reg(3))),
+            get(ins.get_reg(1)),
+            get(ins.get_reg(2)),
+            get(ins.get_reg(3)),
         )
+
+    def specialize(self, ins: Instruction) -> Optional[Callable[[], None]]:
+        """
+        Specialize arithmetic, loads and stores of verified programs. The handlers bind
+        the register accessors of this precision and the operands up front.
+        """
+        if not self.handles(ins):
+            return None
+        regs = self.regs
+        get = getattr(regs, self._get_f)
+        set_ = getattr(regs, self._set_f)
+        op_name = ins.name.split(".")[0]
+
+        if op_name in _SPECIALIZED_BINARY and len(ins.args) == 3:
+            rd, rs1, rs2 = ins.get_reg(0), ins.get_reg(1), ins.get_reg(2)
+            op = _SPECIALIZED_BINARY[op_name]
+
+            def binary():
+                set_(rd, op(get(rs1), get(rs2)))
+
+            return binary
+
+        if op_name in _SPECIALIZED_FUSED and len(ins.args) == 4:
+            rd, rs1, rs2, rs3 = (ins.get_reg(i) for i in range(4))
+            op = _SPECIALIZED_FUSED[op_name]
+
+            def fused():
+                set_(rd, op(get(rs1), get(rs2), get(rs3)))
+
+            return fused
+
+        load_save_qual = {32: "w", 64: "d", 128: "q"}.get(self.flen)
+        if ins.name not in ("fl" + load_save_qual, "fs" + load_save_qual):
+            return None
+        if len(ins.args) != 3:
+            return None
+        reg, base = ins.get_reg(0), ins.get_reg(1)
+        offset = ins.get_imm(2).abs_value.value
+        codec = self._float_cls._struct
+        mmu = self.mmu
+
+        if ins.name[1] == "l":
+
+            def load():
+                addr = (regs.get_int(base) + offset) & MASK32
+                set_(reg, mmu.read_value(addr, codec))
+
+            return load
+
+        def store():
+            addr = (regs.get_int(base) + offset) & MASK32
+            mmu.write_value(addr, codec, get(reg))
+
+        return store
+
+
+# instructions with specialized handlers (without the precision suffix), see
+# FloatArithBase.specialize
+_SPECIALIZED_BINARY = {
+    "fadd": operator.add,
+    "fsub": operator.sub,
+    "fmul": operator.mul,
+    "fdiv": operator.truediv,
+    "fmin": min,
+    "fmax": max,
+}
+
+_SPECIALIZED_FUSED = {
+    "fmadd": lambda a, b, c: a * b + c,
+    "fmsub": lambda a, b, c: a * b - c,
+    "fnmsub": lambda a, b, c: -a * b + c,
+    "fnmadd": lambda a, b, c: -a * b - c,
+}
@@ -0,0 +1,308 @@
+"""
+RiscEmu (c) 2023 Anton Lydike
+
+SPDX-License-Identifier: MIT
+
+This file contains the recognition of byte loops, such as the ones in memset, strlen or
+strcpy. Instead of interpreting them one iteration at a time, their effects are applied
+using bytearray slice operations and bytearray.find.
+"""
+
+from typing import Dict, List, Optional, Tuple, Union, TYPE_CHECKING
+
+from ..core import (
+    BinaryDataMemorySection,
+    SparseMemorySection,
+    Instruction,
+    InstructionMemorySection,
+    REGISTER_NUMBERS,
+    T_AbsoluteAddress,
+)
+
+if TYPE_CHECKING:
+    from ..core import CPU
+
+MAX_LOOP_LENGTH = 16
+"""
+The maximum number of instructions in the body of a recognized loop
+"""
+
+_LOOP_INSTRUCTIONS = ("addi", "lb", "lbu", "sb", "beq", "bne", "j")
+
+
+class ByteLoop:
+    """
+    A loop walking over memory one byte per iteration, e.g.:
+
+        loop:
+            beq  a2, zero, end   // counter reaches zero
+            lb   t0, a1, 0       // at most one byte is loaded
+            sb   t0, a0, 0       // and at most one byte stored
+            addi a0, a0, 1       // pointers are incremented by one
+            addi a1, a1, 1
+            addi a2, a2, -1      // counters are decremented by one
+            bne  t0, zero, loop  // loaded byte matches a register
+
+    Besides addi, lb, lbu and sb, the loop consists only of beq and bne instructions
+    leaving it when a counter reaches zero or when the loaded byte equals a register that
+    isn't modified by the loop, and a final jump back to the header.
+
+    Calling the loop skips as many whole iterations as possible and returns their number.
+    The registers, memory and cycle count are updated as if the iterations were executed.
+    The iteration leaving the loop (or faulting) is always left to the interpreter, so the
+    pc is not changed.
+    """
+
+    header: T_AbsoluteAddress
+    length: int
+    """
+    The number of instructions executed per iteration
+    """
+
+    increments: Dict[str, int]
+    """
+    The value added to each modified register per iteration
+    """
+
+    counters: List[Tuple[str, int]]
+    """
+    Registers decremented by one per iteration. The loop is left when the register plus
+    the offset (the increments before the check) is zero.
+    """
+
+    load: Optional[Tuple[str, bool, str, int, int]]
+    """
+    The byte load as (rd, sign extended, base register, offset, position in the loop)
+    """
+
+    matches: List[str]
+    """
+    The loop is left when the loaded value equals one of these registers
+    """
+
+    store: Optional[Tuple[str, str, int, int]]
+    """
+    The byte store as (value register, base register, offset, position in the loop)
+    """
+
+    def __init__(
+        self,
+        cpu: "CPU",
+        header: T_AbsoluteAddress,
+        length: int,
+        increments: Dict[str, int],
+        counters: List[Tuple[str, int]],
+        load: Optional[Tuple[str, bool, str, int, int]],
+        matches: List[str],
+        store: Optional[Tuple[str, str, int, int]],
+    ):
+        self.cpu = cpu
+        self.header = header
+        self.length = length
+        self.increments = increments
+        self.counters = counters
+        self.load = load
+        self.matches = matches
+        self.store = store
+
+    def __call__(self) -> int:
+        cpu = self.cpu
+        x = cpu.regs.x
+        num = REGISTER_NUMBERS
+
+        count = 0xFFFFFFFF
+        if cpu.fast_forward_limit is not None:
+            count = (cpu.fast_forward_limit - cpu.cycle) // self.length
+        for reg, offset in self.counters:
+            count = min(count, (x[num[reg]] + offset) & 0xFFFFFFFF)
+        if count <= 0:
+            return 0
+
+        if self.store is not None:
+            value_reg, base, offset, store_pos = self.store
+            # resolved before the load, which then sees a page allocated for the store
+            dst, dst_start, dst_available = self._memory(x[num[base]] + offset, True)
+            if dst is None:
+                return 0
+
+        if self.load is not None:
+            rd, signed, base, offset, load_pos = self.load
+            src, src_start, available = self._memory(x[num[base]] + offset, False)
+            if src is None:
+                return 0
+            count = min(count, available)
+            for reg in self.matches:
+                value = x[num[reg]]
+                if -128 <= value < 128 if signed else 0 <= value < 256:
+                    pos = src.find(value & 0xFF, src_start, src_start + count)
+                    if pos >= 0:
+                        count = pos - src_start
+
+        if self.store is not None:
+            count = min(count, dst_available)
+            if self.load is not None and dst is src:
+                # bytes must not be loaded after they were overwritten by the loop
+                if dst_start > src_start:
+                    count = min(count, dst_start - src_start)
+                elif dst_start == src_start and store_pos < load_pos:
+                    return 0
+
+        if count <= 0:
+            return 0
+
+        if self.load is not None:
+            loaded = src[src_start : src_start + count]
+            last = loaded[-1]
+            if signed and last > 127:
+                last -= 256
+        if self.store is not None:
+            if self.load is not None and value_reg == rd:
+                dst[dst_start : dst_start + count] = loaded
+            else:
+                dst[dst_start : dst_start + count] = (
+                    bytes((x[num[value_reg]] & 0xFF,)) * count
+                )
+        if self.load is not None:
+            x[num[rd]] = last
+        for reg, increment in self.increments.items():
+            value = x[num[reg]] + increment * count
+            x[num[reg]] = ((value + 0x80000000) & 0xFFFFFFFF) - 0x80000000
+        cpu.cycle += count * self.length
+        return count
+
+    def _memory(
+        self, addr: int, write: bool
+    ) -> Tuple[Optional[Union[bytearray, bytes]], int, int]:
+        """
+        Return the backing bytearray of the data section containing addr, the offset of
+        addr in it and the number of bytes available from there. For sparse sections,
+        this is the page containing addr. Pages which were never written are only
+        allocated for writes, reads get ZERO_PAGE.
+        """
+        addr &= 0xFFFFFFFF
+        sec = self.cpu.mmu.get_sec_containing(addr)
+        # writes through the buffer would bypass the write trackers
+        if sec is None or sec.write_trackers:
+            return None, 0, 0
+        if type(sec) is SparseMemorySection:
+            return sec.page(addr - sec.base, allocate=write)
+        # only plain data sections, subclasses may intercept reads and writes
+        if type(sec) is not BinaryDataMemorySection:
+            return None, 0, 0
+        offset = addr - sec.base
+        return sec.data, offset, sec.size - offset
+
+    def __repr__(self):
+        return "ByteLoop(0x{:08X}, {} instructions)".format(self.header, self.length)
+
+
+def recognize_byte_loop(
+    cpu: "CPU", sec: InstructionMemorySection, index: int
+) -> Optional[ByteLoop]:
+    """
+    Recognize a byte loop (see ByteLoop) whose header is the instruction at index.
+
+    The instructions must be verified, their operands are not checked again.
+
+    :return: The loop, or None if there is no byte loop starting at index
+    """
+    header = sec.base + 4 * index
+    body = []
+    for ins in sec.instructions[index : index + MAX_LOOP_LENGTH]:
+        if ins.name not in _LOOP_INSTRUCTIONS or "fp" in ins.args:
+            return None
+        # registers beyond x31 aren't in the register file
+        if ins.name != "j" and any(r not in REGISTER_NUMBERS for r in ins.args[:2]):
+            return None
+        body.append(ins)
+        addr = header + 4 * (len(body) - 1)
+        if ins.name in ("beq", "bne", "j") and _target(ins, addr) == header:
+            break
+    else:
+        return None
+    end = header + 4 * len(body)
+
+    increments: Dict[str, int] = dict()
+    load = None
+    store = None
+    # (operand, operand, increments before the check, loaded before the check)
+    checks = []
+
+    for pos, ins in enumerate(body):
+        name, args = ins.name, ins.args
+        last = pos == len(body) - 1
+        if name == "addi":
+            if args[0] != args[1] or args[0] == "zero":
+                return None
+            increments[args[0]] = (
+                increments.get(args[0], 0) + ins.get_imm(2).abs_value.value
+            )
+        elif name in ("lb", "lbu"):
+            if load is not None or args[0] == "zero":
+                return None
+            offset = increments.get(args[1], 0) + ins.get_imm(2).abs_value.value
+            load = (args[0], name == "lb", args[1], offset, pos)
+        elif name == "sb":
+            if store is not None:
+                return None
+            offset = increments.get(args[1], 0) + ins.get_imm(2).abs_value.value
+            store = (args[0], args[1], offset, pos)
+        elif name == "j":
+            if not last:
+                return None
+        else:
+            target = _target(ins, header + 4 * pos)
+            if last:
+                leaves_if_equal = name == "bne"
+            elif header <= target < end:
+                return None
+            else:
+                leaves_if_equal = name == "beq"
+            if not leaves_if_equal:
+                return None
+            checks.append((args[0], args[1], dict(increments), load is not None))
+
+    loaded = load[0] if load is not None else None
+    if loaded in increments:
+        return None
+
+    counters = []
+    matches = []
+    for a, b, before, after_load in checks:
+        if a == "zero":
+            a, b = b, a
+        if b == "zero" and a in increments:
+            if increments[a] != -1:
+                return None
+            counters.append((a, before.get(a, 0)))
+            continue
+        if b == loaded:
+            a, b = b, a
+        if a == loaded and after_load and b not in increments and b != loaded:
+            matches.append(b)
+            continue
+        return None
+    if not counters and not matches:
+        return None
+
+    if load is not None and increments.get(load[2]) != 1:
+        return None
+    if store is not None:
+        value_reg, base, _, store_pos = store
+        if increments.get(base) != 1:
+            return None
+        if value_reg == loaded:
+            if store_pos < load[4]:
+                return None
+        elif value_reg in increments:
+            return None
+
+    return ByteLoop(cpu, header, len(body), increments, counters, load, matches, store)
+
+
+def _target(ins: Instruction, addr: T_AbsoluteAddress) -> T_AbsoluteAddress:
+    """
+    Return the target of the jump or branch ins located at addr
+    """
+    num = 0 if ins.name == "j" else 2
+    return addr + ins.get_imm(num).pcrel_value.value
@@ -4,13 +4,26 @@ RiscEmu (c) 2021 Anton Lydike
 SPDX-License-Identifier: MIT
 """
 
-from typing import Tuple, Callable, Dict, Union, Iterable
+from typing import (
+    Tuple,
+    Callable,
+    ClassVar,
+    Dict,
+    Union,
+    Iterable,
+    Optional,
+    TYPE_CHECKING,
+)
 
 from abc import ABC
 
 from ..core.exceptions import ASSERT_LEN
+from ..core.intmath import MASK32
 from ..core import Instruction, Int32, UInt32, Immediate, CPU, Registers
 
+if TYPE_CHECKING:
+    from ..core import InstructionMemorySection
+
 
 class InstructionSet(ABC):
     """
@@ -23,6 +36,19 @@ class InstructionSet(ABC):
     instructions containing a dot '.' should replace it with an underscore.
     """
 
+    signatures: ClassVar[Dict[str, Tuple[str, ...]]] = dict()
+    """
+    The accepted operand formats of each instruction, used to verify programs before
+    they run. A format is a string with one character per operand:
+
+     - r: integer register
+     - f: floating point register
+     - i: immediate value (number or symbol)
+     - c: csr name or number
+
+    Operands of instructions without an entry are not verified.
+    """
+
     def __init__(self, cpu: "CPU"):
         """Create a new instance of the Instruction set. This requires access to a CPU, and grabs vertain things
         from it such as access to the MMU and registers.
@@ -49,6 +75,53 @@ class InstructionSet(ABC):
             if member.startswith("instruction_"):
                 yield member[12:].replace("_", "."), getattr(self, member)
 
+    def handles(self, ins: "Instruction") -> bool:
+        """
+        Returns True if the CPU executes ins using a handler of this instruction set
+        """
+        handler = self.cpu.handler_for(ins)
+        return getattr(handler, "__self__", None) is self
+
+    def fuse(
+        self, first: "Instruction", second: "Instruction"
+    ) -> Optional[Callable[[], None]]:
+        """
+        Return a single handler executing first and second (which directly follows
+        first in memory), or None if this instruction set can't fuse them.
+
+        The fused handler is called after the CPU has done the bookkeeping for the
+        first instruction, it must then advance cycle and pc for the second one itself,
+        so that both are accounted for even if the second instruction raises.
+        """
+        return None
+
+    def specialize(self, ins: "Instruction") -> Optional[Callable[[], None]]:
+        """
+        Return a handler for the verified instruction ins, which may skip all checks the
+        regular handler does at runtime (operand count, register names). The handler is
+        called after the CPU did its bookkeeping for ins, just like a decoded one.
+
+        Return None to use the regular handler.
+        """
+        return None
+
+    def idiom(
+        self, sec: "InstructionMemorySection", index: int
+    ) -> Optional[Callable[[], int]]:
+        """
+        Recognize an idiom (such as a memset loop) starting at the instruction at index of
+        the verified section sec, and return a function fast-forwarding it.
+
+        The function is called whenever the pc reaches the instruction, before the
+        instruction itself runs. It applies the effects of as many loop iterations as
+        possible at once, including the cycle count, without passing
+        cpu.fast_forward_limit, leaves the pc unchanged and returns the number of
+        skipped iterations.
+
+        Return None if no idiom starts at index.
+        """
+        return None
+
     def parse_mem_ins(self, ins: "Instruction") -> Tuple[str, UInt32]:
         """
         parses rd, imm(rs) argument format and returns (rd, imm+rs1)
@@ -104,6 +177,50 @@ class InstructionSet(ABC):
             ins.get_imm(2),
         )
 
+    def parse_mem_ins_int(self, ins: "Instruction") -> Tuple[str, int]:
+        """
+        Like parse_mem_ins, but returns the address as a python integer
+        """
+        ASSERT_LEN(ins.args, 3)
+        rs = self.regs.get_int(ins.get_reg(1))
+        return ins.get_reg(0), (rs + ins.get_imm(2).abs_value.value) & MASK32
+
+    def parse_rd_rs_rs_int(self, ins: "Instruction") -> Tuple[str, int, int]:
+        """
+        Like parse_rd_rs_rs, but returns the values of rs1 and rs2 as signed python
+        integers (see core.intmath)
+        """
+        ASSERT_LEN(ins.args, 3)
+        return (
+            ins.get_reg(0),
+            self.regs.get_int(ins.get_reg(1)),
+            self.regs.get_int(ins.get_reg(2)),
+        )
+
+    def parse_rd_rs_imm_int(self, ins: "Instruction") -> Tuple[str, int, int]:
+        """
+        Like parse_rd_rs_imm, but returns the value of rs and the absolute value of the
+        immediate as signed python integers
+        """
+        ASSERT_LEN(ins.args, 3)
+        return (
+            ins.get_reg(0),
+            self.regs.get_int(ins.get_reg(1)),
+            ins.get_imm(2).abs_value.value,
+        )
+
+    def parse_rs_rs_imm_int(self, ins: "Instruction") -> Tuple[int, int, Immediate]:
+        """
+        Like parse_rs_rs_imm, but returns the values of rs1 and rs2 as signed python
+        integers
+        """
+        ASSERT_LEN(ins.args, 3)
+        return (
+            self.regs.get_int(ins.get_reg(0)),
+            self.regs.get_int(ins.get_reg(1)),
+            ins.get_imm(2),
+        )
+
     def get_reg_content(self, ins: "Instruction", ind: int) -> Int32:
         """
         get the register name from ins and then return the register contents
@@ -0,0 +1,19 @@
+"""
+RiscEmu (c) 2023 Anton Lydike
+
+SPDX-License-Identifier: MIT
+
+This package contains the optional compiling execution engine, which translates guest code
+into python functions.
+"""
+
+from .block_compiler import BlockCompiler, BasicBlock
+from .trace import Trace
+from .translation_cache import TranslationCache
+
+__all__ = [
+    "BlockCompiler",
+    "BasicBlock",
+    "Trace",
+    "TranslationCache",
+]
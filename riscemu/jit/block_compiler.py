@@ -0,0 +1,596 @@
+"""
+RiscEmu (c) 2023 Anton Lydike
+
+SPDX-License-Identifier: MIT
+
+This file contains the basic-block compiler. It translates straight-line guest code into
+Python source code operating on plain int register locals and compiles it into a single
+Python function per basic block.
+"""
+
+import linecache
+from typing import Callable, Dict, List, Optional, Tuple, Union, TYPE_CHECKING
+
+from ..core import (
+    Instruction,
+    InstructionMemorySection,
+    MemorySection,
+    NumberFormatException,
+    ParseException,
+    Registers,
+    T_AbsoluteAddress,
+)
+from ..instructions import RV32I, RV32M
+from .codegen import FACTORY_HEADER, emit_loads, emit_write_back
+from .trace import Trace
+
+if TYPE_CHECKING:
+    from ..core import CPU
+
+# emit the expression so that the result is wrapped to a signed 32 bit integer
+_WRAP = "(({}) + 0x80000000 & 0xFFFFFFFF) - 0x80000000"
+
+
+def _wrap(expr: str) -> str:
+    return _WRAP.format(expr)
+
+
+def _s32(val: int) -> int:
+    """
+    Wrap a python integer to a signed 32 bit value
+    """
+    return ((val + 0x80000000) & 0xFFFFFFFF) - 0x80000000
+
+
+# instructions in rd, rs1, rs2 format
+R_TYPE_OPS: Dict[str, str] = {
+    "add": _wrap("{1} + {2}"),
+    "sub": _wrap("{1} - {2}"),
+    "xor": "{1} ^ {2}",
+    "or": "{1} | {2}",
+    "and": "{1} & {2}",
+    "slt": "1 if {1} < {2} else 0",
+    "sltu": "1 if ({1} & 0xFFFFFFFF) < ({2} & 0xFFFFFFFF) else 0",
+    "sll": _wrap("{1} << ({2} & 31)"),
+    "srl": _wrap("({1} & 0xFFFFFFFF) >> ({2} & 31)"),
+    "sra": "{1} >> ({2} & 31)",
+    "mul": _wrap("{1} * {2}"),
+    "mulh": _wrap("{1} * {2} >> 32"),
+    "mulhsu": _wrap("{1} * ({2} & 0xFFFFFFFF) >> 32"),
+    "mulhu": _wrap("({1} & 0xFFFFFFFF) * ({2} & 0xFFFFFFFF) >> 32"),
+    "div": _wrap("{1} // {2}"),
+    "divu": _wrap("({1} & 0xFFFFFFFF) // ({2} & 0xFFFFFFFF)"),
+    "rem": _wrap("{1} % {2}"),
+    "remu": _wrap("({1} & 0xFFFFFFFF) % ({2} & 0xFFFFFFFF)"),
+}
+
+# instructions in rd, rs1, imm format, the immediate is pre-processed by the given function
+I_TYPE_OPS: Dict[str, Tuple[str, Callable[[int], int]]] = {
+    "addi": (_wrap("{1} + {2}"), int),
+    "xori": ("{1} ^ {2}", int),
+    "ori": ("{1} | {2}", int),
+    "andi": ("{1} & {2}", int),
+    "sltiu": ("1 if ({1} & 0xFFFFFFFF) < {2} else 0", lambda imm: imm & 0xFFFFFFFF),
+    "slli": (_wrap("{1} << {2}"), lambda imm: imm & 31),
+    "srli": (_wrap("({1} & 0xFFFFFFFF) >> {2}"), lambda imm: imm & 31),
+    "srai": ("{1} >> {2}", lambda imm: imm & 31),
+}
+
+# memory loads (rd, rs, imm), mapping to (width, signed)
+LOAD_OPS: Dict[str, Tuple[int, bool]] = {
+    "lb": (1, True),
+    "lh": (2, True),
+    "lw": (4, True),
+    "lbu": (1, False),
+    "lhu": (2, False),
+}
+
+# memory stores (rs2, rs1, imm), mapping to their width
+STORE_OPS: Dict[str, int] = {
+    "sb": 1,
+    "sh": 2,
+    "sw": 4,
+}
+
+# conditional branches (rs1, rs2, imm)
+BRANCH_OPS: Dict[str, str] = {
+    "beq": "{0} == {1}",
+    "bne": "{0} != {1}",
+    "blt": "{0} < {1}",
+    "bge": "{0} >= {1}",
+    "bltu": "({0} & 0xFFFFFFFF) < ({1} & 0xFFFFFFFF)",
+    "bgeu": "({0} & 0xFFFFFFFF) >= ({1} & 0xFFFFFFFF)",
+}
+
+
+class UnsupportedInstruction(Exception):
+    """
+    Raised internally when an instruction can't be compiled, the block ends before it.
+    """
+
+
+class BasicBlock:
+    """
+    The translation of a single basic block into python source code.
+    """
+
+    addr: T_AbsoluteAddress
+    """
+    The address of the first instruction of the block
+    """
+
+    instructions: List[Instruction]
+    """
+    The translated instructions
+    """
+
+    lines: List[str]
+    """
+    The python statements of the block, one per instruction
+    """
+
+    reads: List[str]
+    """
+    Registers that are loaded into locals on block entry
+    """
+
+    writes: List[str]
+    """
+    Registers that are written back to the register file on block exit
+    """
+
+    exit_pc: Optional[str]
+    """
+    An expression for the pc after the block, None if the block falls through
+    """
+
+    successors: List[T_AbsoluteAddress]
+    """
+    Statically known addresses where execution can continue after the block
+    """
+
+    def __init__(self, addr: T_AbsoluteAddress):
+        self.addr = addr
+        self.instructions = []
+        self.lines = []
+        self.reads = []
+        self.writes = []
+        self.exit_pc = None
+        self.successors = []
+
+    @property
+    def end(self) -> T_AbsoluteAddress:
+        return self.addr + 4 * len(self.instructions)
+
+    @property
+    def name(self) -> str:
+        return "block_{:08x}".format(self.addr)
+
+    def to_source(self) -> str:
+        """
+        Emit the source of a factory function, which takes the cpu, its register values
+        and memory accessors, and returns the compiled block.
+
+        Statements inside the try block are emitted one per line, so that the line number
+        of an exception can be used to recover the faulting instruction.
+        """
+        name = self.name
+        writes = set(self.writes)
+        # blocks always run to their end, the limit is only used by traces
+        src = [FACTORY_HEADER.format(name), "    def {}(limit):".format(name)]
+        src.extend(emit_loads(writes.union(self.reads), "        "))
+        src.append("        try:")
+        first_line = len(src) + 1
+        for line in self.lines:
+            src.append("            " + line)
+        src.append("        except BaseException as ex:")
+        src.append("            n = ex.__traceback__.tb_lineno - {}".format(first_line))
+        src.extend(emit_write_back(writes, "            "))
+        src.append("            cpu.pc = {} + 4 * n".format(self.addr + 4))
+        src.append("            cpu.cycle += n + 1")
+        src.append("            raise")
+        src.extend(emit_write_back(writes, "        "))
+        if self.exit_pc is None:
+            src.append("        cpu.pc = {}".format(self.end))
+        else:
+            src.append("        cpu.pc = {}".format(self.exit_pc))
+        src.append("        cpu.cycle += {}".format(len(self.instructions)))
+        src.append("    return {}".format(name))
+        return "\n".join(src) + "\n"
+
+    def __repr__(self):
+        return "BasicBlock(0x{:08X}, {} instructions)".format(
+            self.addr, len(self.instructions)
+        )
+
+
+class BlockCompiler:
+    """
+    Translates basic blocks of guest code into python functions and caches them by
+    their start address.
+
+    Each compiled block takes an instruction limit, and updates the registers, pc and
+    cycle count of the cpu as if the instructions were executed by the interpreter.
+    Blocks always run to their end, only traces stop at the limit (see Trace).
+
+    Only RV32I and RV32M instructions are compiled. A block ends before the first
+    instruction that can't be compiled, so that it is executed by the interpreter.
+    """
+
+    cpu: "CPU"
+    blocks: Dict[T_AbsoluteAddress, Optional[Callable[[int], None]]]
+    """
+    Compiled blocks by start address. Addresses where no block can be compiled map to None.
+    """
+
+    traces: Dict[T_AbsoluteAddress, Optional[Callable[[int], None]]]
+    """
+    Compiled traces by loop header. Loops that can't be traced map to None.
+    """
+
+    max_block_size: int = 256
+
+    hot_loop_threshold: int = 50
+    """
+    How often a backward jump has to be taken before the loop is traced
+    """
+
+    max_trace_blocks: int = 32
+
+    def __init__(self, cpu: "CPU"):
+        self.cpu = cpu
+        self.blocks = dict()
+        self.traces = dict()
+        # translations and compiled blocks, without any loop counting or traces
+        self._translations: Dict[T_AbsoluteAddress, Optional[BasicBlock]] = dict()
+        self._functions: Dict[T_AbsoluteAddress, Callable[[int], None]] = dict()
+        # only compile instructions that are handled by the default implementation
+        self._reference_impls = dict()
+        for ins_set in (RV32I, RV32M):
+            for member in dir(ins_set):
+                if member.startswith("instruction_"):
+                    name = member[12:].replace("_", ".")
+                    self._reference_impls[name] = getattr(ins_set, member)
+
+    def get_block(self, addr: T_AbsoluteAddress) -> Optional[Callable[[int], None]]:
+        """
+        Return the compiled block starting at addr, compiling it on first use.
+
+        :return: The compiled block, or None if the instruction at addr can't be compiled
+        """
+        if addr in self.blocks:
+            return self.blocks[addr]
+        if addr in self.cpu.native_functions:
+            # native functions are called by the interpreter
+            self.blocks[addr] = None
+            return None
+        block = self._translation(addr)
+        if block is None:
+            self.blocks[addr] = None
+            return None
+        return self.add_block(addr, self.compile(block), self.loop_header(block))
+
+    def add_block(
+        self,
+        addr: T_AbsoluteAddress,
+        func: Callable[[int], None],
+        loop_header: Optional[T_AbsoluteAddress] = None,
+    ) -> Callable[[int], None]:
+        """
+        Install the compiled block starting at addr.
+
+        If the block jumps back to loop_header, the jump is counted. Once it was taken
+        hot_loop_threshold times, the loop is traced.
+
+        :return: The installed function
+        """
+        if addr in self.cpu.native_functions:
+            self.blocks[addr] = None
+            return func
+        self._functions[addr] = func
+        func = self._fast_forwarding(addr, func)
+        if loop_header is not None and loop_header not in self.traces:
+            func = self._count_back_edge(addr, func, loop_header)
+        self.blocks[addr] = func
+        return func
+
+    @staticmethod
+    def loop_header(block: BasicBlock) -> Optional[T_AbsoluteAddress]:
+        """
+        Return the target of a backward jump at the end of block, if it has one.
+        """
+        for target in block.successors:
+            if target < block.end:
+                return target
+        return None
+
+    def compile_trace(
+        self, header: T_AbsoluteAddress
+    ) -> Optional[Callable[[int], None]]:
+        """
+        Trace the loop starting at header and install the trace in place of the header
+        block. The trace is recorded by executing one iteration of the loop, so this
+        must only be called when the cpu is about to execute header.
+
+        :return: The compiled trace, or None if the loop can't be traced
+        """
+        if header in self.traces:
+            return self.traces[header]
+        self.traces[header] = None
+        if header in self.cpu.native_functions:
+            return None
+
+        path = self._record_trace(header)
+        if path is None:
+            return None
+        func = self._fast_forwarding(header, self.compile(Trace(header, path)))
+        self.traces[header] = func
+        self.blocks[header] = func
+        return func
+
+    def _record_trace(self, header: T_AbsoluteAddress) -> Optional[List[BasicBlock]]:
+        path = []
+        pc = header
+        visited = set()
+        while len(path) < self.max_trace_blocks:
+            block = self._translation(pc)
+            # stop at untranslatable code and inner loops
+            if block is None or pc in visited:
+                return None
+            visited.add(pc)
+            path.append(block)
+
+            if pc not in self._functions:
+                self.get_block(pc)
+            self._functions[pc](0)
+
+            pc = self.cpu.pc
+            if pc == header:
+                return path
+        return None
+
+    def _count_back_edge(
+        self,
+        addr: T_AbsoluteAddress,
+        func: Callable[[int], None],
+        header: T_AbsoluteAddress,
+    ) -> Callable[[int], None]:
+        cpu = self.cpu
+        taken = 0
+
+        def counting_block(limit: int):
+            nonlocal taken
+            func(limit)
+            if cpu.pc == header:
+                taken += 1
+                if taken >= self.hot_loop_threshold:
+                    self.blocks[addr] = func
+                    self.compile_trace(header)
+
+        return counting_block
+
+    def _fast_forwarding(
+        self, addr: T_AbsoluteAddress, func: Callable[[int], None]
+    ) -> Callable[[int], None]:
+        """
+        Fast-forward the idiom starting at addr (see CPU.recognize_idiom) before running
+        the compiled function, if there is one.
+        """
+        sec = self.cpu.mmu.get_sec_containing(addr)
+        if not isinstance(sec, InstructionMemorySection) or not sec.verified:
+            return func
+        idiom = self.cpu.recognize_idiom(sec, (addr - sec.base) >> 2)
+        if idiom is None:
+            return func
+
+        def fast_forward(limit: int):
+            idiom()
+            func(limit)
+
+        return fast_forward
+
+    def _translation(self, addr: T_AbsoluteAddress) -> Optional[BasicBlock]:
+        if addr not in self._translations:
+            self._translations[addr] = self.translate(addr)
+        return self._translations[addr]
+
+    def compile(self, block: Union[BasicBlock, Trace]) -> Callable[[int], None]:
+        """
+        Compile a translated block or trace into a python function bound to this
+        compilers cpu.
+        """
+        source = block.to_source()
+        filename = "<riscemu {}>".format(block.name)
+        # register the source, so that tracebacks through compiled code are readable
+        linecache.cache[filename] = (
+            len(source),
+            None,
+            source.splitlines(True),
+            filename,
+        )
+        namespace = dict()
+        exec(compile(source, filename, "exec"), namespace)
+        return self.bind(namespace["make_" + block.name])
+
+    def bind(
+        self, factory: Callable[..., Callable[[int], None]]
+    ) -> Callable[[int], None]:
+        """
+        Create the function of a block from the factory function emitted by
+        BasicBlock.to_source, operating on this compilers cpu.
+        """
+        return factory(
+            self.cpu,
+            self.cpu.regs.x,
+            self.cpu.mmu.read,
+            self.cpu.mmu.write,
+            int.from_bytes,
+        )
+
+    def translate(self, addr: T_AbsoluteAddress) -> Optional[BasicBlock]:
+        """
+        Translate the basic block starting at addr.
+
+        :return: The translated block, or None if not even the first instruction can be translated
+        """
+        sec = self.cpu.mmu.get_sec_containing(addr)
+        if not self._can_compile_section(sec) or (addr - sec.base) % 4 != 0:
+            return None
+
+        block = BasicBlock(addr)
+        while addr < sec.end and len(block.instructions) < self.max_block_size:
+            ins = sec.read_ins(addr - sec.base)
+            try:
+                self._translate_instruction(block, ins, addr)
+            except UnsupportedInstruction:
+                break
+            block.instructions.append(ins)
+            if block.exit_pc is not None:
+                break
+            addr += 4
+
+        if not block.instructions:
+            return None
+        if block.exit_pc is None:
+            block.successors.append(block.end)
+        return block
+
+    @staticmethod
+    def _can_compile_section(sec: Optional[MemorySection]) -> bool:
+        # writable code could change under our feet, so we only compile read-only code
+        return sec is not None and sec.flags.executable and sec.flags.read_only
+
+    def _translate_instruction(
+        self, block: BasicBlock, ins: Instruction, addr: T_AbsoluteAddress
+    ):
+        name = ins.name
+        handler = self.cpu.handler_for(ins)
+        if (
+            name not in self._reference_impls
+            or getattr(handler, "__func__", None) is not self._reference_impls[name]
+        ):
+            raise UnsupportedInstruction(name)
+
+        args = len(ins.args)
+        if name in R_TYPE_OPS and args == 3:
+            expr = R_TYPE_OPS[name].format(
+                None, self._read(block, ins, 1), self._read(block, ins, 2)
+            )
+            self._assign(block, ins, 0, expr)
+        elif name in I_TYPE_OPS and args == 3:
+            template, fn = I_TYPE_OPS[name]
+            expr = template.format(
+                None, self._read(block, ins, 1), fn(self._imm(ins, 2))
+            )
+            self._assign(block, ins, 0, expr)
+        elif name in LOAD_OPS and args == 3:
+            width, signed = LOAD_OPS[name]
+            expr = 'from_bytes(read({}, {}), "little", signed={})'.format(
+                self._mem_addr(block, ins), width, signed
+            )
+            self._assign(block, ins, 0, expr)
+        elif name in STORE_OPS and args == 3:
+            width = STORE_OPS[name]
+            block.lines.append(
+                'write({}, {}, ({} & 0x{:X}).to_bytes({}, "little"))'.format(
+                    self._mem_addr(block, ins),
+                    width,
+                    self._read(block, ins, 0),
+                    (1 << (width * 8)) - 1,
+                    width,
+                )
+            )
+        elif name in ("li", "la") and args == 2:
+            self._assign(block, ins, 0, str(self._imm(ins, 1)))
+        elif name == "lui" and args == 2:
+            self._assign(block, ins, 0, str(_s32(self._imm(ins, 1) << 12)))
+        elif name == "auipc" and args == 2:
+            # the interpreter observes the already incremented pc here
+            value = _s32(_s32(self._imm(ins, 1) << 12) + addr + 4)
+            self._assign(block, ins, 0, str(value))
+        elif name == "mv" and args == 2:
+            self._assign(block, ins, 0, self._read(block, ins, 1))
+        elif name == "nop" and args == 0:
+            block.lines.append("pass")
+        elif name in BRANCH_OPS and args == 3:
+            cond = BRANCH_OPS[name].format(
+                self._read(block, ins, 0), self._read(block, ins, 1)
+            )
+            target = addr + self._pcrel(ins, 2)
+            block.lines.append("pc = {} if {} else {}".format(target, cond, addr + 4))
+            block.exit_pc = "pc"
+            block.successors.extend((target, addr + 4))
+        elif name == "j" and args == 1:
+            target = addr + self._pcrel(ins, 0)
+            block.lines.append("pass")
+            block.exit_pc = str(target)
+            block.successors.append(target)
+        elif name == "jal" and args in (1, 2):
+            target = addr + self._pcrel(ins, args - 1)
+            if args == 1:
+                self._assign_reg(block, "ra", str(_s32(addr + 4)))
+            else:
+                self._assign(block, ins, 0, str(_s32(addr + 4)))
+            block.exit_pc = str(target)
+            block.successors.append(target)
+        elif name == "jalr" and args == 3:
+            # the link register is written before the base register is read
+            imm = self._imm(ins, 2)
+            self._assign(block, ins, 0, str(_s32(addr + 4)))
+            block.lines[-1] += "; pc = ({} & 0xFFFFFFFF) + {}".format(
+                self._read(block, ins, 1), imm
+            )
+            block.exit_pc = "pc"
+        elif name == "ret" and args == 0:
+            block.lines.append(
+                "pc = {} & 0xFFFFFFFF".format(self._read_reg(block, "ra"))
+            )
+            block.exit_pc = "pc"
+        else:
+            raise UnsupportedInstruction(name)
+
+    def _mem_addr(self, block: BasicBlock, ins: Instruction) -> str:
+        return "({} + {}) & 0xFFFFFFFF".format(
+            self._read(block, ins, 1), self._imm(ins, 2)
+        )
+
+    def _reg(self, ins: Instruction, num: int) -> str:
+        reg = ins.get_reg(num)
+        # fp aliases s0, which would need two locals, leave it to the interpreter
+        if reg not in Registers.valid_regs or reg == "fp":
+            raise UnsupportedInstruction(reg)
+        return reg
+
+    def _imm(self, ins: Instruction, num: int) -> int:
+        try:
+            return ins.get_imm(num).abs_value.value
+        except (NumberFormatException, ParseException) as ex:
+            raise UnsupportedInstruction(ins.args[num]) from ex
+
+    def _pcrel(self, ins: Instruction, num: int) -> int:
+        try:
+            return ins.get_imm(num).pcrel_value.value
+        except (NumberFormatException, ParseException) as ex:
+            raise UnsupportedInstruction(ins.args[num]) from ex
+
+    def _read(self, block: BasicBlock, ins: Instruction, num: int) -> str:
+        return self._read_reg(block, self._reg(ins, num))
+
+    def _read_reg(self, block: BasicBlock, reg: str) -> str:
+        if reg == "zero":
+            return "0"
+        if reg not in block.reads:
+            block.reads.append(reg)
+        return "x_" + reg
+
+    def _assign(self, block: BasicBlock, ins: Instruction, num: int, expr: str):
+        self._assign_reg(block, self._reg(ins, num), expr)
+
+    def _assign_reg(self, block: BasicBlock, reg: str, expr: str):
+        if reg == "zero":
+            # writes to zero are discarded, but the expression may still raise
+            block.lines.append("_ = " + expr)
+            return
+        if reg not in block.writes:
+            block.writes.append(reg)
+        block.lines.append("x_{} = {}".format(reg, expr))
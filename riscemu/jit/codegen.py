@@ -0,0 +1,35 @@
+"""
+RiscEmu (c) 2023 Anton Lydike
+
+SPDX-License-Identifier: MIT
+
+This file contains code generation helpers shared by blocks and traces.
+"""
+
+from typing import Iterable, List
+
+from ..core import REGISTER_NUMBERS
+
+# the signature of the factory functions emitted for blocks and traces, see BlockCompiler.bind
+FACTORY_HEADER = "def make_{}(cpu, xregs, read, write, from_bytes):"
+
+
+def emit_loads(regs: Iterable[str], indent: str) -> List[str]:
+    """
+    Emit statements loading the given registers into locals
+    """
+    return [
+        "{0}x_{1} = xregs[{2}]".format(indent, reg, REGISTER_NUMBERS[reg])
+        for reg in sorted(regs)
+    ]
+
+
+def emit_write_back(regs: Iterable[str], indent: str) -> List[str]:
+    """
+    Emit statements writing the locals of the given registers back to the register file
+    """
+    # locals always hold wrapped, signed values, just like the register file
+    return [
+        "{0}xregs[{2}] = x_{1}".format(indent, reg, REGISTER_NUMBERS[reg])
+        for reg in sorted(regs)
+    ]
@@ -0,0 +1,130 @@
+"""
+RiscEmu (c) 2023 Anton Lydike
+
+SPDX-License-Identifier: MIT
+
+This file contains the tracing tier of the jit. A trace is the recorded path through one
+iteration of a hot loop, compiled into a python while loop that keeps guest registers
+in locals across iterations.
+"""
+
+from typing import List, Optional, TYPE_CHECKING
+
+from ..core import T_AbsoluteAddress
+from .codegen import FACTORY_HEADER, emit_loads, emit_write_back
+
+if TYPE_CHECKING:
+    from .block_compiler import BasicBlock
+
+
+class Trace:
+    """
+    The path through a loop, starting and ending at the loop header.
+
+    Where a block could leave the recorded path (conditional branches and computed jumps),
+    a guard is emitted. If the guard fails, the trace is left through a side exit, which
+    writes back the registers and continues at the actual pc.
+    """
+
+    header: T_AbsoluteAddress
+    """
+    The address of the loop header, where the trace is entered
+    """
+
+    blocks: List["BasicBlock"]
+    """
+    The blocks of one loop iteration, in execution order
+    """
+
+    max_instructions: int = 10000
+    """
+    The default limit of the compiled trace. It returns to the dispatch loop after the
+    first iteration ending at or past its limit, so that budgets are checked even in
+    endless loops
+    """
+
+    def __init__(self, header: T_AbsoluteAddress, blocks: List["BasicBlock"]):
+        self.header = header
+        self.blocks = blocks
+
+    @property
+    def name(self) -> str:
+        return "trace_{:08x}".format(self.header)
+
+    def to_source(self) -> str:
+        """
+        Emit the source of a factory function for the trace, see BasicBlock.to_source.
+
+        For every line of the loop, the pc and the number of instructions retired in the
+        current iteration are recorded, so that the state can be restored if an exception
+        is raised at that line. A pc of None means that the local pc is correct.
+
+        The compiled trace takes the number of instructions after which it returns, which
+        defaults to max_instructions. It always completes the current iteration, so it
+        may run past the limit by less than one iteration.
+        """
+        name = self.name
+        reads = set()
+        writes = set()
+        for block in self.blocks:
+            reads.update(block.reads)
+            writes.update(block.writes)
+
+        # per line: the pc and number of retired instructions
+        line_pcs: List[Optional[T_AbsoluteAddress]] = [self.header]
+        line_counts: List[int] = [0]
+        body = ["            while c < limit:"]
+        retired = 0
+
+        for i, block in enumerate(self.blocks):
+            for j, line in enumerate(block.lines):
+                retired += 1
+                body.append("                " + line)
+                line_pcs.append(block.addr + 4 * j + 4)
+                line_counts.append(retired)
+
+            if i + 1 < len(self.blocks):
+                expected = self.blocks[i + 1].addr
+            else:
+                expected = self.header
+            if block.exit_pc == "pc":
+                body.append(
+                    "                if pc != {}: k = {}; break".format(
+                        expected, retired
+                    )
+                )
+                line_pcs.append(None)
+                line_counts.append(retired)
+
+        body.append("                c += {}".format(retired))
+        body.append("            else:")
+        body.append("                pc = {}; k = 0".format(self.header))
+
+        src = [
+            FACTORY_HEADER.format(name),
+            "    PCS = {!r}".format(tuple(line_pcs)),
+            "    COUNTS = {!r}".format(tuple(line_counts)),
+            "    def {}(limit={}):".format(name, self.max_instructions),
+        ]
+        src.extend(emit_loads(reads.union(writes), "        "))
+        src.append("        c = 0")
+        src.append("        try:")
+        first_line = len(src) + 1
+        src.extend(body)
+        src.append("        except BaseException as ex:")
+        src.append("            n = ex.__traceback__.tb_lineno - {}".format(first_line))
+        src.extend(emit_write_back(writes, "            "))
+        src.append("            p = PCS[n]")
+        src.append("            cpu.pc = pc if p is None else p")
+        src.append("            cpu.cycle += c + COUNTS[n]")
+        src.append("            raise")
+        src.extend(emit_write_back(writes, "        "))
+        src.append("        cpu.pc = pc")
+        src.append("        cpu.cycle += c + k")
+        src.append("    return {}".format(name))
+        return "\n".join(src) + "\n"
+
+    def __repr__(self):
+        return "Trace(0x{:08X}, {})".format(
+            self.header, ", ".join("0x{:08X}".format(b.addr) for b in self.blocks)
+        )
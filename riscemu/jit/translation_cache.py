@@ -0,0 +1,322 @@
+"""
+RiscEmu (c) 2023 Anton Lydike
+
+SPDX-License-Identifier: MIT
+
+This file contains the translation cache. It translates loaded programs ahead of time into
+python modules, which can be imported by later runs instead of parsing and compiling the
+programs again.
+"""
+
+import hashlib
+import importlib.util
+import io
+import os
+import pprint
+from typing import List, Optional, Union, Dict, Any, Type, TYPE_CHECKING
+
+from .. import __version__
+from ..colors import FMT_GRAY, FMT_NONE
+from ..config import RunConfig
+from ..core import (
+    BinaryDataMemorySection,
+    SparseMemorySection,
+    InstructionMemorySection,
+    MemoryFlags,
+    Program,
+    SimpleInstruction,
+    T_AbsoluteAddress,
+    UserModeCPU,
+)
+from .block_compiler import BlockCompiler, BasicBlock
+
+if TYPE_CHECKING:
+    from ..instructions import InstructionSet
+    from ..riscemu_main import RiscemuSource
+
+TRANSLATION_FORMAT = 4
+"""
+Bump this whenever the generated code changes, to invalidate existing translations
+"""
+
+SEMANTIC_CONFIG_FIELDS = (
+    "stack_size",
+    "include_scall_symbols",
+    "add_accept_imm",
+    "unlimited_registers",
+    "flen",
+    "use_libc",
+)
+"""
+RunConfig fields that influence how programs are loaded or translated
+"""
+
+
+class TranslationCache:
+    """
+    A directory of programs translated into python modules.
+
+    Each module contains the loaded programs (with all addresses already resolved), one
+    factory function per basic block, a BLOCKS table mapping block addresses to
+    these factories and a LOOPS table mapping blocks ending in a backward jump to the
+    loop header. Python caches the modules bytecode when importing it, so later
+    runs skip parsing, translation and compilation.
+
+    Translations are keyed by the contents of all input files, the selected instruction
+    sets and the semantically relevant RunConfig fields (see SEMANTIC_CONFIG_FIELDS).
+    """
+
+    directory: str
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def key_for(
+        self,
+        sources: List[Union[str, "RiscemuSource"]],
+        instruction_sets: List[Type["InstructionSet"]],
+        cfg: RunConfig,
+    ) -> Optional[str]:
+        """
+        Calculate the cache key for a run. This reads all sources, streams of
+        RiscemuSource objects are replaced by in-memory copies.
+
+        :return: The key, or None if the inputs can't be cached (e.g. reading from stdin)
+        """
+        digest = hashlib.sha256()
+        digest.update(
+            "riscemu {} format {}\n".format(__version__, TRANSLATION_FORMAT).encode()
+        )
+        for ins_set in instruction_sets:
+            digest.update("isa {}\n".format(ins_set.__name__).encode())
+        for field in SEMANTIC_CONFIG_FIELDS:
+            digest.update("{}={!r}\n".format(field, getattr(cfg, field)).encode())
+
+        for source in sources:
+            if isinstance(source, str):
+                if source == "-":
+                    return None
+                name = source
+                with open(source, "rb") as f:
+                    content = f.read()
+            else:
+                name = source.name
+                content = source.stream.read()
+                if isinstance(content, str):
+                    source.stream = io.StringIO(content)
+                    content = content.encode()
+                else:
+                    source.stream = io.BytesIO(content)
+            digest.update("source {} {}\n".format(name, len(content)).encode())
+            digest.update(content)
+
+        return digest.hexdigest()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, "riscemu_{}.py".format(key[:32]))
+
+    def load(self, key: str, cpu: UserModeCPU) -> bool:
+        """
+        Load the translation for key into the cpu, if one exists.
+
+        :return: True if the programs were loaded from the cache
+        """
+        path = self.path_for(key)
+        if not os.path.isfile(path):
+            return False
+
+        spec = importlib.util.spec_from_file_location(os.path.basename(path)[:-3], path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        install_translation(cpu, module.PROGRAMS, module.BLOCKS, module.LOOPS)
+
+        if cpu.conf.verbosity > 2:
+            print(FMT_GRAY + "[Startup] Loaded translation {}".format(path) + FMT_NONE)
+        return True
+
+    def store(self, key: str, cpu: UserModeCPU) -> bool:
+        """
+        Translate the programs loaded into the cpu and store them under key.
+
+        Must be called before the programs are run, so that their initial state is
+        captured.
+
+        :return: True if the programs could be translated
+        """
+        source = translate_programs(cpu)
+        if source is None:
+            return False
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path_for(key)
+        # write to a temporary file first, so that concurrent runs never see partial files
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmp_path, "w") as f:
+            f.write(source)
+        os.replace(tmp_path, path)
+
+        if cpu.conf.verbosity > 2:
+            print(FMT_GRAY + "[Startup] Stored translation {}".format(path) + FMT_NONE)
+        return True
+
+
+def translate_programs(cpu: UserModeCPU) -> Optional[str]:
+    """
+    Translate all programs loaded into the cpu into the source code of a python module.
+
+    :return: The modules source, or None if the programs contain sections that can't be
+             serialized.
+    """
+    compiler = BlockCompiler(cpu)
+    programs = []
+    blocks: List[BasicBlock] = []
+
+    for program in cpu.mmu.programs:
+        sections = []
+        for sec in program.sections:
+            if isinstance(sec, InstructionMemorySection):
+                if not all(
+                    isinstance(ins, SimpleInstruction) for ins in sec.instructions
+                ):
+                    return None
+                sections.append(
+                    {
+                        "name": sec.name,
+                        "base": sec.base,
+                        "instructions": [
+                            (ins.name, tuple(ins.args), ins.addr - program.base)
+                            for ins in sec.instructions
+                        ],
+                    }
+                )
+                blocks.extend(_translate_section(compiler, sec, program))
+            elif type(sec) in (BinaryDataMemorySection, SparseMemorySection):
+                sections.append(
+                    {
+                        "name": sec.name,
+                        "base": sec.base,
+                        "data": bytes(sec.read(0, sec.size)),
+                        "flags": (sec.flags.read_only, sec.flags.executable),
+                        "sparse": type(sec) is SparseMemorySection,
+                    }
+                )
+            else:
+                return None
+
+        programs.append(
+            {
+                "name": program.name,
+                "base": program.base,
+                "labels": dict(program.context.labels),
+                "numbered_labels": dict(program.context.numbered_labels),
+                "global_labels": sorted(program.global_labels),
+                "relative_labels": sorted(program.relative_labels),
+                "sections": sections,
+            }
+        )
+
+    src = [
+        '"""',
+        "Programs translated by riscemu {}, do not edit.".format(__version__),
+        "",
+        "Sources: {}".format(", ".join(p.name for p in cpu.mmu.programs)),
+        '"""',
+        "",
+        "PROGRAMS = {}".format(pprint.pformat(programs, sort_dicts=False)),
+        "",
+    ]
+    for block in blocks:
+        src.append("")
+        src.append(block.to_source())
+    src.append("BLOCKS = {")
+    for block in blocks:
+        src.append("    {}: make_{},".format(block.addr, block.name))
+    src.append("}")
+    src.append("LOOPS = {")
+    for block in blocks:
+        header = BlockCompiler.loop_header(block)
+        if header is not None:
+            src.append("    {}: {},".format(block.addr, header))
+    src.append("}")
+    return "\n".join(src) + "\n"
+
+
+def _translate_section(
+    compiler: BlockCompiler, sec: InstructionMemorySection, program: Program
+) -> List[BasicBlock]:
+    """
+    Translate all blocks of a section, starting at the section start, every label and
+    every static jump target. Blocks that are missed (e.g. targets of computed jumps) are
+    compiled on demand at runtime.
+    """
+    leaders = [sec.base] + [
+        addr for addr in program.context.labels.values() if sec.base <= addr < sec.end
+    ]
+    seen = set()
+    blocks = []
+    while leaders:
+        addr = leaders.pop()
+        if addr in seen or not sec.base <= addr < sec.end:
+            continue
+        seen.add(addr)
+        block = compiler.translate(addr)
+        if block is None:
+            # the instruction is interpreted, the next one starts a new block
+            leaders.append(addr + 4)
+            continue
+        blocks.append(block)
+        leaders.extend(block.successors)
+        leaders.append(block.end)
+    return sorted(blocks, key=lambda block: block.addr)
+
+
+def install_translation(
+    cpu: UserModeCPU,
+    programs: List[Dict[str, Any]],
+    blocks: Dict[T_AbsoluteAddress, Any],
+    loops: Dict[T_AbsoluteAddress, T_AbsoluteAddress],
+):
+    """
+    Load the programs of a translated module into the cpu and install its blocks.
+    """
+    for desc in programs:
+        program = Program(desc["name"], base=desc["base"])
+        context = program.context
+        context.labels.update(desc["labels"])
+        context.numbered_labels.update(desc["numbered_labels"])
+        program.global_labels.update(desc["global_labels"])
+        program.relative_labels.update(desc["relative_labels"])
+
+        for sec in desc["sections"]:
+            if "instructions" in sec:
+                section = InstructionMemorySection(
+                    [
+                        SimpleInstruction(name, args, context, addr)
+                        for name, args, addr in sec["instructions"]
+                    ],
+                    sec["name"],
+                    context,
+                    program.name,
+                    sec["base"],
+                )
+            else:
+                section_cls = BinaryDataMemorySection
+                if sec.get("sparse"):
+                    section_cls = SparseMemorySection.from_data
+                section = section_cls(
+                    bytearray(sec["data"]),
+                    sec["name"],
+                    context,
+                    program.name,
+                    sec["base"],
+                    MemoryFlags(*sec["flags"]),
+                )
+            program.add_section(section)
+
+        cpu.mmu.load_program(program)
+
+    if cpu.block_compiler is None:
+        cpu.block_compiler = BlockCompiler(cpu)
+    compiler = cpu.block_compiler
+    for addr, factory in blocks.items():
+        compiler.add_block(addr, compiler.bind(factory), loops.get(addr))
@@ -45,12 +45,12 @@ _malloc_post_init:
         // t2 = base_ptr_offset
         lw  t2, 4(t0)
         // add allocated size to offset
-        add t2, t2, s0
+        add t3, t2, s0
         // check for overflow
         li  t4, MALLOC_PAGE_SIZE
-        bge t2, t4, _malloc_fail
+        bge t3, t4, _malloc_fail
         // save the new offset
-        sw  t2, 4(t0)
+        sw  t3, 4(t0)
         // calculate base_ptr + offset
         add a0, t2, t1
         // return that
@@ -77,6 +77,7 @@ _malloc_init:
         j   _malloc_post_init
 _malloc_fail:
         li a0, 0
+        lw  s0, -4(sp)
         ret
 
 // free is a nop, that's valid, but not very good^^
@@ -165,9 +166,12 @@ rand:
         la  t1, _rand_seed
         lw  a0, 0(t1)
         // three rounds of shifts:
-        sll a0, t0, 13          // x ^= x << 13;
-        srl a0, t0, 17          // x ^= x >> 17;
-        sll a0, t0, 5           // x ^= x << 5;
+        slli t0, a0, 13         // x ^= x << 13;
+        xor a0, a0, t0
+        srli t0, a0, 17         // x ^= x >> 17;
+        xor a0, a0, t0
+        slli t0, a0, 5          // x ^= x << 5;
+        xor a0, a0, t0
 	    sw  a0, 0(t1)
 	    ret
 
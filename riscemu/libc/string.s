@@ -126,7 +126,7 @@ memchr:
             andi a1, a1, 0xff   // trim a1 to be byte-sized
 __memchr_loop:
             beq  a2, zero, __memchr_ret_null
-            lb   s1, a0, 0
+            lbu  s1, a0, 0
             addi a0, a0, 1  // let a0 point to the next byte
             addi a2, a2, -1 // decrement bytes to copy by 1
             bne  s1, a1, __memchr_loop
@@ -144,10 +144,11 @@ __memchr_ret_null:
 
 memset:
 // void *memset(void *str, char c, size_t n)
+            mv   t0, a0         // keep str in a0 for return
 __memset_loop:
             beq  a2, zero, __memset_ret
-            sb   a1, a0, 0
-            addi a0, a0, 1
+            sb   a1, t0, 0
+            addi t0, t0, 1
             addi a2, a2, -1
             j    __memset_loop
 __memset_ret:
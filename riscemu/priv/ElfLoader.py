@@ -1,10 +1,11 @@
 import os.path
+import typing
 from io import IOBase, RawIOBase
-from typing import List
+from typing import List, Union
 
-from core.traps import *
+from ..core.traps import *
 from .types import ElfMemorySection
-from ..helpers import FMT_PARSE, FMT_NONE, FMT_GREEN, FMT_BOLD
+from ..helpers import FMT_PARSE, FMT_NONE, FMT_GREEN, FMT_BOLD, map_file
 from ..core import MemoryFlags, Program, ProgramLoader, T_ParserOpts
 
 FMT_ELF = FMT_GREEN + FMT_BOLD
@@ -27,6 +28,11 @@ class ElfBinaryFileLoader(ProgramLoader):
 
     program: Program
 
+    file_data: Union[memoryview, bytearray]
+    """
+    The contents of the elf file, mapped into memory. Sections are views into it.
+    """
+
     def __post_init__(self):
         self.program = Program(self.filename)
 
@@ -68,6 +74,8 @@ class ElfBinaryFileLoader(ProgramLoader):
 
         from elftools.elf.sections import SymbolTableSection
 
+        self.file_data = map_file(self.source)
+
         for sec in elf.iter_sections():
             if isinstance(sec, SymbolTableSection):
                 self._parse_symtab(sec)
@@ -80,9 +88,14 @@ class ElfBinaryFileLoader(ProgramLoader):
 
     def _lms_from_elf_sec(self, sec: "Section", owner: str):
         is_code = sec.name in (".text",)
-        data = bytearray(sec.data())
-        if len(data) < sec.data_size:
-            data += bytearray(len(data) - sec.data_size)
+        header = sec.header
+        if header.sh_type == "SHT_NOBITS":
+            data = bytearray(header.sh_size)
+        elif sec.compressed:
+            data = bytearray(sec.data())
+        else:
+            # a copy-on-write window into the file
+            data = self.file_data[header.sh_offset : header.sh_offset + header.sh_size]
         flags = MemoryFlags(is_code, is_code)
         print(
             FMT_ELF
@@ -11,6 +11,7 @@ from .types import MemoryImageDebugInfos
 from ..assembler import INSTRUCTION_SECTION_NAMES
 from ..colors import FMT_NONE, FMT_PARSE
 from ..core import MemoryFlags, ProgramLoader, Program, T_ParserOpts
+from ..helpers import map_file
 
 
 class MemoryImageLoader(ProgramLoader):
@@ -35,7 +36,7 @@ class MemoryImageLoader(ProgramLoader):
             debug_info = MemoryImageDebugInfos.load(debug_file.read())
 
         with self.source as source_file:
-            data: bytearray = bytearray(source_file.read())
+            data = map_file(source_file)
 
         for name, sections in debug_info.sections.items():
             program = Program(name)
@@ -69,12 +70,12 @@ class MemoryImageLoader(ProgramLoader):
         )
 
         with self.source as source_file:
-            data: bytes = source_file.read()
+            data = map_file(source_file)
 
         p = Program(self.filename)
         p.add_section(
             ElfMemorySection(
-                bytearray(data), ".text", p.context, p.name, 0, MemoryFlags(False, True)
+                data, ".text", p.context, p.name, 0, MemoryFlags(False, True)
             )
         )
         return p
@@ -1,5 +1,6 @@
-from .types import ElfMemorySection
-from core.mmu import *
+from .types import DemandPageSection
+from ..core.mmu import *
+from ..core.sparse_memory_section import PAGE_SIZE
 
 import typing
 
@@ -8,6 +9,17 @@ if typing.TYPE_CHECKING:
 
 
 class PrivMMU(MMU):
+    demand_pages: Dict[int, List[DemandPageSection]]
+    """
+    The memory outside of all loaded sections that was accessed, by page number. Each
+    page is split into one section per gap between loaded sections. They aren't part of
+    the loaded sections, so they don't slow down section lookups.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.demand_pages = dict()
+
     def get_sec_containing(self, addr: T_AbsoluteAddress) -> MemorySection:
         # try to get an existing section
         existing_sec = super().get_sec_containing(addr)
@@ -15,35 +27,106 @@ class PrivMMU(MMU):
         if existing_sec is not None:
             return existing_sec
 
-        # get section preceding empty space at addr
-        sec_before = next(
-            (sec for sec in reversed(self.sections) if sec.end < addr), None
-        )
-        # get sec succeeding empty space at addr
-        sec_after = next((sec for sec in self.sections if sec.base > addr), None)
+        # otherwise, the address is backed by a section created on demand
+        addr = int(addr)
+        page = addr >> self.page_bits
+        secs = self.demand_pages.setdefault(page, [])
+        for sec in secs:
+            if sec.base <= addr < sec.end:
+                return sec
 
-        # calc start and end of "free" space
-        prev_sec_end = 0 if sec_before is None else sec_before.end
-        next_sec_start = 0x7FFFFFFF if sec_after is None else sec_after.base
+        # fill the gap between the loaded sections around addr, inside of the page
+        start = page << self.page_bits
+        end = start + (1 << self.page_bits)
+        for other in (*self._page_entry(page), *secs):
+            if other.end <= addr:
+                start = max(start, other.end)
+            else:
+                end = min(end, other.base)
 
-        # start at the end of the prev section, or current address - 0xFFFF (aligned to 16 byte boundary)
-        start = max(prev_sec_end, align_addr(addr - 0xFFFF, 16))
-        # end at the start of the next section, or address + 0xFFFF (aligned to 16 byte boundary)
-        end = min(next_sec_start, align_addr(addr + 0xFFFF, 16))
+        sec = self._demand_page(start, end)
+        secs.append(sec)
+        return sec
 
-        sec = ElfMemorySection(
-            bytearray(end - start),
+    def _demand_page(self, start: int, end: int) -> DemandPageSection:
+        sec = DemandPageSection(
+            end - start,
             ".empty",
             self.global_instruction_context(),
             "",
             start,
             MemoryFlags(False, True),
         )
-        self.sections.append(sec)
-        self._update_state()
-
+        for dirty_pages in self.dirty_page_trackers:
+            dirty_pages.track(sec)
         return sec
 
+    def _map_section(self, sec: MemorySection):
+        super()._map_section(sec)
+        # the section replaces the memory created on demand in its place, the memory
+        # around it is kept
+        for page in range(sec.base >> self.page_bits, (sec.end >> self.page_bits) + 1):
+            secs = self.demand_pages.get(page)
+            if not secs:
+                continue
+            kept = []
+            for other in secs:
+                if other.end <= sec.base or sec.end <= other.base:
+                    kept.append(other)
+                    continue
+                for start, end in ((other.base, sec.base), (sec.end, other.end)):
+                    if start < end:
+                        part = self._demand_page(start, end)
+                        if other.pages:
+                            data = other.read(start - other.base, end - start)
+                            part.write(0, end - start, data)
+                        kept.append(part)
+            self.demand_pages[page] = kept
+
+    def track_dirty_pages(self) -> DirtyPageTracker:
+        dirty_pages = super().track_dirty_pages()
+        for secs in self.demand_pages.values():
+            for sec in secs:
+                dirty_pages.track(sec)
+        return dirty_pages
+
+    def snapshot(self) -> MemorySnapshot:
+        snapshot = super().snapshot()
+        snapshot.other_state["demand_pages"] = {
+            page: list(secs) for page, secs in self.demand_pages.items()
+        }
+        for secs in self.demand_pages.values():
+            for sec in secs:
+                snapshot.track(sec)
+        return snapshot
+
+    def restore(self, snapshot: MemorySnapshot):
+        super().restore(snapshot)
+        self.demand_pages = {
+            page: list(secs)
+            for page, secs in snapshot.other_state["demand_pages"].items()
+        }
+
+    def copy(self) -> "PrivMMU":
+        mmu = super().copy()
+        mmu.demand_pages = {
+            page: [sec.copy() for sec in secs]
+            for page, secs in self.demand_pages.items()
+        }
+        return mmu
+
+    @property
+    def materialized_bytes(self) -> int:
+        """
+        The number of bytes allocated for memory outside of the loaded sections, which
+        is only allocated once it is written to
+        """
+        return sum(
+            len(sec.pages) * PAGE_SIZE
+            for secs in self.demand_pages.values()
+            for sec in secs
+        )
+
     def global_instruction_context(self) -> InstructionContext:
         context = InstructionContext()
         context.global_symbol_dict = self.global_symbols
@@ -2,7 +2,7 @@ import json
 from collections import defaultdict
 from dataclasses import dataclass
 from functools import lru_cache
-from typing import Tuple, Dict, Set
+from typing import Tuple, Dict, Set, Union
 
 from riscemu.colors import FMT_NONE, FMT_PARSE
 from riscemu.decoder import format_ins, RISCV_REGS, decode
@@ -18,13 +18,15 @@ from riscemu.core import (
     MemoryFlags,
     T_AbsoluteAddress,
     BinaryDataMemorySection,
+    SparseMemorySection,
     Immediate,
+    opcode_for,
 )
 
 
 @dataclass(frozen=True)
 class ElfInstruction(Instruction):
-    name: str
+    opcode: int
     args: Tuple[int]
     encoded: int
 
@@ -47,9 +49,14 @@ class ElfInstruction(Instruction):
 
 
 class ElfMemorySection(BinaryDataMemorySection):
+    """
+    A section of an elf file or memory image. Its data is usually a memoryview of the
+    file mapped into memory (see riscemu.helpers.map_file).
+    """
+
     def __init__(
         self,
-        data: bytearray,
+        data: Union[bytearray, memoryview],
         name: str,
         context: InstructionContext,
         owner: str,
@@ -67,7 +74,12 @@ class ElfMemorySection(BinaryDataMemorySection):
             raise InstructionAccessFault(offset + self.base)
         if offset % 4 != 0:
             raise InstructionAddressMisalignedTrap(offset + self.base)
-        return ElfInstruction(*decode(self.data[offset : offset + 4]))
+        name, args, encoded = decode(self.data[offset : offset + 4])
+        return ElfInstruction(opcode_for(name), args, encoded)
+
+    def read(self, offset: T_RelativeAddress, size: int) -> bytearray:
+        # slices of memoryviews are views themselves
+        return bytearray(super().read(offset, size))
 
     def write(self, offset: T_RelativeAddress, size: int, data: bytearray):
         if self.flags.read_only:
@@ -77,6 +89,27 @@ class ElfMemorySection(BinaryDataMemorySection):
         self.read_ins.cache_clear()
         return super(ElfMemorySection, self).write(offset, size, data)
 
+    def write_value(self, offset: T_RelativeAddress, codec, value):
+        if self.flags.read_only:
+            raise LoadAccessFault(
+                "read-only section", offset + self.base, codec.size, "write"
+            )
+        self.read_ins.cache_clear()
+        return super(ElfMemorySection, self).write_value(offset, codec, value)
+
+
+class DemandPageSection(SparseMemorySection):
+    """
+    A page of memory outside of all loaded sections, created by the PrivMMU when it is
+    first accessed. Its memory is only allocated once it is written to.
+    """
+
+    def read_ins(self, offset):
+        if offset % 4 != 0:
+            raise InstructionAddressMisalignedTrap(offset + self.base)
+        name, args, encoded = decode(self.read(offset, 4))
+        return ElfInstruction(opcode_for(name), args, encoded)
+
     @property
     def end(self):
         return self.size + self.base
@@ -12,6 +12,8 @@ from .config import RunConfig
 from .helpers import FMT_GRAY, FMT_NONE
 from .parser import AssemblyFileLoader
 from .instructions.float_base import FloatArithBase
+from .jit.translation_cache import TranslationCache
+from .hle import LibcHLE
 
 
 @dataclass
@@ -82,6 +84,9 @@ class RiscemuMain:
                 "unlimited_regs",
                 "libc",
                 "ignore_exit_code",
+                "jit",
+                "no_verify",
+                "libc_hle",
             ),
             help="""Toggle options. Available options are:
         disable_debug:        Disable ebreak instructions
@@ -90,7 +95,10 @@ class RiscemuMain:
         add_accept_imm:       Accept "add rd, rs, imm" instruction (instead of addi)
         unlimited_regs:       Allow an unlimited number of registers
         libc:                 Load a libc-like runtime (for malloc, etc.)
-        ignore_exit_code:     Don't exit with the programs exit code.""",
+        ignore_exit_code:     Don't exit with the programs exit code.
+        jit:                  Compile basic blocks to python functions for faster execution
+        no_verify:            Don't verify programs before running them
+        libc_hle:             Run libc functions natively instead of emulating them (implies libc)""",
         )
 
         parser.add_argument(
@@ -126,6 +134,38 @@ class RiscemuMain:
             default=64,
         )
 
+        parser.add_argument(
+            "--jit-cache",
+            type=str,
+            metavar="DIR",
+            help="Cache translated programs in DIR and reuse them in later runs, implies -o jit",
+            nargs="?",
+        )
+
+        parser.add_argument(
+            "--libc-hle-exclude",
+            type=str,
+            metavar="FUNCS",
+            help="Comma separated list of libc functions that are emulated even with -o libc_hle",
+            nargs="?",
+        )
+
+        parser.add_argument(
+            "--max-instructions",
+            type=int,
+            metavar="N",
+            help="Halt the program after N instructions, with exit code 124",
+            nargs="?",
+        )
+
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            metavar="SECONDS",
+            help="Halt the program after running for SECONDS, with exit code 124",
+            nargs="?",
+        )
+
         parser.add_argument(
             "-v",
             "--verbose",
@@ -223,9 +263,20 @@ class RiscemuMain:
             scall_fs=args.syscall_opts["fs_access"],
             scall_input=not args.syscall_opts["disable_input"],
             verbosity=args.verbose,
-            use_libc=args.options["libc"],
+            use_libc=args.options["libc"] or args.options["libc_hle"],
+            libc_hle=args.options["libc_hle"],
+            libc_hle_exclude=(
+                tuple(args.libc_hle_exclude.split(","))
+                if args.libc_hle_exclude
+                else None
+            ),
             ignore_exit_code=args.options["ignore_exit_code"],
+            use_jit=args.options["jit"] or args.jit_cache is not None,
+            verify_programs=not args.options["no_verify"],
+            jit_cache_dir=args.jit_cache,
             flen=args.flen,
+            max_instructions=args.max_instructions,
+            max_runtime=args.timeout,
         )
         for k, v in dict(cfg_dict).items():
             if v is None:
@@ -234,6 +285,19 @@ class RiscemuMain:
         return RunConfig(**cfg_dict)
 
     def load_programs(self):
+        cache = None
+        cache_key = None
+        if self.cfg.use_jit and self.cfg.jit_cache_dir is not None:
+            cache = TranslationCache(self.cfg.jit_cache_dir)
+            cache_key = cache.key_for(
+                self.input_files, self.selected_ins_sets, self.cfg
+            )
+            if cache_key is not None and cache.load(cache_key, self.cpu):
+                self.cpu.link_programs()
+                self.verify_programs()
+                self.install_libc_hle()
+                return
+
         for path in self.input_files:
             max_bid = -1
             bidder = None
@@ -275,6 +339,28 @@ class RiscemuMain:
                     + FMT_NONE
                 )
 
+        self.cpu.link_programs()
+        self.verify_programs()
+        self.install_libc_hle()
+
+        if cache_key is not None:
+            cache.store(cache_key, self.cpu)
+
+    def verify_programs(self):
+        """
+        Verify all loaded programs, unless disabled in the config. This raises a
+        ProgramVerificationException listing all problems found.
+        """
+        if self.cfg.verify_programs:
+            self.cpu.verify_programs()
+
+    def install_libc_hle(self):
+        """
+        Run libc functions natively, if enabled in the config (see LibcHLE).
+        """
+        if self.cfg.libc_hle and isinstance(self.cpu, UserModeCPU):
+            LibcHLE(self.cpu).install(self.cfg.libc_hle_exclude)
+
     def run_from_cli(self, argv: List[str]):
         # register everything
         self.register_all_isas()
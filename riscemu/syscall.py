@@ -7,10 +7,11 @@ SPDX-License-Identifier: MIT
 import sys
 from dataclasses import dataclass
 from math import log2, ceil
-from typing import Dict, IO, Union
+from typing import Callable, Dict, IO, Union
 
 from .core import (
-    BinaryDataMemorySection,
+    MemorySection,
+    SparseMemorySection,
     MemoryFlags,
     Int32,
     CPU,
@@ -23,6 +24,8 @@ SYSCALLS = {
     64: "write",
     93: "exit",
     192: "mmap2",
+    215: "munmap",
+    216: "mremap",
     1024: "open",
     1025: "close",
 }
@@ -101,10 +104,29 @@ class SyscallInterface:
     open_files: Dict[int, IO]
     next_open_handle: int
 
-    def handle_syscall(self, scall: Syscall):
+    handlers: Dict[int, Callable[[Syscall], None]]
+    """
+    Syscalls registered at runtime (see register), they take precedence over the
+    built-in ones
+    """
+
+    def __init__(self):
+        self.handlers = dict()
         self.next_open_handle = 3
         self.open_files = {0: sys.stdin, 1: sys.stdout, 2: sys.stderr}
 
+    def register(self, num: int, handler: Callable[[Syscall], None]):
+        """
+        Handle the syscall number num by calling handler.
+        """
+        self.handlers[num] = handler
+
+    def handle_syscall(self, scall: Syscall):
+        handler = self.handlers.get(scall.id)
+        if handler is not None:
+            handler(scall)
+            return
+
         if getattr(self, scall.name):
             getattr(self, scall.name)(scall)
         else:
@@ -274,8 +296,8 @@ class SyscallInterface:
 
         # round size up to multiple of 4096
         size = 4096 * ceil(size / 4096)
-        section = BinaryDataMemorySection(
-            bytearray(size),
+        section = SparseMemorySection(
+            size,
             ".data.runtime-allocated",
             None,
             "system",
@@ -295,5 +317,93 @@ class SyscallInterface:
         # if that didn't work, return error
         return scall.ret(-1)
 
+    def munmap(self, scall: Syscall):
+        """
+        munmap syscall:
+
+        int munmap(void *addr, size_t length);
+
+        Unloads all sections created by mmap2 which are completely inside addr to
+        addr + length, sections which are only partially inside of it are kept. Their
+        address range is reused by later mmap2 calls. Fails without unloading anything
+        if the range contains other sections (e.g. of a program or the stack).
+        """
+        addr = scall.cpu.regs.get("a0").unsigned_value
+        size = scall.cpu.regs.get("a1").unsigned_value
+
+        if size == 0:
+            return scall.ret(-1)
+
+        sections = scall.cpu.mmu.sections_in_range(
+            addr, addr + 4096 * ceil(size / 4096)
+        )
+        if not all(self._is_mapped(section) for section in sections):
+            return scall.ret(-1)
+        for section in sections:
+            scall.cpu.mmu.unload_section(section)
+        return scall.ret(0)
+
+    def mremap(self, scall: Syscall):
+        """
+        mremap syscall:
+
+        void *mremap(void *old_address, size_t old_size,
+                    size_t new_size, int flags);
+
+        Only supported modes:
+        old_address = start of a section created by mmap2
+        old_size    = the size of that section
+        flags       = 0 or MREMAP_MAYMOVE (1)
+        """
+        addr = scall.cpu.regs.get("a0").unsigned_value
+        old_size = scall.cpu.regs.get("a1").unsigned_value
+        new_size = scall.cpu.regs.get("a2").unsigned_value
+        flags = scall.cpu.regs.get("a3").unsigned_value
+
+        # round sizes up to multiple of 4096
+        old_size = 4096 * ceil(old_size / 4096)
+        new_size = 4096 * ceil(new_size / 4096)
+
+        sections = scall.cpu.mmu.sections_in_range(addr, addr + old_size)
+        if (
+            new_size == 0
+            or len(sections) != 1
+            or not self._is_mapped(sections[0])
+            or sections[0].base != addr
+            or sections[0].size != old_size
+        ):
+            return scall.ret(-1)
+        section = sections[0]
+
+        # try to resize the section in place
+        if scall.cpu.mmu.resize_section(section, new_size):
+            return scall.ret(addr)
+        # otherwise move it, if we are allowed to (MREMAP_MAYMOVE)
+        if not flags & 1:
+            return scall.ret(-1)
+        moved = SparseMemorySection(
+            new_size,
+            section.name,
+            section.context,
+            section.owner,
+            flags=section.flags,
+        )
+        if section.write_trackers:
+            # the old section must keep its contents (see MemorySnapshot)
+            moved.pages = {i: bytearray(page) for i, page in section.pages.items()}
+        else:
+            moved.pages = section.pages
+        if not scall.cpu.mmu.load_section(moved):
+            return scall.ret(-1)
+        scall.cpu.mmu.unload_section(section)
+        return scall.ret(moved.base)
+
+    @staticmethod
+    def _is_mapped(section: MemorySection) -> bool:
+        """
+        Returns True if section was created by mmap2 (or moved by mremap)
+        """
+        return isinstance(section, SparseMemorySection) and section.owner == "system"
+
     def __repr__(self):
         return "{}(\n\tfiles={}\n)".format(self.__class__.__name__, self.open_files)
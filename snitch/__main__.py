@@ -23,4 +23,4 @@ class SnitchMain(RiscemuMain):
 
 
 if __name__ == "__main__":
-    SnitchMain().run_from_cli(sys.argv)
+    SnitchMain().run_from_cli(sys.argv[1:])
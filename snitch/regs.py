@@ -1,5 +1,5 @@
-from typing import Dict, List, Tuple
-from riscemu.core import Registers, MMU, BaseFloat
+from typing import Dict, List, Optional, Tuple
+from riscemu.core import Registers, MMU, BaseFloat, Float32, Float64
 
 from dataclasses import dataclass
 
@@ -64,32 +64,58 @@ class StreamingRegs(Registers):
             self.streams[reg] = stream_def
         super().__init__(infinite_regs=infinite_regs, flen=flen)
 
-    def get_f(self, reg) -> "BaseFloat":
+    def _next_element(self, reg: str, mode: StreamMode, size: int) -> Optional[int]:
+        """
+        Returns the address of the next element of the stream mapped to reg, or None if
+        reg isn't streamed. Elements smaller than flen are stored in the upper bytes.
+        """
         if not self.enabled or reg not in self.streams:
-            return super().get_f(reg)
+            return None
 
-        # do the streaming stuff:
         stream = self.streams[reg]
         # TODO: Implement other modes
-        assert stream.mode is StreamMode.READ
+        assert stream.mode is mode
         # TODO: Check overflow
         # TODO: repetition
         addr = stream.base + (stream.pos * stream.stride)
-        val = self._float_type(self.mem.read(addr, self.flen // 8))
         # increment pos
         stream.pos += 1
-        return val
+        return addr + (self.flen // 8) - size
+
+    def get_f(self, reg) -> "BaseFloat":
+        addr = self._next_element(reg, StreamMode.READ, self.flen // 8)
+        if addr is None:
+            return super().get_f(reg)
+        return self._float_type(self.mem.read(addr, self.flen // 8))
 
     def set_f(self, reg, val: "BaseFloat") -> bool:
-        if not self.enabled or reg not in self.streams:
+        data = val.bytes
+        addr = self._next_element(reg, StreamMode.WRITE, len(data))
+        if addr is None:
             return super().set_f(reg, val)
+        self.mem.write(addr, len(data), bytearray(data))
+        return True
 
-        stream = self.streams[reg]
-        assert stream.mode is StreamMode.WRITE
+    def get_f32(self, reg: str) -> float:
+        addr = self._next_element(reg, StreamMode.READ, 4)
+        if addr is None:
+            return super().get_f32(reg)
+        return Float32._struct.unpack(self.mem.read(addr, 4))[0]
 
-        addr = stream.base + (stream.pos * stream.stride)
-        data = val.bytes
-        self.mem.write(addr + (self.flen // 8) - len(data), len(data), bytearray(data))
+    def set_f32(self, reg: str, val: float):
+        addr = self._next_element(reg, StreamMode.WRITE, 4)
+        if addr is None:
+            return super().set_f32(reg, val)
+        self.mem.write(addr, 4, bytearray(Float32(val).bytes))
 
-        stream.pos += 1
-        return True
+    def get_f64(self, reg: str) -> float:
+        addr = self._next_element(reg, StreamMode.READ, 8)
+        if addr is None:
+            return super().get_f64(reg)
+        return Float64._struct.unpack(self.mem.read(addr, 8))[0]
+
+    def set_f64(self, reg: str, val: float):
+        addr = self._next_element(reg, StreamMode.WRITE, 8)
+        if addr is None:
+            return super().set_f64(reg, val)
+        self.mem.write(addr, 8, bytearray(Float64._struct.pack(val)))
@@ -1,3 +1,36 @@
+from typing import Iterable, Optional, Type
+
+from riscemu.config import RunConfig
+from riscemu.core import UserModeCPU
+from riscemu.instructions import InstructionSet, RV32I
+from riscemu.parser import parse_tokens
+from riscemu.tokenizer import tokenize
+
 from .test_tokenizer import *
 from .test_helpers import *
 from .test_integers import *
+
+
+def load_cpu(
+    source: str,
+    verify: bool = False,
+    isets: Iterable[Type[InstructionSet]] = (RV32I,),
+    stack: Optional[int] = None,
+    **kwargs
+) -> UserModeCPU:
+    """
+    Load the assembly source into a new UserModeCPU, with the pc at its entrypoint.
+
+    :param verify: Verify the program after loading it
+    :param isets: The instruction sets of the cpu
+    :param stack: The size of the stack to set up, no stack is set up by default
+    :param kwargs: The options of the RunConfig
+    """
+    cpu = UserModeCPU(list(isets), RunConfig(**kwargs))
+    cpu.load_program(parse_tokens("test.asm", tokenize(source.splitlines())))
+    if stack is not None:
+        cpu.setup_stack(stack)
+    if verify:
+        cpu.verify_programs()
+    cpu.pc = cpu.mmu.find_entrypoint()
+    return cpu
@@ -1,4 +1,5 @@
 // RUN: python3 -m riscemu -v -o ignore_exit_code,libc %s | filecheck %s
+// RUN: python3 -m riscemu -v -o ignore_exit_code,libc,jit %s | filecheck %s
 .data
 fibs:   .space 1024
 
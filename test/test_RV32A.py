@@ -0,0 +1,36 @@
+from riscemu.config import RunConfig
+from riscemu.core import UserModeCPU
+from riscemu.instructions import RV32A, RV32I
+from riscemu.parser import parse_tokens
+from riscemu.tokenizer import tokenize
+
+PROGRAM = """
+.data
+word:   .word 5
+.text
+main:
+    la          a0, word
+    li          a1, -7
+    amoadd.w    s1, a0, a1
+    amomaxu.w   s2, a0, a1
+    li          a1, 3
+    amoswap.w   s3, a0, a1
+    amomin.w    s4, a0, a1
+    lw          s5, a0, 0
+    li          a0, 0
+    li          a7, 93
+    scall
+"""
+
+
+def test_amo_instructions():
+    cpu = UserModeCPU([RV32I, RV32A], RunConfig())
+    cpu.load_program(parse_tokens("test.asm", tokenize(PROGRAM.splitlines())))
+    cpu.pc = cpu.mmu.find_entrypoint()
+    cpu.run()
+
+    assert cpu.regs.get("s1") == 5
+    assert cpu.regs.get("s2") == -2
+    assert cpu.regs.get("s3") == -2
+    assert cpu.regs.get("s4") == 3
+    assert cpu.regs.get("s5") == 3
@@ -1,7 +1,21 @@
+import math
 from typing import Union
 
+import pytest
+
+from riscemu.instructions import RV32I, RV32D
 from riscemu.instructions.RV32F import RV32F
-from riscemu.core import CPU, Float32, Int32, SimpleInstruction, Registers, BaseFloat
+from riscemu.core import (
+    CPU,
+    Float32,
+    Float64,
+    Int32,
+    SimpleInstruction,
+    Registers,
+    BaseFloat,
+)
+
+from . import load_cpu
 
 
 def is_close(a0: Union[float, int, BaseFloat], a1: Union[float, int, BaseFloat]):
@@ -47,6 +61,14 @@ def test_fcvt_instructions():
     RV32F(cpu).instruction_fcvt_w_s(ins)
     assert Int32(42) == cpu.regs.get("a1")
 
+    # NaN saturates to the largest integer
+    cpu.regs.set_f("fa1", Float32(float("nan")))
+    RV32F(cpu).instruction_fcvt_w_s(ins)
+    assert cpu.regs.get("a1").unsigned_value == 0x7FFFFFFF
+    ins = MockInstruction("fcvt.wu.s", ("a1", "fa1"), None, None)
+    RV32F(cpu).instruction_fcvt_wu_s(ins)
+    assert cpu.regs.get("a1").unsigned_value == 0xFFFFFFFF
+
 
 def test_single_precision_on_flen64():
     cpu = MockCPU(flen=64)
@@ -114,3 +136,49 @@ def test_single_precision_on_flen32():
     # fmax
     RV32F(cpu).base_fmax(ins)
     assert is_close(Float32.bitcast(cpu.regs.get_f("ft2")), max(100.0, 3))
+
+
+FLOAT_PROGRAM = """
+.data
+vals:   .word 0x40490fdb, 0x3f800000
+dbl:    .word 0x00000000, 0x40080000
+out:    .space 16
+.text
+main:
+    la          a0, vals
+    flw         ft0, 0(a0)
+    flw         ft1, 4(a0)
+    fsub.s      ft2, ft0, ft1
+    fmadd.s     ft3, ft0, ft1, ft2
+    fdiv.s      ft4, ft1, ft0
+    fmax.s      ft5, ft0, ft4
+    flt.s       s1, ft4, ft0
+    fmv.x.w     s2, ft4
+    fcvt.w.s    s3, ft3
+    la          a1, out
+    fsw         ft2, 0(a1)
+    fld         fa0, 8(a0)
+    fmul.d      fa1, fa0, fa0
+    fsd         fa1, 8(a1)
+    li          a0, 0
+    li          a7, 93
+    scall
+"""
+
+
+@pytest.mark.parametrize("verify", [False, True])
+def test_float_program(verify):
+    cpu = load_cpu(FLOAT_PROGRAM, verify=verify, isets=(RV32I, RV32F, RV32D), flen=64)
+    cpu.run()
+
+    pi = Float32(math.pi).value
+    out = cpu.mmu.find_symbol("out")
+    assert cpu.halted
+    assert cpu.regs.get_f32("ft2") == Float32(pi - 1).value
+    assert cpu.regs.get_f32("ft3") == Float32(pi + Float32(pi - 1).value).value
+    assert cpu.regs.get_f32("ft5") == pi
+    assert cpu.regs.get("s1") == 1
+    assert cpu.regs.get("s2").to_bytes() == Float32(1 / pi).bytes
+    assert cpu.regs.get("s3") == 5
+    assert Float32(cpu.mmu.read(out, 4)) == Float32(pi - 1)
+    assert cpu.mmu.read(out + 8, 8) == Float64(9).bytes
@@ -0,0 +1,176 @@
+from riscemu.core import UserModeCPU, Registers
+from riscemu.instructions import RV32I, RV32M
+from riscemu.jit import BlockCompiler
+
+from . import load_cpu
+
+PROGRAM = """
+.data
+buf:    .space 16
+
+.text
+main:
+    li      a0, 0x7FFFFFFF
+    addi    a1, a0, 1
+    lui     a2, 0xFFFFF
+    auipc   a3, 1
+    sub     a4, a2, a0
+    mul     a5, a0, a0
+    mulh    a6, a2, a0
+    mulhu   s0, a2, a0
+    div     s1, a2, a1
+    remu    s2, a0, a1
+    srli    s3, a2, 4
+    srai    s4, a2, 4
+    sll     s5, a0, a1
+    sltu    s6, a2, a0
+    slt     s7, a2, a0
+    xori    s8, a0, -1
+    la      t0, buf
+    sw      a2, 0(t0)
+    sb      a0, 5(t0)
+    lb      t1, 5(t0)
+    lbu     t2, 5(t0)
+    lh      t3, 2(t0)
+    lhu     t4, 2(t0)
+    lw      t5, 4(t0)
+    li      t6, 10
+    li      s9, 0
+loop:
+    jal     ra, step
+    addi    t6, t6, -1
+    bne     t6, zero, loop
+    add     zero, a0, a0
+    li      a0, 0
+    li      a7, 93
+    scall
+step:
+    add     s9, s9, t6
+    ret
+"""
+
+FAULTING_PROGRAM = """
+.text
+main:
+    li      a0, 1
+    li      a1, 0x10
+    addi    a0, a0, 1
+    lw      a2, 0(a1)
+    addi    a0, a0, 1
+    li      a7, 93
+    scall
+"""
+
+LOOP_PROGRAM = """
+.data
+nums:   .word 1, 2, 3, 4, 5, 6, 7, 8, 9, 10
+.text
+main:
+    li      a0, 0
+    li      a1, 0
+    la      a2, nums
+    li      a3, 100
+loop:
+    andi    t0, a1, 7
+    add     t0, t0, t0
+    add     t0, t0, t0
+    add     t0, a2, t0
+    lw      t1, 0(t0)
+    bge     t1, a1, skip
+    sub     a0, a0, t1
+    j       next
+skip:
+    add     a0, a0, t1
+next:
+    addi    a1, a1, 1
+    blt     a1, a3, loop
+    li      a1, -1
+    lw      a2, 0(a1)
+"""
+
+COUNTING_PROGRAM = """
+.text
+main:
+    li      a0, 0
+loop:
+    addi    a0, a0, 1
+    j       loop
+"""
+
+
+def run_program(source: str, **kwargs) -> UserModeCPU:
+    cpu = load_cpu(source, isets=(RV32I, RV32M), **kwargs)
+    cpu.launch()
+    return cpu
+
+
+def test_compiled_matches_interpreter():
+    interpreted = run_program(PROGRAM)
+    compiled = run_program(PROGRAM, use_jit=True)
+
+    assert compiled.block_compiler.blocks
+    assert compiled.cycle == interpreted.cycle
+    assert compiled.pc == interpreted.pc
+    for reg in Registers.valid_regs:
+        assert compiled.regs.get(reg) == interpreted.regs.get(reg), reg
+    data = [sec for sec in compiled.mmu.sections if sec.name == ".data"][0]
+    ref_data = [sec for sec in interpreted.mmu.sections if sec.name == ".data"][0]
+    assert data.data == ref_data.data
+
+
+def test_exception_inside_block():
+    interpreted = run_program(FAULTING_PROGRAM)
+    compiled = run_program(FAULTING_PROGRAM, use_jit=True)
+
+    assert compiled.halted
+    assert compiled.regs.get("a0") == 2
+    assert compiled.cycle == interpreted.cycle == 4
+    assert compiled.pc == interpreted.pc
+
+
+def test_trace_matches_interpreter():
+    interpreted = run_program(LOOP_PROGRAM)
+    compiled = run_program(LOOP_PROGRAM, use_jit=True)
+
+    assert compiled.block_compiler.traces
+    assert compiled.halted
+    assert compiled.cycle == interpreted.cycle
+    assert compiled.pc == interpreted.pc
+    for reg in Registers.valid_regs:
+        assert compiled.regs.get(reg) == interpreted.regs.get(reg), reg
+
+
+def test_exception_inside_trace():
+    # after 60 iterations, the load goes to an unmapped address
+    source = LOOP_PROGRAM.replace(
+        "andi    t0, a1, 7",
+        "sltiu   t0, a1, 60\n    addi    t0, t0, -1\n    slli    t0, t0, 20",
+    )
+    interpreted = run_program(source)
+    compiled = run_program(source, use_jit=True)
+
+    assert compiled.block_compiler.traces
+    assert compiled.halted
+    assert compiled.cycle == interpreted.cycle
+    assert compiled.pc == interpreted.pc
+    for reg in Registers.valid_regs:
+        assert compiled.regs.get(reg) == interpreted.regs.get(reg), reg
+
+
+def test_trace_stops_at_limit():
+    cpu = load_cpu(COUNTING_PROGRAM)
+    cpu.step()
+
+    # recording the trace executes the first iteration
+    trace = BlockCompiler(cpu).compile_trace(cpu.pc)
+    assert trace is not None
+    assert cpu.cycle == 3
+
+    # the current iteration is always completed
+    trace(7)
+    assert cpu.cycle == 11
+    assert cpu.regs.get("a0") == 5
+    trace(10)
+    assert cpu.cycle == 21
+    assert cpu.regs.get("a0") == 10
+    assert cpu.pc == cpu.mmu.find_symbol("loop")
@@ -0,0 +1,98 @@
+import pytest
+
+from riscemu.core import UserModeCPU
+
+from . import load_cpu
+
+PROGRAM = """
+.text
+main:
+    li      a0, 0
+    li      a1, 1000
+loop:
+    addi    a0, a0, 1
+    addi    a1, a1, -1
+    bne     a1, zero, loop
+done:
+    li      a7, 93
+    scall
+"""
+
+ENDLESS_PROGRAM = """
+.text
+main:
+    li      a0, 0
+loop:
+    addi    a0, a0, 1
+    j       loop
+"""
+
+
+@pytest.mark.parametrize("count", [1, 2, 3, 7, 100, 1000])
+def test_run_for_is_exact(count):
+    cpu = load_cpu(PROGRAM)
+
+    # the addi + bne pair is fused, but must not overshoot the limit
+    assert cpu.run_for(count) == count
+    assert cpu.cycle == count
+    assert not cpu.halted
+
+
+def test_run_for_stops_on_halt():
+    cpu = load_cpu(PROGRAM)
+
+    assert cpu.run_for(100000) == 3004
+    assert cpu.halted
+    assert cpu.exit_code == 1000
+
+
+def test_run_until_symbol():
+    cpu = load_cpu(PROGRAM)
+
+    assert cpu.run_until("done")
+    assert cpu.pc == cpu.mmu.find_symbol("done")
+    assert cpu.regs.get("a0") == 1000
+
+
+def test_run_until_inside_fused_pair():
+    cpu = load_cpu(PROGRAM)
+    target = cpu.mmu.find_symbol("loop") + 8
+
+    # the bne is fused with the preceding addi, but we have to stop right before it
+    for i in range(1, 4):
+        assert cpu.run_until(target)
+        assert cpu.pc == target
+        assert cpu.regs.get("a0") == i
+
+
+def test_run_until_limited():
+    cpu = load_cpu(ENDLESS_PROGRAM)
+
+    assert not cpu.run_until("main", max_instructions=50)
+    assert cpu.cycle == 50
+    with pytest.raises(ValueError):
+        cpu.run_until("unknown_symbol")
+
+
+@pytest.mark.parametrize("budget", [7, 12345, 50000, 50001])
+@pytest.mark.parametrize("use_jit", [False, True])
+def test_instruction_budget(use_jit, budget):
+    cpu = load_cpu(ENDLESS_PROGRAM, max_instructions=budget, use_jit=use_jit)
+    cpu.run()
+
+    assert cpu.halted
+    assert cpu.exit_code == UserModeCPU.BUDGET_EXCEEDED_EXIT_CODE
+    if use_jit:
+        # the last block or trace iteration (two instructions) is completed
+        assert budget <= cpu.cycle <= budget + 1
+    else:
+        assert cpu.cycle == budget
+
+
+@pytest.mark.parametrize("use_jit", [False, True])
+def test_runtime_budget(use_jit):
+    cpu = load_cpu(ENDLESS_PROGRAM, max_runtime=0.05, use_jit=use_jit)
+    cpu.run()
+
+    assert cpu.halted
+    assert cpu.exit_code == UserModeCPU.BUDGET_EXCEEDED_EXIT_CODE
@@ -0,0 +1,81 @@
+import pytest
+
+from . import load_cpu
+
+
+PROGRAM = """
+.data
+buf:    .space 16
+.text
+main:
+    la      a0, buf
+    li      a1, 120
+    li      a2, 8
+loop:
+    beq     a2, zero, end
+    sb      a1, a0, 0
+    addi    a0, a0, 1
+    addi    a2, a2, -1
+    j       loop
+end:
+    la      a0, buf
+    lw      a1, a0, 4
+    li      a0, 0
+    li      a7, 93
+    scall
+"""
+
+
+@pytest.mark.parametrize("use_jit", [False, True])
+def test_hooks_observe_every_instruction(use_jit):
+    ref = load_cpu(PROGRAM)
+    ref.run()
+    cpu = load_cpu(PROGRAM, verify=True, use_jit=use_jit)
+    steps, branches, accesses, syscalls = [], [], [], []
+    cpu.add_hook("step", lambda pc, ins: steps.append((pc, ins.name)))
+    cpu.add_hook("branch", lambda pc, target: branches.append((pc, target)))
+    cpu.add_hook("mem", lambda *access: accesses.append(access))
+    cpu.add_hook("syscall", lambda syscall: syscalls.append(syscall.id))
+    cpu.run()
+
+    loop, end, buf = (cpu.mmu.find_symbol(name) for name in ("loop", "end", "buf"))
+    assert cpu.halted
+    assert cpu.cycle == ref.cycle == len(steps)
+    assert steps.count((loop, "beq")) == 9
+    assert branches == [(loop + 16, loop)] * 8 + [(loop, end)]
+    writes = [(addr, bytes(data)) for access, addr, _, data in accesses[:8]]
+    assert writes == [(buf + i, b"x") for i in range(8)]
+    assert accesses[8:] == [("read", buf + 4, 4, bytearray(b"xxxx"))]
+    assert syscalls == [93]
+
+
+def test_run_for_with_hooks():
+    cpu = load_cpu(PROGRAM, verify=True)
+    steps = []
+    cpu.add_hook("step", lambda pc, ins: steps.append(pc))
+
+    assert cpu.run_for(10) == 10
+    assert len(steps) == 10
+    assert cpu.run_until("end")
+    assert steps[-1] == cpu.mmu.find_symbol("loop")
+
+
+def test_removed_hooks_are_uninstrumented():
+    cpu = load_cpu(PROGRAM, verify=True)
+    steps = []
+    hook = steps.append
+    cpu.add_hook("mem", hook)
+    assert cpu.instrumented
+    assert "read" in vars(cpu.mmu)
+    cpu.remove_hook("mem", hook)
+    cpu.run()
+
+    assert not cpu.instrumented
+    assert "read" not in vars(cpu.mmu)
+    assert steps == []
+
+
+def test_unknown_hook_kind():
+    cpu = load_cpu(PROGRAM, verify=True)
+    with pytest.raises(ValueError):
+        cpu.add_hook("retire", print)
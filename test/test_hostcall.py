@@ -0,0 +1,83 @@
+import hashlib
+
+import pytest
+
+from riscemu.core import HostCall, MemoryAccessException, ProgramVerificationException
+
+from . import load_cpu
+
+PROGRAM = """
+.data
+msg:    .asciiz "hello"
+out:    .space 16
+.text
+main:
+    la      a0, msg
+    li      a1, 5
+    crc     s1, a0, a1
+    addx    s2, s1, 7
+    la      a0, out
+    la      a1, msg
+    li      a2, 5
+    li      a7, 500
+    scall
+    mv      s3, a0
+    li      a0, 0
+    li      a7, 93
+    scall
+"""
+
+
+def crc(call: HostCall):
+    data = call.memory(call.get(1), call.get_unsigned(2))
+    call.set(0, hashlib.md5(data).digest()[0])
+
+
+def addx(call: HostCall):
+    call.set(0, call.get(1) + call.get(2))
+
+
+def upper(call: HostCall):
+    dest = call.memory(call.get(0), call.get_unsigned(2))
+    dest[:] = bytes(call.memory(call.get(1), call.get_unsigned(2))).upper()
+    call.set(0, 1)
+
+
+@pytest.mark.parametrize("use_jit", [False, True])
+def test_hostcalls(use_jit):
+    cpu = load_cpu(PROGRAM, use_jit=use_jit)
+    cpu.register_hostcall("crc", crc)
+    cpu.register_hostcall("addx", addx)
+    cpu.register_hostcall(500, upper)
+    cpu.verify_programs()
+    cpu.run()
+
+    expected = hashlib.md5(b"hello").digest()[0]
+    assert cpu.halted
+    assert cpu.regs.get("s1") == expected
+    assert cpu.regs.get("s2") == expected + 7
+    assert cpu.regs.get("s3") == 1
+    assert cpu.mmu.read(cpu.mmu.find_symbol("out"), 5) == b"HELLO"
+
+
+def test_hostcall_instructions_are_verified_as_known():
+    cpu = load_cpu(PROGRAM)
+    with pytest.raises(ProgramVerificationException):
+        cpu.verify_programs()
+
+    cpu.register_hostcall("crc", crc)
+    cpu.register_hostcall("addx", addx)
+    cpu.verify_programs()
+
+
+def test_hostcall_memory_must_be_mapped():
+    cpu = load_cpu(PROGRAM)
+    call = HostCall(cpu, ("a0",))
+    with pytest.raises(MemoryAccessException):
+        call.memory(0xFFFF0000, 4)
+
+
+def test_existing_instructions_cant_be_replaced():
+    cpu = load_cpu(PROGRAM)
+    with pytest.raises(ValueError):
+        cpu.register_hostcall("addi", addx)
@@ -0,0 +1,153 @@
+import pytest
+
+from riscemu.core import UserModeCPU, Registers, InstructionMemorySection
+
+from . import load_cpu
+
+PROGRAM = """
+.data
+src:    .asciiz "hello world, this is a test string"
+dst:    .space 64
+buf:    .space 300
+.text
+main:
+    la      a0, buf
+    li      a1, 120
+    li      a2, 256
+memset:
+    beq     a2, zero, 1f
+    sb      a1, a0, 0
+    addi    a0, a0, 1
+    addi    a2, a2, -1
+    j       memset
+1:
+    la      a0, src
+    li      s2, -1
+strlen:
+    lb      s1, a0, 0
+    addi    s2, s2, 1
+    addi    a0, a0, 1
+    bne     s1, zero, strlen
+    la      a0, dst
+    la      a1, src
+strcpy:
+    lb      t0, a1, 0
+    sb      t0, a0, 0
+    addi    a0, a0, 1
+    addi    a1, a1, 1
+    bne     t0, zero, strcpy
+    la      a0, src
+    li      a1, 116
+    li      a2, 40
+memchr:
+    beq     a2, zero, 2f
+    lb      t1, a0, 0
+    addi    a0, a0, 1
+    addi    a2, a2, -1
+    bne     t1, a1, memchr
+2:
+    // overlapping copy, which repeats the first three bytes
+    la      a1, dst
+    addi    a0, a1, 3
+    li      a2, 20
+overlap:
+    beq     a2, zero, 3f
+    lbu     t2, a1, 0
+    sb      t2, a0, 0
+    addi    a0, a0, 1
+    addi    a1, a1, 1
+    addi    a2, a2, -1
+    j       overlap
+3:
+    li      a0, 0
+    li      a7, 93
+    scall
+"""
+
+
+def assert_same_state(cpu: UserModeCPU, ref: UserModeCPU):
+    assert cpu.cycle == ref.cycle
+    assert cpu.pc == ref.pc
+    for reg in Registers.valid_regs:
+        assert cpu.regs.get(reg) == ref.regs.get(reg), reg
+    for sec, ref_sec in zip(cpu.mmu.sections, ref.mmu.sections):
+        if hasattr(sec, "data"):
+            assert sec.data == ref_sec.data, sec.name
+
+
+def test_byte_loops_are_recognized():
+    cpu = load_cpu(PROGRAM, verify=True)
+    sec = [s for s in cpu.mmu.sections if isinstance(s, InstructionMemorySection)][0]
+    headers = {
+        sec.base + 4 * i
+        for i in range(len(sec.instructions))
+        if cpu.recognize_idiom(sec, i) is not None
+    }
+
+    assert headers == {
+        cpu.mmu.find_symbol(name)
+        for name in ("memset", "strlen", "strcpy", "memchr", "overlap")
+    }
+
+
+@pytest.mark.parametrize("use_jit", [False, True])
+def test_fast_forward_matches_interpreter(use_jit):
+    ref = load_cpu(PROGRAM)
+    ref.run()
+    cpu = load_cpu(PROGRAM, verify=True, use_jit=use_jit)
+    cpu.run()
+
+    assert cpu.halted
+    assert cpu.regs.get("s2") == 34
+    assert_same_state(cpu, ref)
+
+
+@pytest.mark.parametrize("count", [1, 5, 100, 1000, 1300, 1471])
+def test_run_for_is_exact_with_idioms(count):
+    ref = load_cpu(PROGRAM)
+    ref.run_for(count)
+    cpu = load_cpu(PROGRAM, verify=True)
+
+    assert cpu.run_for(count) == count
+    assert_same_state(cpu, ref)
+
+
+def test_fast_forward_stops_at_unmapped_memory():
+    source = PROGRAM.replace("li      a2, 256", "li      a2, 400")
+    ref = load_cpu(source)
+    ref.run()
+    cpu = load_cpu(source, verify=True)
+    cpu.run()
+
+    assert cpu.halted
+    assert_same_state(cpu, ref)
+
+
+SPARSE_PROGRAM = """
+.bss
+buf:    .space 16384
+.text
+main:
+    la      a0, buf
+    li      a1, 1
+    li      a2, 12000
+memchr:
+    beq     a2, zero, 1f
+    lb      t1, a0, 0
+    addi    a0, a0, 1
+    addi    a2, a2, -1
+    bne     t1, a1, memchr
+1:
+    li      a0, 0
+    li      a7, 93
+    scall
+"""
+
+
+def test_loads_do_not_allocate_sparse_pages():
+    cpu = load_cpu(SPARSE_PROGRAM, verify=True)
+    buf = cpu.mmu.find_symbol("buf")
+    cpu.run()
+
+    assert cpu.regs.get("a0") == 0 and cpu.regs.get("a2") == 0
+    assert cpu.mmu.get_sec_containing(buf).pages == {}
@@ -1,4 +1,10 @@
-from riscemu.core import InstructionContext, SimpleInstruction, NumberFormatException
+from riscemu.core import (
+    InstructionContext,
+    SimpleInstruction,
+    NumberFormatException,
+    opcode_for,
+    opcode_name,
+)
 import pytest
 
 
@@ -51,3 +57,39 @@ def test_invalid_immediate_val():
         NumberFormatException, match="test2 is neither a number now a known symbol"
     ):
         ins.get_imm(2)
+
+
+def test_names_are_interned_into_opcodes():
+    ctx = InstructionContext()
+
+    ins = SimpleInstruction("addi", ("a0", "a1", "1"), ctx, 0x100)
+    other = SimpleInstruction("addi", ("a2", "a3", "2"), ctx, 0x104)
+    unknown = SimpleInstruction("not.an.instruction", (), ctx, 0x108)
+
+    assert ins.opcode == other.opcode == opcode_for("addi")
+    assert unknown.opcode != ins.opcode
+    assert ins.name == "addi"
+    assert opcode_name(unknown.opcode) == "not.an.instruction"
+
+
+def test_link_resolves_symbols_ahead_of_time():
+    ctx = InstructionContext()
+    ctx.base_address = 0x1000
+    ctx.labels["test"] = 0x1100
+    ctx.global_symbol_dict = {"glob": 0x2000}
+
+    ins = SimpleInstruction("beq", ("a0", "test", "glob"), ctx, 0x10)
+    ins.link()
+
+    # the symbolic form is kept for display
+    assert ins.args == ("a0", "test", "glob")
+    # later changes to the symbol tables don't affect linked instructions
+    ctx.labels["test"] = 0
+    ctx.global_symbol_dict["glob"] = 0
+
+    assert ins.get_imm(1).abs_value == 0x1100
+    assert ins.get_imm(1).pcrel_value == 0x1100 - 0x1010
+    assert ins.get_imm(2).abs_value == 0x2000
+
+    with pytest.raises(NumberFormatException):
+        ins.get_imm(0)
@@ -1,4 +1,4 @@
-from riscemu.core import Int32, UInt32
+from riscemu.core import Int32, UInt32, intmath
 import pytest
 
 
@@ -23,7 +23,7 @@ def test_logical_right_shift():
             (0.0, 0),
             (-1.0, -1),
             (3.14159, 3),
-            (float("NaN"), Int32.MIN_VALUE),
+            (float("NaN"), Int32.MAX_VALUE),
             (float("-inf"), Int32.MIN_VALUE),
             (float("inf"), Int32.MAX_VALUE),
             (1.0e100, Int32.MAX_VALUE),
@@ -41,7 +41,7 @@ def test_float_to_int_conversion(val: float, expected_int: int):
         (
             (0.0, 0),
             (3.14159, 3),
-            (float("NaN"), UInt32.MIN_VALUE),
+            (float("NaN"), UInt32.MAX_VALUE),
             (float("-inf"), UInt32.MIN_VALUE),
             (float("inf"), UInt32.MAX_VALUE),
             (1.0e100, UInt32.MAX_VALUE),
@@ -52,3 +52,32 @@ def test_float_to_int_conversion(val: float, expected_int: int):
 )
 def test_float_to_uint_conversion(val: float, expected_int: int):
     assert UInt32.from_float(val) == expected_int
+
+
+VALUES = (0, 1, -1, 7, -7, 31, 32, 0x7FFFFFFF, -0x80000000, 0x12345678, -0x2468ACE)
+
+
+@pytest.mark.parametrize("a", VALUES)
+@pytest.mark.parametrize("b", VALUES)
+def test_intmath_matches_int32(a: int, b: int):
+    x, y = Int32(a), Int32(b)
+    assert intmath.add(a, b) == x + y
+    assert intmath.sub(a, b) == x - y
+    assert intmath.mul(a, b) == x * y
+    assert intmath.sll(a, b) == x << (y & 31)
+    assert intmath.srl(a, b) == x.shift_right_logical(y & 31)
+    assert intmath.sra(a, b) == x >> (y & 31)
+    assert intmath.sltu(a, b) == (x.unsigned_value < y.unsigned_value)
+    product = UInt32(x.unsigned_value * y.unsigned_value >> 32)
+    assert intmath.mulhu(a, b) == product.signed()
+    if b != 0:
+        assert intmath.div(a, b) == x // y
+        assert intmath.rem(a, b) == x % y
+        assert intmath.divu(a, b) == (x.unsigned() // y.unsigned()).signed()
+
+
+def test_sign_extend():
+    assert intmath.sign_extend(0x80, 8) == -128
+    assert intmath.sign_extend(0x7F, 8) == 127
+    assert intmath.sign_extend(0x18000, 16) == -0x8000
+    assert intmath.sign_extend(0xFFFF, 16) == Int32.sign_extend(0xFFFF, 16)
@@ -0,0 +1,138 @@
+import io
+
+import pytest
+
+from riscemu.config import RunConfig
+from riscemu.hle import LibcHLE
+from riscemu.instructions import RV32I, RV32M
+from riscemu.riscemu_main import RiscemuMain, RiscemuSource
+
+PROGRAM = """
+.data
+src:    .asciiz "the quick brown fox"
+.globl main
+.text
+main:
+    li      a0, 64
+    jal     malloc
+    mv      s1, a0
+    li      a0, 32
+    jal     malloc
+    mv      s2, a0
+    mv      a0, s1
+    li      a1, 65
+    li      a2, 63
+    jal     memset
+    mv      s3, a0
+    la      a0, src
+    jal     strlen
+    mv      s4, a0
+    mv      a0, s2
+    la      a1, src
+    jal     strcpy
+    mv      a0, s1
+    la      a1, src
+    li      a2, 30
+    jal     strncpy
+    addi    a0, s1, 40
+    la      a1, src
+    li      a2, 5
+    jal     strncpy
+    la      a0, src
+    li      a1, 113
+    li      a2, 20
+    jal     memchr
+    mv      s5, a0
+    la      a0, src
+    li      a1, 122
+    li      a2, 19
+    jal     memchr
+    mv      s6, a0
+    jal     rand
+    mv      s7, a0
+    jal     rand
+    mv      s8, a0
+    mv      a0, s1
+    jal     free
+    li      a0, 5000
+    jal     malloc
+    mv      s9, a0
+    li      a0, 0
+    li      a7, 93
+    scall
+"""
+
+
+def load(**kwargs) -> RiscemuMain:
+    main = RiscemuMain(RunConfig(use_libc=True, **kwargs))
+    main.selected_ins_sets = [RV32I, RV32M]
+    main.register_all_program_loaders()
+    main.input_files = [RiscemuSource("test.asm", io.StringIO(PROGRAM))]
+    main.add_libc_to_input_files()
+    main.instantiate_cpu()
+    main.load_programs()
+    return main
+
+
+def assert_same_results(main: RiscemuMain, ref: RiscemuMain):
+    cpu, ref_cpu = main.cpu, ref.cpu
+    assert cpu.cycle == ref_cpu.cycle
+    for reg in ("s1", "s2", "s3", "s4", "s5", "s6", "s7", "s8", "s9"):
+        assert cpu.regs.get(reg) == ref_cpu.regs.get(reg), reg
+    heap = cpu.regs.get("s1").unsigned_value
+    assert cpu.mmu.read(heap, 96) == ref_cpu.mmu.read(heap, 96)
+
+
+@pytest.mark.parametrize("use_jit", [False, True])
+def test_hle_matches_libc(use_jit):
+    ref = load()
+    ref.cpu.launch()
+    main = load(libc_hle=True, use_jit=use_jit)
+    assert len(main.cpu.native_functions) == len(LibcHLE.FUNCTIONS)
+    main.cpu.launch()
+
+    assert main.cpu.exit_code == 0
+    assert main.cpu.regs.get("s3") == main.cpu.regs.get("s1")
+    assert main.cpu.regs.get("s4") == 19
+    assert main.cpu.regs.get("s6") == 0
+    assert main.cpu.regs.get("s9") == 0
+    assert main.cpu.mmu.read(main.cpu.regs.get("s2").unsigned_value, 20) == (
+        b"the quick brown fox\0"
+    )
+    assert_same_results(main, ref)
+
+
+def test_hle_functions_are_called(monkeypatch):
+    calls = []
+    original = LibcHLE.hle_strlen
+
+    def hle_strlen(self):
+        calls.append(self.cpu.regs.get("a0").unsigned_value)
+        return original(self)
+
+    monkeypatch.setattr(LibcHLE, "hle_strlen", hle_strlen)
+    main = load(libc_hle=True)
+    main.cpu.launch()
+
+    assert calls == [main.cpu.mmu.find_symbol("src")]
+
+
+def test_excluded_functions_are_emulated():
+    ref = load()
+    ref.cpu.launch()
+    main = load(libc_hle=True, libc_hle_exclude=("memset", "malloc"))
+    addrs = set(main.cpu.native_functions)
+    main.cpu.launch()
+
+    assert main.cpu.mmu.find_symbol("memset") not in addrs
+    assert main.cpu.mmu.find_symbol("malloc") not in addrs
+    assert main.cpu.mmu.find_symbol("strlen") in addrs
+    assert_same_results(main, ref)
+
+
+@pytest.mark.parametrize("count", [10, 100, 500, 1000])
+def test_run_for_is_exact_with_hle(count):
+    main = load(libc_hle=True)
+    main.cpu.pc = main.cpu.mmu.find_entrypoint()
+
+    assert main.cpu.run_for(count) == count
@@ -0,0 +1,105 @@
+from riscemu.core import SparseMemorySection
+
+from . import load_cpu
+
+PROGRAM = """
+.text
+mmap:
+    li      a2, 3
+    li      a3, 0
+    li      a7, SCALL_MMAP2
+    scall
+    ret
+
+main:
+    // a = mmap(8192), b = mmap(4096), followed by another mmap
+    li      a0, 0
+    li      a1, 8192
+    jal     mmap
+    mv      s0, a0
+    li      a0, 0
+    li      a1, 4096
+    jal     mmap
+    mv      s1, a0
+    li      a0, 0
+    li      a1, 4096
+    jal     mmap
+    // munmap(a), c = mmap(4096) reuses a
+    mv      a0, s0
+    li      a1, 8192
+    li      a7, SCALL_MUNMAP
+    scall
+    mv      s3, a0
+    li      a0, 0
+    li      a1, 4096
+    jal     mmap
+    mv      s2, a0
+    li      t0, 42
+    sw      t0, 4092(s2)
+    // c grows in place into the rest of a
+    mv      a0, s2
+    li      a1, 4096
+    li      a2, 8192
+    li      a3, 0
+    li      a7, SCALL_MREMAP
+    scall
+    mv      s4, a0
+    // b has to move to grow
+    mv      a0, s1
+    li      a1, 4096
+    li      a2, 16384
+    li      a3, 1
+    li      a7, SCALL_MREMAP
+    scall
+    mv      s5, a0
+    li      a0, 0
+    li      a7, SCALL_EXIT
+    scall
+"""
+
+
+def test_munmap_and_mremap():
+    cpu = load_cpu(PROGRAM, stack=4096)
+    cpu.run()
+
+    a, b, c = (cpu.regs.get(reg).unsigned_value for reg in ("s0", "s1", "s2"))
+    assert cpu.regs.get("s3").value == 0
+    assert c == a
+    assert cpu.regs.get("s4").unsigned_value == c
+    assert cpu.mmu.get_sec_containing(c + 4096).base == c
+    assert cpu.mmu.read_u32(c + 4092) == 42
+
+    moved = cpu.regs.get("s5").unsigned_value
+    assert moved > b
+    assert cpu.mmu.get_sec_containing(b) is None
+    sec = cpu.mmu.get_sec_containing(moved + 16383)
+    assert isinstance(sec, SparseMemorySection)
+    assert sec.size == 16384
+
+
+UNMAP_PROGRAM = """
+.data
+value:  .word 42
+.text
+main:
+    li      a0, 0
+    li      a1, 0x7ffff000
+    li      a7, SCALL_MUNMAP
+    scall
+    mv      s0, a0
+    la      t0, value
+    lw      s1, 0(t0)
+    li      a0, 0
+    li      a7, SCALL_EXIT
+    scall
+"""
+
+
+def test_munmap_keeps_program_sections():
+    cpu = load_cpu(UNMAP_PROGRAM, stack=4096)
+    sections = list(cpu.mmu.sections)
+    cpu.run()
+
+    assert cpu.regs.get("s0").value == -1
+    assert cpu.regs.get("s1").value == 42
+    assert cpu.mmu.sections == sections
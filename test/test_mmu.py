@@ -0,0 +1,129 @@
+import pytest
+
+from riscemu.core import (
+    MMU,
+    BinaryDataMemorySection,
+    InstructionContext,
+    MemoryAccessException,
+    MemoryFlags,
+)
+
+
+def section(name: str, base: int, size: int) -> BinaryDataMemorySection:
+    return BinaryDataMemorySection(
+        bytearray(size),
+        name,
+        InstructionContext(),
+        "test",
+        base,
+        MemoryFlags(False, False),
+    )
+
+
+def test_sections_are_found_through_page_table():
+    mmu = MMU()
+    # a and b share a page, c spans several pages and d is in another page table
+    a, b = section("a", 0x100, 0x10), section("b", 0x110, 0x20)
+    c, d = section("c", 0x3000, 0x2800), section("d", 0xFFFF0000, 0x10000)
+    for sec in (c, a, d, b):
+        assert mmu.load_section(sec, fixed_position=True)
+
+    assert mmu.get_sec_containing(0x100) is a
+    assert mmu.get_sec_containing(0x10F) is a
+    assert mmu.get_sec_containing(0x110) is b
+    assert mmu.get_sec_containing(0x130) is None
+    assert mmu.get_sec_containing(0x2FFF) is None
+    assert mmu.get_sec_containing(0x4000) is c
+    assert mmu.get_sec_containing(0x57FF) is c
+    assert mmu.get_sec_containing(0x5800) is None
+    assert mmu.get_sec_containing(0xFFFFFFFF) is d
+    assert mmu.get_sec_containing(-1) is None
+    assert mmu.get_sec_containing(0x1_0000_0100) is None
+
+
+def test_read_write_across_sections():
+    mmu = MMU()
+    mmu.load_section(section("a", 0x100, 0x10), fixed_position=True)
+    mmu.load_section(section("b", 0x8000, 0x10), fixed_position=True)
+    mmu.load_section(section("c", 0x110, 0x10), fixed_position=True)
+
+    for addr in (0x100, 0x8000, 0x110, 0x8004):
+        mmu.write(addr, 4, bytearray(addr.to_bytes(4, "little")))
+    for addr in (0x100, 0x8000, 0x110, 0x8004):
+        assert mmu.read(addr, 4) == addr.to_bytes(4, "little")
+
+
+def test_typed_access():
+    mmu = MMU()
+    mmu.load_section(section("a", 0x100, 0x20), fixed_position=True)
+
+    mmu.write_i32(0x100, -2)
+    assert mmu.read(0x100, 4) == b"\xfe\xff\xff\xff"
+    assert mmu.read_i32(0x100) == -2
+    assert mmu.read_u32(0x100) == 0xFFFFFFFE
+    assert mmu.read_i16(0x102) == -1
+    assert mmu.read_u16(0x100) == 0xFFFE
+    assert mmu.read_i8(0x100) == -2
+    assert mmu.read_u8(0x100) == 0xFE
+
+    mmu.write_u8(0x104, 0x80)
+    mmu.write_u16(0x106, 0x8001)
+    mmu.write_f32(0x108, 1.5)
+    mmu.write_f64(0x110, -0.25)
+    assert mmu.read_i8(0x104) == -128
+    assert mmu.read_i16(0x106) == -0x7FFF
+    assert mmu.read_f32(0x108) == 1.5
+    assert mmu.read_f64(0x110) == -0.25
+
+
+def test_typed_access_out_of_bounds():
+    mmu = MMU()
+    mmu.load_section(section("a", 0x100, 0x10), fixed_position=True)
+
+    with pytest.raises(MemoryAccessException):
+        mmu.read_u32(0x10E)
+    with pytest.raises(MemoryAccessException):
+        mmu.write_f64(0x10C, 1.0)
+    with pytest.raises(MemoryAccessException):
+        mmu.read_u8(0x200)
+
+
+def test_unloaded_sections_are_reused():
+    mmu = MMU()
+    a, b, c = section("a", 0, 0x1000), section("b", 0, 0x3000), section("c", 0, 0x10)
+    for sec in (a, b, c):
+        assert mmu.load_section(sec)
+    assert (a.base, b.base, c.base) == (0x100, 0x1100, 0x4100)
+
+    assert mmu.unload_section(a)
+    assert not mmu.unload_section(a)
+    assert mmu.get_sec_containing(0x100) is None
+    assert mmu.has_continuous_free_region(0x100, 0x1100)
+    assert not mmu.has_continuous_free_region(0x100, 0x1101)
+    assert mmu.unload_section(b)
+    assert mmu.sections == [c]
+
+    # first fit into the merged hole
+    d, e = section("d", 0, 0x2000), section("e", 0, 0x2000)
+    assert mmu.load_section(d) and mmu.load_section(e)
+    assert (d.base, e.base) == (0x100, 0x2100)
+    assert mmu.sections == [d, e, c]
+    assert mmu.get_sec_containing(0x4000) is e
+
+    # freeing the last section doesn't leave a hole behind
+    assert mmu.unload_section(c)
+    assert mmu._free_holes == []
+    assert mmu.sections_in_range(0, 0x4100) == [d, e]
+    assert mmu.sections_in_range(0x100, 0x4000) == [d]
+
+
+def test_access_without_sections():
+    mmu = MMU()
+    sec = section("a", 0x100, 0x10)
+    mmu.load_section(sec, fixed_position=True)
+    mmu.unload_section(sec)
+
+    with pytest.raises(MemoryAccessException):
+        mmu.read(0x100, 4)
+    with pytest.raises(MemoryAccessException):
+        mmu.write_u32(0x100, 0)
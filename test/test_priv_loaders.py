@@ -0,0 +1,71 @@
+import struct
+
+from riscemu.priv.ElfLoader import ElfBinaryFileLoader
+from riscemu.priv.ImageLoader import MemoryImageLoader
+from riscemu.priv.types import MemoryImageDebugInfos
+
+# addi a0, zero, 1
+ADDI = struct.pack("<I", 0x00100513)
+
+
+def elf_file(text: bytes, bss_size: int) -> bytes:
+    """
+    Build a minimal RV32 elf file with a .text and a .bss section
+    """
+    names = b"\0.text\0.bss\0.shstrtab\0"
+    text_offset = 52
+    names_offset = text_offset + len(text)
+    sh_offset = names_offset + len(names)
+    header = b"\x7fELF\x01\x01\x01" + bytes(9)
+    header += struct.pack(
+        "<HHIIIIIHHHHHH", 2, 243, 1, 0x1000, 0, sh_offset, 0, 52, 32, 0, 40, 4, 3
+    )
+    section_headers = [
+        (0, 0, 0, 0, 0, 0, 0, 0, 0, 0),
+        (1, 1, 6, 0x1000, text_offset, len(text), 0, 0, 4, 0),
+        (7, 8, 3, 0x2000, names_offset, bss_size, 0, 0, 4, 0),
+        (12, 3, 0, 0, names_offset, len(names), 0, 0, 1, 0),
+    ]
+    return (
+        header
+        + text
+        + names
+        + b"".join(struct.pack("<10I", *sh) for sh in section_headers)
+    )
+
+
+def test_elf_sections_are_mapped(tmp_path):
+    path = tmp_path / "test.elf"
+    path.write_bytes(elf_file(ADDI * 2, 0x100))
+
+    with open(path, "rb") as f:
+        program = ElfBinaryFileLoader.instantiate(str(path), f, {}).parse()
+
+    text, bss = program.sections
+    assert isinstance(text.data, memoryview)
+    assert text.read_ins(4).name == "addi"
+    assert (bss.base, bss.size, bss.read(0xFC, 4)) == (0x2000, 0x100, bytes(4))
+
+    assert text.read(0, 8) == ADDI * 2
+    assert type(text.read(0, 8)) is bytearray
+    bss.write_u32(0, 1)
+    assert bss.read_u32(0) == 1
+
+
+def test_memory_image_sections_are_mapped(tmp_path):
+    path = tmp_path / "test.img"
+    path.write_bytes(ADDI + bytes(4092) + b"data")
+    debug_info = MemoryImageDebugInfos(
+        {"test": {".text": (0, 4), ".data": (4096, 4)}}, {"test": {"main": 0}}, {}
+    )
+    (tmp_path / "test.img.dbg").write_text(debug_info.serialize())
+
+    with open(path, "rb") as f:
+        (program,) = MemoryImageLoader.instantiate(str(path), f, {}).parse()
+
+    text, data = program.sections
+    assert isinstance(data.data, memoryview)
+    assert text.read_ins(0).name == "addi"
+    assert data.read_u32(0) == int.from_bytes(b"data", "little")
+    data.write_u32(0, 0)
+    assert path.read_bytes()[4096:] == b"data"
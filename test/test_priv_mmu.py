@@ -0,0 +1,71 @@
+from riscemu.core import SparseMemorySection
+from riscemu.priv.PrivMMU import PrivMMU
+
+
+def test_demand_pages_are_allocated_on_write():
+    mmu = PrivMMU()
+    sec = SparseMemorySection(16, ".data", None, "test", 0x100)
+    mmu.load_section(sec, True)
+
+    assert mmu.read_u32(0x10000) == 0
+    assert mmu.materialized_bytes == 0
+
+    mmu.write_u32(0x10004, 42)
+    assert mmu.read_u32(0x10004) == 42
+    assert mmu.materialized_bytes == 4096
+    assert mmu.sections == [sec]
+
+
+def test_demand_pages_do_not_shadow_sections():
+    mmu = PrivMMU()
+    sec = SparseMemorySection(16, ".data", None, "test", 0x100)
+    mmu.load_section(sec, True)
+
+    mmu.write_u32(0x50, 1)
+    mmu.write_u32(0x104, 2)
+    mmu.write_u32(0x200, 3)
+
+    assert mmu.get_sec_containing(0x104) is sec
+    assert sec.read_u32(4) == 2
+    assert [(s.base, s.size) for s in mmu.demand_pages[0]] == [
+        (0, 0x100),
+        (0x110, 4096 - 0x110),
+    ]
+    assert (mmu.read_u32(0x50), mmu.read_u32(0x200)) == (1, 3)
+
+
+def test_sections_replace_demand_pages():
+    mmu = PrivMMU()
+    mmu.load_section(SparseMemorySection(16, ".data", None, "test", 0x100), True)
+    mmu.write_u32(0x2000, 1)
+    mmu.write_u32(0x2F00, 2)
+
+    sec = SparseMemorySection(0x100, ".new", None, "test", 0x2000)
+    assert mmu.load_section(sec, True)
+    assert mmu.read_u32(0x2000) == 0
+    assert mmu.read_u32(0x2F00) == 2
+    assert [(s.base, s.size) for s in mmu.demand_pages[2]] == [(0x2100, 0xF00)]
+
+    assert mmu.unload_section(sec)
+    mmu.write_u32(0x2010, 3)
+    assert mmu.read_u32(0x2F00) == 2
+    assert mmu.read_u32(0x2010) == 3
+    assert [(s.base, s.size) for s in mmu.demand_pages[2]] == [
+        (0x2100, 0xF00),
+        (0x2000, 0x100),
+    ]
+
+
+def test_snapshot_restores_demand_pages():
+    mmu = PrivMMU()
+    mmu.load_section(SparseMemorySection(16, ".data", None, "test", 0x100), True)
+    mmu.write_u32(0x2000, 1)
+
+    snapshot = mmu.snapshot()
+    mmu.write_u32(0x2000, 2)
+    mmu.write_u32(0x5000, 3)
+    mmu.restore(snapshot)
+
+    assert list(mmu.demand_pages) == [2]
+    assert mmu.read_u32(0x2000) == 1
+    assert mmu.read_u32(0x5000) == 0
@@ -1,7 +1,9 @@
+import math
+
 import pytest
 
 from riscemu.core.registers import Registers
-from riscemu.core import Float32
+from riscemu.core import Float32, Int32, UInt32
 
 
 def test_float_regs():
@@ -34,3 +36,48 @@ def test_unknown_reg_fails():
     r = Registers(infinite_regs=False)
     with pytest.raises(RuntimeError, match="Invalid register: az1"):
         r.get("az1")
+
+
+def test_int_regs_are_numbered():
+    r = Registers()
+    r.set("a0", Int32(-5))
+    r.set("fp", UInt32(0xFFFFFFFF))
+    r.set("zero", Int32(1))
+
+    assert r.x[10] == -5
+    assert r.x[8] == -1
+    assert r.x[0] == 0
+    assert r.get("s0") == r.get("fp") == -1
+
+
+def test_access_tracking():
+    r = Registers()
+    r.set("a1", Int32(1))
+    r.get("a2")
+    assert r.last_set is None and r.last_read is None
+
+    r.track_access = True
+    r.set("fp", Int32(1))
+    r.get("a2")
+    assert r.last_set == "s0"
+    assert r.last_read == "a2"
+
+
+def test_float_regs_are_nan_boxed():
+    r = Registers(flen=64)
+    r.set_f32("fa1", 1.5)
+    assert r.f[88:96] == b"\x00\x00\xc0\x3f\xff\xff\xff\xff"
+    assert r.get_f("fa1") == Float32(1.5)
+
+    r.set_f64("fa1", 1.5)
+    assert r.get_f64("fa1") == 1.5
+    # doubles aren't valid single precision values
+    assert math.isnan(r.get_f32("fa1"))
+
+
+def test_float_regs_round_to_single_precision():
+    r = Registers(flen=64)
+    r.set_f32("ft0", 0.1)
+    assert r.get_f32("ft0") == Float32(0.1).value != 0.1
+    r.set_f32("ft0", -1e300)
+    assert r.get_f32("ft0") == -math.inf
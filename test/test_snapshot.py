@@ -0,0 +1,115 @@
+from riscemu.core import Int32, SparseMemorySection
+
+from . import load_cpu
+
+PROGRAM = """
+.data
+value:  .word 7
+.bss
+buf:    .space 16384
+.text
+main:
+    la      s0, value
+    la      s1, buf
+    lw      s2, 0(s0)
+branch:
+    // buf[4096 + 4 * value] = value, value *= 3, exit(value)
+    slli    t0, s2, 2
+    add     t0, t0, s1
+    li      t1, 4096
+    add     t0, t0, t1
+    sw      s2, 0(t0)
+    slli    t1, s2, 1
+    add     s2, s2, t1
+    sw      s2, 0(s0)
+    mv      a0, s2
+    li      a7, SCALL_EXIT
+    scall
+"""
+
+
+def test_restore_snapshot():
+    cpu = load_cpu(PROGRAM, stack=64 * 1024)
+    value, buf = cpu.mmu.find_symbol("value"), cpu.mmu.find_symbol("buf")
+    assert cpu.run_until("branch")
+
+    snap = cpu.snapshot()
+    results = []
+    for start in (7, 2, 5):
+        cpu.restore(snap)
+        assert cpu.regs.get("s2").value == 7
+        assert cpu.mmu.read_u32(value) == 7
+        assert cpu.mmu.read(buf + 4096, 64) == bytes(64)
+        cpu.regs.set("s2", Int32(start))
+        cpu.run()
+        results.append((cpu.exit_code, cpu.mmu.read_u32(buf + 4096 + 4 * start)))
+    assert results == [(21, 7), (6, 2), (15, 5)]
+    assert cpu.halted
+
+    # only the pages that were written are saved
+    bss = cpu.mmu.get_sec_containing(buf)
+    assert list(snap.memory.original_pages[id(bss)]) == [1]
+    assert len(bss.pages) == 1
+
+    cpu.restore(snap)
+    assert not cpu.halted
+    snap.release()
+    assert "write" not in bss.__dict__
+    assert bss.write_trackers == ()
+
+
+def test_restore_mappings():
+    cpu = load_cpu(PROGRAM, stack=64 * 1024)
+    stack = cpu.mmu.get_sec_containing(cpu.regs.get("sp").unsigned_value - 4)
+    snap = cpu.snapshot()
+
+    mapped = SparseMemorySection(4096, ".data.runtime-allocated", None, "system")
+    assert cpu.mmu.load_section(mapped)
+    assert cpu.mmu.unload_section(stack)
+    cpu.restore(snap)
+
+    assert cpu.mmu.get_sec_containing(mapped.base) is None
+    assert cpu.mmu.get_sec_containing(stack.base) is stack
+    assert cpu.mmu.sections == snap.memory.sections
+
+
+def test_fork():
+    cpu = load_cpu(PROGRAM, stack=64 * 1024)
+    value = cpu.mmu.find_symbol("value")
+    assert cpu.run_until("branch")
+
+    child = cpu.fork()
+    child.regs.set("s2", Int32(2))
+    child.run()
+    assert child.exit_code == 6
+    assert child.mmu.read_u32(value) == 6
+    assert cpu.mmu.read_u32(value) == 7
+
+    cpu.run()
+    assert cpu.exit_code == 21
+    assert child.mmu.read_u32(value) == 6
+
+
+def test_dirty_pages():
+    cpu = load_cpu(PROGRAM, stack=64 * 1024)
+    value, buf = cpu.mmu.find_symbol("value"), cpu.mmu.find_symbol("buf")
+    data = cpu.mmu.get_sec_containing(value)
+    bss = cpu.mmu.get_sec_containing(buf)
+    dirty_pages = cpu.mmu.track_dirty_pages()
+
+    assert cpu.run_until("branch")
+    assert dirty_pages.dirty_pages() == []
+
+    cpu.run()
+    assert dirty_pages.dirty_pages(clear=True) == [(data, [0]), (bss, [1])]
+    assert dirty_pages.dirty_pages() == []
+
+    # sections loaded later are tracked too
+    mapped = SparseMemorySection(3 * 4096, ".data.runtime-allocated", None, "system")
+    cpu.mmu.load_section(mapped)
+    cpu.mmu.write(mapped.base + 4094, 4, bytearray(4))
+    assert dirty_pages.dirty_pages() == [(mapped, [0, 1])]
+
+    dirty_pages.release()
+    assert cpu.mmu.dirty_page_trackers == []
+    assert mapped.write_trackers == () and bss.write_trackers == ()
@@ -0,0 +1,84 @@
+import pytest
+
+from riscemu.core import (
+    HostCall,
+    MemoryAccessException,
+    SparseMemorySection,
+)
+
+from . import load_cpu
+
+
+def test_pages_are_allocated_on_write():
+    sec = SparseMemorySection(3 * 4096 + 100, ".test", None, "test")
+
+    assert sec.read(4090, 10) == bytes(10)
+    assert sec.read_u32(3 * 4096 + 96) == 0
+    assert sec.pages == {}
+
+    sec.write(4094, 4, bytearray(b"abcd"))
+    sec.write_i32(3 * 4096 + 96, -1)
+    assert sorted(sec.pages) == [0, 1, 3]
+    assert sec.read(4092, 8) == b"\0\0abcd\0\0"
+    assert sec.read_u32(4094) == int.from_bytes(b"abcd", "little")
+    assert sec.read_u32(3 * 4096 + 96) == 0xFFFFFFFF
+
+    with pytest.raises(MemoryAccessException):
+        sec.write_u32(3 * 4096 + 98, 0)
+    with pytest.raises(MemoryAccessException):
+        sec.read(3 * 4096 + 90, 11)
+
+
+def test_from_data_skips_zero_pages():
+    data = bytearray(3 * 4096)
+    data[5000] = 1
+    assert SparseMemorySection.has_zero_pages(data)
+    assert not SparseMemorySection.has_zero_pages(bytearray(4095))
+
+    sec = SparseMemorySection.from_data(data, ".test", None, "test")
+    assert list(sec.pages) == [1]
+    assert sec.read(0, sec.size) == data
+
+
+PROGRAM = """
+.data
+msg:    .asciiz "hi"
+.bss
+buf:    .space 16384
+.text
+main:
+    la      a0, buf
+    li      a1, 4094
+    add     a0, a0, a1
+    li      a1, 8
+    li      a7, 500
+    scall
+    addi    sp, sp, -16
+    sw      a0, 12(sp)
+    li      a0, 0
+    li      a7, 93
+    scall
+"""
+
+
+def fill(call: HostCall):
+    mem = call.memory(call.get(0), call.get_unsigned(1))
+    mem[:] = b"x" * len(mem)
+    call.set(0, len(mem))
+
+
+def test_zero_filled_memory_is_sparse():
+    cpu = load_cpu(PROGRAM, stack=512 * 1024)
+    cpu.register_hostcall(500, fill)
+    cpu.run()
+
+    buf = cpu.mmu.find_symbol("buf")
+    bss = cpu.mmu.get_sec_containing(buf)
+    stack = cpu.mmu.get_sec_containing(cpu.regs.get("sp").unsigned_value)
+    assert isinstance(bss, SparseMemorySection)
+    assert isinstance(stack, SparseMemorySection)
+    # the host call wrote across a page boundary
+    assert cpu.mmu.read(buf + 4092, 12) == b"\0\0xxxxxxxx\0\0"
+    assert len(bss.pages) == 2
+    assert len(stack.pages) == 1
+    assert cpu.mmu.read_u32(cpu.regs.get("sp").unsigned_value + 12) == 8
@@ -0,0 +1,133 @@
+from functools import partial
+
+import pytest
+
+from riscemu.core import MemoryAccessException
+
+from . import load_cpu
+
+PROGRAM = """
+.text
+main:
+    li      a0, 40
+    addi    a0, a0, 2
+    unknown a0, a0
+    li      a7, 93
+    scall
+"""
+
+
+def test_ops_are_decoded_once():
+    cpu = load_cpu(PROGRAM)
+    base = cpu.pc
+
+    op = cpu.fetch_op(base + 4)
+    assert cpu.fetch_op(base + 4) is op
+    assert cpu.decode_section(cpu.mmu.get_sec_containing(base))[1] is op
+
+
+def test_threaded_code_execution():
+    cpu = load_cpu(PROGRAM)
+    base = cpu.pc
+
+    cpu.step()
+    cpu.step()
+    assert cpu.regs.get("a0") == 42
+    assert cpu.pc == base + 8
+    assert cpu.cycle == 2
+
+
+def test_unknown_instruction_fails_on_execution():
+    cpu = load_cpu(PROGRAM)
+
+    op = cpu.fetch_op(cpu.pc + 8)
+    with pytest.raises(RuntimeError, match="Unknown instruction"):
+        op()
+
+
+def test_misaligned_fetch():
+    cpu = load_cpu(PROGRAM)
+
+    with pytest.raises(MemoryAccessException):
+        cpu.fetch_op(cpu.pc + 2)
+
+
+FUSED_PROGRAM = """
+.text
+main:
+    lui     a0, 0x12345
+    addi    a0, a0, 0x678
+    li      t0, 3
+    li      a1, 0
+loop:
+    addi    a1, a1, 2
+    addi    t0, t0, -1
+    bne     t0, zero, loop
+    li      a2, 5
+    slli    a3, a2, 2
+    add     a3, a3, a2
+    auipc   t1, 0
+    jalr    ra, t1, 8
+    li      a1, 0
+    li      a7, 93
+    scall
+"""
+
+
+def test_fused_instructions():
+    cpu = load_cpu(FUSED_PROGRAM)
+    base = cpu.pc
+    assert not isinstance(cpu.fetch_op(base), partial)
+
+    while not cpu.halted:
+        cpu.step()
+
+    assert cpu.regs.get("a0") == 0x12345678
+    assert cpu.regs.get("a1") == 6
+    assert cpu.regs.get("a3") == 25
+    assert cpu.regs.get("ra") == base + 0x30
+    # every instruction is still counted
+    assert cpu.cycle == 20
+
+
+def test_exception_in_fused_instruction():
+    cpu = load_cpu(
+        """
+.text
+main:
+    lui     a0, 1
+    addi    b0, a0, 1
+"""
+    )
+    base = cpu.pc
+
+    with pytest.raises(RuntimeError, match="Invalid register"):
+        cpu.step()
+    assert cpu.regs.get("a0") == 0x1000
+    assert cpu.pc == base + 8
+    assert cpu.cycle == 2
+
+
+def test_run_fast_matches_step():
+    source = """
+.text
+main:
+    li      a0, 0
+    li      a1, 10
+1:
+    addi    a0, a0, 3
+    addi    a1, a1, -1
+    bne     a1, zero, 1b
+    lw      a2, 0(zero)
+"""
+    stepped = load_cpu(source)
+    while not stepped.halted:
+        stepped.step()
+
+    fast = load_cpu(source)
+    fast.run_fast()
+
+    assert fast.halted
+    assert fast.regs.get("a0") == stepped.regs.get("a0") == 30
+    assert fast.cycle == stepped.cycle
+    assert fast.pc == stepped.pc
@@ -0,0 +1,68 @@
+from riscemu.config import RunConfig
+from riscemu.instructions import RV32I, RV32M
+from riscemu.parser import AssemblyFileLoader
+from riscemu.riscemu_main import RiscemuMain
+
+PROGRAM = """
+.data
+nums:   .word 1, 2, 3, 4
+.text
+main:
+    la      a1, nums
+    li      a2, 4
+    li      a0, 0
+1:
+    lw      t0, 0(a1)
+    add     a0, a0, t0
+    addi    a1, a1, 4
+    addi    a2, a2, -1
+    bne     a2, zero, 1b
+    li      a7, 93
+    scall
+"""
+
+
+def load(path, cache_dir) -> RiscemuMain:
+    main = RiscemuMain(RunConfig(use_jit=True, jit_cache_dir=str(cache_dir)))
+    main.selected_ins_sets = [RV32I, RV32M]
+    main.register_all_program_loaders()
+    main.input_files = [str(path)]
+    main.instantiate_cpu()
+    main.load_programs()
+    return main
+
+
+def test_translation_is_reused(tmp_path, monkeypatch):
+    source = tmp_path / "sum.asm"
+    source.write_text(PROGRAM)
+    cache_dir = tmp_path / "cache"
+
+    first = load(source, cache_dir)
+    assert len(list(cache_dir.glob("*.py"))) == 1
+    first.cpu.launch()
+    assert first.cpu.exit_code == 10
+
+    # the second run must not parse the program again
+    def fail(self):
+        raise AssertionError("program was parsed")
+
+    monkeypatch.setattr(AssemblyFileLoader, "parse", fail)
+    second = load(source, cache_dir)
+    assert second.cpu.block_compiler.blocks
+    second.cpu.launch()
+    assert second.cpu.exit_code == 10
+    assert second.cpu.cycle == first.cpu.cycle
+
+
+def test_changed_source_invalidates_translation(tmp_path):
+    source = tmp_path / "sum.asm"
+    source.write_text(PROGRAM)
+    cache_dir = tmp_path / "cache"
+
+    load(source, cache_dir)
+    source.write_text(PROGRAM.replace("li      a2, 4", "li      a2, 3"))
+    main = load(source, cache_dir)
+    main.cpu.launch()
+
+    assert len(list(cache_dir.glob("*.py"))) == 2
+    assert main.cpu.exit_code == 6
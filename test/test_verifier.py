@@ -0,0 +1,88 @@
+import pytest
+
+from riscemu.core import Registers, ProgramVerificationException
+from riscemu.instructions import RV32I, RV32M
+
+from . import load_cpu
+
+PROGRAM = """
+.data
+buf:    .word 0x12345678, -1
+.text
+main:
+    la      a0, buf
+    lw      a1, 0(a0)
+    lw      a2, 4(a0)
+    li      a3, -7
+    add     a4, a1, a2
+    sub     a5, a3, a1
+    and     a6, a1, a3
+    or      a7, a1, a3
+    xor     t0, a1, a3
+    addi    t1, a3, 100
+    andi    t2, a1, 0xFF
+    ori     t3, a3, 3
+    xori    t4, a1, -1
+    slli    t5, a1, 4
+    srli    t6, a2, 4
+    srai    s1, a2, 4
+    mv      s2, a1
+    sw      a5, 4(a0)
+    lw      s3, 4(a0)
+    li      s4, 0
+    li      s5, 5
+1:
+    addi    s4, s4, 1
+    bltu    s4, s5, 1b
+    bgeu    a2, s5, 2f
+    li      s6, 1
+2:
+    blt     a3, zero, 3f
+    li      s7, 1
+3:
+    li      a0, 0
+    li      a7, 93
+    scall
+"""
+
+
+def test_verified_program_matches_unverified():
+    unverified = load_cpu(PROGRAM, isets=(RV32I, RV32M))
+    unverified.launch()
+
+    cpu = load_cpu(PROGRAM, isets=(RV32I, RV32M))
+    cpu.verify_programs()
+    assert all(sec.verified for sec in cpu.mmu.sections if hasattr(sec, "verified"))
+    cpu.launch()
+
+    assert cpu.cycle == unverified.cycle
+    for reg in Registers.valid_regs:
+        assert cpu.regs.get(reg) == unverified.regs.get(reg), reg
+
+
+def test_all_errors_are_reported():
+    cpu = load_cpu(
+        """
+.text
+main:
+    addi    a0, a0
+    add     a0, a1, 3
+    lw      a0, 0(b3)
+    mul     a0, a0, a0
+    beq     a0, a1, nowhere
+    unknown a0
+    jal     main
+    """,
+        isets=(RV32I, RV32M),
+    )
+
+    with pytest.raises(ProgramVerificationException) as info:
+        cpu.verify_programs()
+
+    errors = info.value.errors
+    assert len(errors) == 5
+    assert "addi a0, a0: expected 3 operands" in errors[0]
+    assert "3 is not a register" in errors[1]
+    assert "b3 is not a register" in errors[2]
+    assert "nowhere is neither a number nor a known symbol" in errors[3]
+    assert "unknown a0: unknown instruction" in errors[4]